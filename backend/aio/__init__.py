@@ -0,0 +1,8 @@
+"""Async data-access layer.
+
+Mirrors the read paths of backend.threads_db / comments_db / users_db /
+follows_db (and comment writes) on PyMongo's AsyncMongoClient. All
+coroutines run on one background event loop per process, so every request
+thread shares a single async connection pool; use `backend.aio.db.run()`
+to await them from any other loop (e.g. Flask async views).
+"""
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from backend.aio.db import get_db
+from backend.comments_db import (
+    COMMENT_SORT,
+    NEWEST_COMMENT_PROJECTION,
+    NEWEST_COMMENT_SORT,
+    _PARENT_PROJECTION,
+    _oid,
+    comment_page_filter,
+    last_activity_without,
+    new_comment_doc,
+    next_comment_cursor,
+)
+from backend.query_cache import invalidate_thread, invalidate_threads
+
+
+async def add_comment(thread_id, author_id, author_display_name, body, parent_id=None):
+    """Insert a comment or reply (and bump the thread's/parent's stats). Raises ValueError on a bad parent."""
+    db = get_db()
+    now = datetime.now(timezone.utc)
+
+    parent = None
+    if parent_id:
+        parent = await db.comments.find_one(
+            {"_id": _oid(parent_id), "thread_id": _oid(thread_id)}, _PARENT_PROJECTION
+        )
+        if parent is None:
+            raise ValueError("Parent comment not found.")
+
+    doc = new_comment_doc(thread_id, author_id, author_display_name, body, parent, now)
+    await db.comments.insert_one(doc)
+    if doc["parent_id"] is not None:
+        await db.comments.update_one({"_id": doc["parent_id"]}, {"$inc": {"reply_count": 1}})
+    await db.threads.update_one(
+        {"_id": doc["thread_id"]},
+        {"$inc": {"comment_count": 1}, "$max": {"last_activity_at": now}},
+    )
+    invalidate_threads(doc["thread_id"])
+    return doc
+
+
+async def get_comment(comment_id):
+    db = get_db()
+    return await db.comments.find_one({"_id": _oid(comment_id)})
+
+
+async def list_comments_page(thread_id, limit=50, after=None):
+    """One page of a thread's comment tree in display order; (comments, next_after) as in comments_db."""
+    db = get_db()
+    cursor = db.comments.find(comment_page_filter(thread_id, after)).sort(COMMENT_SORT).limit(int(limit))
+    items = await cursor.to_list()
+    return items, next_comment_cursor(items, limit)
+
+
+async def delete_comment(comment_id, author_id):
+    """Delete a comment (author only); one with replies is blanked instead (see comments_db)."""
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    owned = {"_id": _oid(comment_id), "author_id": _oid(author_id)}
+    doc = await db.comments.find_one_and_delete(
+        {**owned, "reply_count": {"$not": {"$gt": 0}}},
+        projection={"thread_id": 1, "parent_id": 1, "created_at": 1},
+    )
+    if doc is None:
+        doc = await db.comments.find_one_and_update(
+            {**owned, "reply_count": {"$gt": 0}},
+            {"$set": {"body": "", "deleted": True, "updated_at": now}},
+            projection={"thread_id": 1},
+        )
+        if doc is None:
+            return False
+        await db.threads.update_one({"_id": doc["thread_id"]}, {"$max": {"comments_updated_at": now}})
+        invalidate_thread(doc["thread_id"])  # counts unchanged: lists stay valid
+        return True
+    if doc.get("parent_id") is not None:
+        await db.comments.update_one(
+            {"_id": doc["parent_id"], "reply_count": {"$gt": 0}}, {"$inc": {"reply_count": -1}}
+        )
+    thread = await db.threads.find_one_and_update(
+        {"_id": doc["thread_id"], "comment_count": {"$gt": 0}},
+        {"$inc": {"comment_count": -1}, "$max": {"comments_updated_at": now}},
+        projection={"created_at": 1, "last_activity_at": 1},
+    )
+    if thread is not None and thread.get("last_activity_at") == doc.get("created_at"):
+        newest = await db.comments.find_one(
+            {"thread_id": doc["thread_id"]}, NEWEST_COMMENT_PROJECTION, sort=NEWEST_COMMENT_SORT
+        )
+        await db.threads.update_one(
+            {"_id": doc["thread_id"], "last_activity_at": doc["created_at"]},
+            {"$set": {"last_activity_at": last_activity_without(thread, newest)}},
+        )
+    invalidate_threads(doc["thread_id"])
+    return True
+
+
+async def update_comment(comment_id, author_id, body):
+    """Update a comment body (author only)."""
+    db = get_db()
+    now = datetime.now(timezone.utc)
+
+    doc = await db.comments.find_one_and_update(
+        {"_id": _oid(comment_id), "author_id": _oid(author_id), "deleted": {"$ne": True}},
+        {"$set": {"body": body.strip(), "updated_at": now}},
+        projection={"thread_id": 1},
+    )
+    if doc is None:
+        return False
+    await db.threads.update_one({"_id": doc["thread_id"]}, {"$max": {"comments_updated_at": now}})
+    invalidate_thread(doc["thread_id"])
+    return True
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import threading
+from pymongo import AsyncMongoClient
+from backend.db import CommandStats, PoolStats, client_options
+
+# The async client has its own pool; keep its stats apart from the sync client's.
+pool_stats = PoolStats()
+command_stats = CommandStats()
+
+_loop = None
+_loop_pid = None
+_client = None
+_lock = threading.Lock()
+
+
+def _ensure_loop():
+    # One daemon event-loop thread per process (re-created after fork).
+    global _loop, _loop_pid, _client
+    pid = os.getpid()
+    if _loop is None or _loop_pid != pid:
+        with _lock:
+            if _loop is None or _loop_pid != pid:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mongo-aio", daemon=True).start()
+                _loop, _loop_pid, _client = loop, pid, None
+                pool_stats.reset()
+    return _loop
+
+
+def get_db():
+    """
+    Async database handle. Only valid inside coroutines scheduled through
+    run()/run_sync(), because the client is bound to the background loop.
+    """
+    global _client
+    if _client is None:
+        mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+        _client = AsyncMongoClient(mongo_uri, **client_options([pool_stats, command_stats]))
+    db_name = os.getenv("DB_NAME", "student_connect")
+    return _client[db_name]
+
+
+async def run(coro):
+    """Await `coro` on the shared Mongo loop from any other event loop."""
+    loop = _ensure_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def run_sync(coro):
+    """Blocking helper for scripts: run `coro` on the shared Mongo loop."""
+    return asyncio.run_coroutine_threadsafe(coro, _ensure_loop()).result()
+
+
+async def _gather(*coros):
+    return await asyncio.gather(*coros)
+
+
+async def run_all(*coros):
+    """Run several data-access coroutines concurrently; results in order."""
+    return await run(_gather(*coros))
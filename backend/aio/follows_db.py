@@ -0,0 +1,38 @@
+from backend.aio.db import get_db
+from backend.aio.users_db import get_users_by_ids
+from backend.follows_db import EDGE_SORT, edges_filter, follow_page
+from backend.users_db import PUBLIC_USER_PROJECTION
+
+# Read paths only: follow/unfollow stay on backend.follows_db because they
+# also backfill and prune home feeds.
+
+
+async def _edges(field, user_id, limit, skip, after):
+    db = get_db()
+    filter_, skip = edges_filter(field, user_id, skip, after)
+    return await db.follows.find(filter_).sort(EDGE_SORT).skip(int(skip)).limit(int(limit)).to_list()
+
+
+async def list_following(user_id, limit=50, skip=0, after=None):
+    """List who the user is following."""
+    return await _edges("follower_id", user_id, limit, skip, after)
+
+
+async def list_followers(user_id, limit=50, skip=0, after=None):
+    """List who follows the user."""
+    return await _edges("followee_id", user_id, limit, skip, after)
+
+
+async def _hydrate(edges, other_field, limit):
+    users = await get_users_by_ids([e[other_field] for e in edges], PUBLIC_USER_PROJECTION)
+    return follow_page(edges, users, other_field, limit)
+
+
+async def list_following_users(user_id, limit=50, after=None):
+    """Page of users that `user_id` follows; same shape as backend.follows_db.list_following_users."""
+    return await _hydrate(await list_following(user_id, limit=limit, after=after), "followee_id", limit)
+
+
+async def list_followers_users(user_id, limit=50, after=None):
+    """Page of users following `user_id`; same shape as backend.follows_db.list_followers_users."""
+    return await _hydrate(await list_followers(user_id, limit=limit, after=after), "follower_id", limit)
@@ -0,0 +1,58 @@
+from backend.aio.db import get_db
+from backend.search_index import search_thread_ids
+from backend.threads_db import (
+    _oid,
+    apply_scores,
+    page_query,
+    search_filter,
+    text_ranked_query,
+    thread_with_comments_pipeline,
+)
+
+# Read paths only: thread writes stay on backend.threads_db because they also
+# fan out into feeds.
+
+
+async def _page(filter_, limit, skip, after, projection=None, sort="recent"):
+    db = get_db()
+    filter_, sort_spec, skip = page_query(filter_, skip, after, sort)
+    cursor = db.threads.find(filter_, projection).sort(sort_spec).skip(skip).limit(int(limit))
+    return await cursor.to_list()
+
+
+async def list_threads(limit=20, skip=0, after=None, projection=None, sort="recent"):
+    return await _page({}, limit, skip, after, projection, sort)
+
+
+async def search_threads(q=None, tag=None, limit=20, skip=0, after=None, projection=None, sort="recent"):
+    return await _page(search_filter(q, tag), limit, skip, after, projection, sort)
+
+
+async def get_threads_by_ids(thread_ids, projection=None):
+    """Fetch threads by id in one query, returned in the order of `thread_ids`."""
+    db = get_db()
+    ids = [_oid(t) for t in thread_ids]
+    by_id = {t["_id"]: t for t in await db.threads.find({"_id": {"$in": ids}}, projection).to_list()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def search_threads_ranked(q, tag=None, limit=20, skip=0, projection=None):
+    """Relevance-ranked search, as backend.threads_db.search_threads_ranked."""
+    hits = search_thread_ids(q, tag=tag, limit=limit, offset=skip)
+    if hits is None:  # index still loading
+        db = get_db()
+        filter_, projection, sort = text_ranked_query(q, tag, projection)
+        return await db.threads.find(filter_, projection).sort(sort).skip(int(skip)).limit(int(limit)).to_list()
+    return apply_scores(hits, await get_threads_by_ids([h[0] for h in hits], projection))
+
+
+async def get_thread(thread_id, projection=None):
+    db = get_db()
+    return await db.threads.find_one({"_id": _oid(thread_id)}, projection)
+
+
+async def get_thread_with_comments(thread_id, comment_limit=200):
+    db = get_db()
+    cursor = await db.threads.aggregate(thread_with_comments_pipeline(thread_id, comment_limit))
+    docs = await cursor.to_list()
+    return docs[0] if docs else None
@@ -0,0 +1,24 @@
+from backend.aio.db import get_db
+from backend.users_db import _oid
+
+
+async def get_user(user_id, projection=None):
+    """Find a user by _id."""
+    db = get_db()
+    return await db.users.find_one({"_id": _oid(user_id)}, projection)
+
+
+async def get_user_by_email(email):
+    """Find a user by email."""
+    db = get_db()
+    return await db.users.find_one({"email": email.strip().lower()})
+
+
+async def get_users_by_ids(user_ids, projection=None):
+    """Fetch many users in one query; returns {_id: doc}."""
+    db = get_db()
+    ids = list({_oid(u) for u in user_ids})
+    if not ids:
+        return {}
+    docs = await db.users.find({"_id": {"$in": ids}}, projection).to_list()
+    return {doc["_id"]: doc for doc in docs}
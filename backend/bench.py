@@ -0,0 +1,232 @@
+"""Micro-benchmarks for the data-access and rendering hot paths.
+
+  python -m backend.bench                                  # sizes 100,1000 against local mongod
+  python -m backend.bench --sizes 1000,10000 --json bench.json
+  python -m backend.bench --compare bench.json --threshold 15   # exit 1 on regressions
+  python -m backend.bench --stand-in                       # in-process mongomock, no server needed
+
+Each size gets a fresh synthetic dataset (backend.seed) in its own database
+(BENCH_DB_NAME, default "<DB_NAME>_bench"), which is dropped afterwards; the
+app's database and saved search index are never touched. Every benchmark is
+calibrated to run ~--round-time seconds per round and reports per-call
+min/median/mean/stdev over --rounds rounds.
+
+The stand-in needs the optional `mongomock` package and only covers plain
+queries: benchmarks that need $text, $lookup pipelines or computed
+projections are reported as skipped. Any other error fails the run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from backend import db as db_module
+from backend import search_index
+from backend.comments_db import list_comments
+from backend.seed import SEED_EMAIL, SEED_PASSWORD, generate
+from backend.threads_db import (
+    get_thread_with_comments,
+    list_threads,
+    search_threads,
+    search_threads_ranked,
+    thread_projection,
+)
+from backend.users_db import authenticate_user, get_user
+
+DEFAULT_SIZES = "100,1000"
+
+
+def _time_calls(fn, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number
+
+
+def measure(fn, rounds=5, round_time=0.2, max_number=100000):
+    """Per-call timings for `fn` (seconds), calibrated so each round takes ~round_time."""
+    fn()  # warm up (connections, caches, template compilation)
+    number = 1
+    while number < max_number:
+        if _time_calls(fn, number) * number >= round_time / 4:
+            break
+        number *= 4
+    per_call = _time_calls(fn, number)
+    number = max(1, min(max_number, int(round_time / per_call) if per_call else max_number))
+    samples = [_time_calls(fn, number) for _ in range(rounds)]
+    return {
+        "number": number,
+        "rounds": rounds,
+        "min_us": min(samples) * 1e6,
+        "median_us": statistics.median(samples) * 1e6,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "stdev_us": (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1e6,
+        "ops_per_s": 1.0 / statistics.median(samples),
+    }
+
+
+def _stand_in_gap(exc):
+    """Whether `exc` is mongomock declining something a real server supports."""
+    return isinstance(exc, NotImplementedError) or (
+        isinstance(exc, ValueError) and str(exc).startswith("Unsupported projection")
+    )
+
+
+def _benchmarks(app, stand_in=False):
+    """{name: zero-arg callable} over the currently seeded database."""
+    from flask import render_template
+
+    summary = thread_projection("summary")
+    page = list_threads(limit=20)
+    try:
+        dashboard_items = list_threads(limit=50, projection=summary)
+    except Exception as exc:  # stand-in without computed projections; render full docs instead
+        if not (stand_in and _stand_in_gap(exc)):
+            raise
+        dashboard_items = list_threads(limit=50)
+    busiest = max(page, key=lambda t: t.get("comment_count", 0)) if page else None
+    word = (page[0]["title"].split() or ["exam"])[0] if page else "exam"
+    user_id = page[0]["author_id"] if page else None
+
+    benches = {
+        "json_dumps_threads_page": lambda: app.json.dumps({"items": page}),
+        "list_threads": lambda: list_threads(limit=20),
+        "list_threads_summary": lambda: list_threads(limit=50, projection=summary),
+        "search_threads": lambda: search_threads(q=word, limit=20),
+        "search_threads_tag": lambda: search_threads(tag="cs101", limit=20),
+        "search_threads_ranked": lambda: search_threads_ranked(q=word, limit=20),
+        "authenticate_user": lambda: authenticate_user(SEED_EMAIL.format(0), SEED_PASSWORD),
+    }
+    if user_id is not None:
+        benches["get_user"] = lambda: get_user(user_id)
+    if busiest is not None:
+        tid = busiest["_id"]
+        try:
+            thread = get_thread_with_comments(tid, comment_limit=200)
+            comments = thread.pop("comments")
+        except Exception as exc:  # stand-in without $lookup pipelines
+            if not (stand_in and _stand_in_gap(exc)):
+                raise
+            thread, comments = dict(busiest), list_comments(tid, limit=200)
+        benches["list_comments"] = lambda: list_comments(tid, limit=50)
+        benches["get_thread_with_comments"] = lambda: get_thread_with_comments(tid, comment_limit=200)
+
+        def render_thread():
+            with app.test_request_context(f"/t/{tid}"):
+                render_template("thread.html", thread=thread, comments=comments, is_owner=False,
+                                after=None, more={"after": None})
+
+        benches["render_thread_html"] = render_thread
+
+    def render_dashboard():
+        with app.test_request_context("/dashboard"):
+            render_template("dashboard.html", threads=dashboard_items, q="", tag="", sort="recent", next_after=None)
+
+    benches["render_dashboard_html"] = render_dashboard
+    return benches
+
+
+def _use_stand_in():
+    import mongomock  # optional dependency
+
+    db_module.set_client(mongomock.MongoClient())
+
+
+def run(sizes, rounds=5, round_time=0.2, only=None, stand_in=False):
+    from backend.flask.app import create_app
+
+    os.environ["DB_NAME"] = os.getenv("BENCH_DB_NAME", os.getenv("DB_NAME", "student_connect") + "_bench")
+    if stand_in:
+        _use_stand_in()
+    app = create_app()
+    results = {}
+    for size in sizes:
+        client = db_module.get_client()
+        client.drop_database(os.environ["DB_NAME"])
+        try:
+            generate(users=max(1, size // 3), threads_per_user=3.0, comments_per_thread=5.0,
+                     follows_per_user=10.0, seed=size, feeds=False, index=False)
+            # Build this process's search index from the bench data, not the saved file.
+            index = search_index.SearchIndex()
+            index.rebuild()
+            search_index.set_search_index(index)
+            for name, fn in _benchmarks(app, stand_in).items():
+                if only and name not in only:
+                    continue
+                key = f"{name}[{size}]"
+                try:
+                    results[key] = measure(fn, rounds=rounds, round_time=round_time)
+                except Exception as exc:  # only what the stand-in can't do; anything else is a real failure
+                    if not (stand_in and _stand_in_gap(exc)):
+                        raise
+                    results[key] = {"skipped": f"{type(exc).__name__}: {exc}"}
+                print(_format_row(key, results[key]), file=sys.stderr)
+        finally:
+            client.drop_database(os.environ["DB_NAME"])
+    return {
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "stand_in": stand_in,
+        "benchmarks": results,
+    }
+
+
+def _format_row(key, row, old=None):
+    if "skipped" in row:
+        return f"{key:<44} skipped ({row['skipped']})"
+    line = f"{key:<44} {row['median_us']:>12.1f} us  ±{row['stdev_us']:>9.1f}  {row['ops_per_s']:>11.1f}/s"
+    if old and "median_us" in old:
+        line += f"  {(row['median_us'] - old['median_us']) / old['median_us'] * 100:+7.1f}%"
+    return line
+
+
+def compare(results, baseline, threshold):
+    """Print current vs baseline medians; return the keys slower by more than threshold %."""
+    regressions = []
+    print(f"{'benchmark':<44} {'median':>15}  {'stdev':>10}  {'throughput':>13}  {'change':>7}")
+    for key, row in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(key)
+        print(_format_row(key, row, old))
+        if old and "median_us" in old and "median_us" in row:
+            if (row["median_us"] - old["median_us"]) / old["median_us"] * 100 > threshold:
+                regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.bench", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated thread counts")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--round-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--stand-in", action="store_true", help="use in-process mongomock instead of mongod")
+    parser.add_argument("--json", help="write results to this file (use as a later --compare baseline)")
+    parser.add_argument("--compare", help="baseline results file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in %% (with --compare)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    results = run(sizes, rounds=args.rounds, round_time=args.round_time, only=only, stand_in=args.stand_in)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        for key, row in results["benchmarks"].items():
+            print(_format_row(key, row))
+
+
+if __name__ == "__main__":
+    main()
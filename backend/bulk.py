@@ -0,0 +1,256 @@
+"""Bulk import/export for threads, comments, users and follows.
+
+Export (one NDJSON file per collection, MongoDB Extended JSON so ObjectIds
+and dates round-trip):
+  python -m backend.bulk export --out dump/
+  python -m backend.bulk export --out dump/ --collections threads comments
+
+Import (NDJSON or BSON, e.g. from mongodump):
+  python -m backend.bulk import threads dump/threads.ndjson
+  python -m backend.bulk import users users.bson --defer-indexes --repair
+
+Imports stream the file in batches (memory stays bounded), write with
+unordered insert_many (or upserting bulk_write with --upsert), and record a
+checkpoint after every batch so an interrupted load resumes where it stopped.
+Rows without an _id get one derived from the file and their byte offset, so
+a batch replayed after a crash is skipped as duplicates, not inserted twice.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+import bson
+from bson import ObjectId, json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from backend.comments_db import ensure_comment_indexes, repair_comment_paths
+from backend.db import get_db
+from backend.feed_db import ensure_feed_indexes
+from backend.follows_db import ensure_follow_indexes, repair_follow_counts
+from backend.tags_db import rebuild_tag_counts
+from backend.threads_db import ensure_thread_indexes, repair_comment_stats
+from backend.users_db import ensure_user_indexes
+
+COLLECTIONS = ("threads", "comments", "users", "follows")
+DEFAULT_BATCH = 1000
+
+# Secondary indexes per collection, rebuilt after a --defer-indexes load
+# (which keeps unique indexes in place).
+_ENSURE_INDEXES = {
+    "threads": (ensure_thread_indexes, ensure_feed_indexes),
+    "comments": (ensure_comment_indexes,),
+    "users": (ensure_user_indexes, ensure_feed_indexes),
+    "follows": (ensure_follow_indexes,),
+}
+
+# Denormalized data that raw inserts bypass, recomputed by --repair.
+_REPAIRS = {
+    "threads": (repair_comment_stats, rebuild_tag_counts),
+    "comments": (repair_comment_paths, repair_comment_stats),
+    "users": (repair_follow_counts,),
+    "follows": (repair_follow_counts,),
+}
+
+
+# ---- readers: yield (doc, offset of it, offset just past it) -----------------
+
+def _read_ndjson(path, start):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while line := f.readline():
+            if line.strip():
+                yield json_util.loads(line), start, f.tell()
+            start = f.tell()
+
+
+def _read_bson(path, start):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while True:
+            head = f.read(4)
+            if not head:
+                return
+            if len(head) < 4:
+                raise ValueError(f"Truncated BSON document at offset {f.tell() - len(head)}")
+            (size,) = struct.unpack("<i", head)
+            body = f.read(size - 4)
+            if len(body) < size - 4:
+                raise ValueError(f"Truncated BSON document at offset {f.tell() - len(body) - 4}")
+            yield bson.decode(head + body), f.tell() - size, f.tell()
+
+
+def _reader(path, fmt):
+    fmt = fmt or ("bson" if str(path).endswith(".bson") else "ndjson")
+    if fmt not in ("ndjson", "bson"):
+        raise ValueError(f"Unknown format: {fmt}")
+    return _read_bson if fmt == "bson" else _read_ndjson
+
+
+def _row_id(source, offset, doc):
+    # Same file + same offset -> same _id. The timestamp part comes from
+    # created_at (when present) so _id order still roughly follows time.
+    created = doc.get("created_at")
+    seconds = int(created.timestamp()) if hasattr(created, "timestamp") else 0
+    digest = hashlib.blake2b(f"{source}:{offset}".encode(), digest_size=8).digest()
+    return ObjectId(seconds.to_bytes(4, "big") + digest)
+
+
+def _batches(docs, size, source):
+    batch, offset = [], None
+    for doc, start, offset in docs:
+        if "_id" not in doc:
+            doc["_id"] = _row_id(source, start, doc)
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+# ---- checkpoints -------------------------------------------------------------
+
+def _checkpoint_path(path, collection):
+    return Path(f"{path}.{collection}.checkpoint")
+
+
+def _load_checkpoint(path, collection):
+    cp = _checkpoint_path(path, collection)
+    if not cp.exists():
+        return 0, 0
+    data = json.loads(cp.read_text())
+    return int(data["offset"]), int(data["imported"])
+
+
+def _save_checkpoint(path, collection, offset, imported):
+    cp = _checkpoint_path(path, collection)
+    tmp = cp.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"offset": offset, "imported": imported}))
+    os.replace(tmp, cp)
+
+
+# ---- import / export ---------------------------------------------------------
+
+def _write_batch(coll, batch, upsert):
+    """Write one batch; duplicate _ids (e.g. re-running a batch) are skipped."""
+    if upsert:
+        res = coll.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in batch], ordered=False)
+        return res.matched_count + res.upserted_count
+    try:
+        return len(coll.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(e.get("code") != 11000 for e in errors):
+            raise
+        return exc.details.get("nInserted", 0)
+
+
+def _drop_secondary_indexes(coll):
+    # Unique indexes stay: they are what rejects duplicate rows during the load.
+    for name, info in coll.index_information().items():
+        if name != "_id_" and not info.get("unique"):
+            coll.drop_index(name)
+
+
+def import_file(collection, path, fmt=None, batch_size=DEFAULT_BATCH, upsert=False,
+                defer_indexes=False, repair=False, restart=False):
+    """Stream `path` into `collection`. Returns the number of documents written."""
+    if collection not in COLLECTIONS:
+        raise ValueError(f"collection must be one of: {', '.join(COLLECTIONS)}")
+    coll = get_db()[collection]
+    read = _reader(path, fmt)
+
+    if restart:
+        _checkpoint_path(path, collection).unlink(missing_ok=True)
+    offset, imported = _load_checkpoint(path, collection)
+    if offset:
+        print(f"Resuming {collection} from byte {offset} ({imported} already imported)")
+
+    if defer_indexes:
+        for ensure in _ENSURE_INDEXES[collection]:
+            ensure()  # make sure the unique ones exist before dropping the rest
+        _drop_secondary_indexes(coll)
+
+    started = time.perf_counter()
+    source = Path(path).resolve()
+    for batch, offset in _batches(read(path, offset), int(batch_size), source):
+        imported += _write_batch(coll, batch, upsert)
+        _save_checkpoint(path, collection, offset, imported)
+        rate = imported / max(time.perf_counter() - started, 1e-9)
+        print(f"\r{collection}: {imported} docs ({rate:,.0f}/s)", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+    if defer_indexes:
+        print(f"Building {collection} indexes...")
+        for ensure in _ENSURE_INDEXES[collection]:
+            ensure()
+    if repair:
+        print(f"Repairing denormalized fields for {collection}...")
+        for fix in _REPAIRS[collection]:
+            fix()
+    else:
+        print("Note: counters/feeds/search were not updated; re-run with --repair "
+              "or use the maintenance commands in README.md.")
+
+    _checkpoint_path(path, collection).unlink(missing_ok=True)
+    return imported
+
+
+def export_collection(collection, out, batch_size=DEFAULT_BATCH):
+    """Write `collection` to `out` as NDJSON (Extended JSON). Returns doc count."""
+    coll = get_db()[collection]
+    count = 0
+    with open(out, "w", encoding="utf-8") as f:
+        for doc in coll.find({}, batch_size=int(batch_size)).sort("_id", 1):
+            f.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.bulk", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="export collections as NDJSON")
+    exp.add_argument("--out", required=True, help="output directory")
+    exp.add_argument("--collections", nargs="+", choices=COLLECTIONS, default=list(COLLECTIONS))
+    exp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+
+    imp = sub.add_parser("import", help="import one collection from NDJSON/BSON")
+    imp.add_argument("collection", choices=COLLECTIONS)
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=("ndjson", "bson"), help="default: by file extension")
+    imp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    imp.add_argument("--upsert", action="store_true", help="replace existing docs by _id")
+    imp.add_argument("--defer-indexes", action="store_true",
+                     help="drop non-unique secondary indexes before loading and rebuild them after")
+    imp.add_argument("--repair", action="store_true", help="recompute counters after loading")
+    imp.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        for name in args.collections:
+            n = export_collection(name, out / f"{name}.ndjson", batch_size=args.batch_size)
+            print(f"{name}: {n} docs -> {out / f'{name}.ndjson'}")
+    else:
+        n = import_file(
+            args.collection, args.path, fmt=args.format, batch_size=args.batch_size,
+            upsert=args.upsert, defer_indexes=args.defer_indexes, repair=args.repair,
+            restart=args.restart,
+        )
+        print(f"{args.collection}: {n} docs imported")
+
+
+if __name__ == "__main__":
+    main()
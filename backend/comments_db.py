@@ -1,6 +1,8 @@
+import base64
 from datetime import datetime, timezone
 from bson import ObjectId
 from backend.db import get_db
+from backend.query_cache import invalidate_thread, invalidate_threads
 
 
 def _oid(x):
@@ -10,21 +12,71 @@ def _oid(x):
     return ObjectId(str(x))
 
 
-def add_comment(thread_id, author_id, author_display_name, body):
-    """Insert a comment for a given thread."""
-    db = get_db()
-    now = datetime.now(timezone.utc)
+# Replies are stored as a materialized path: `path` is the ids of the
+# comment's ancestors and itself, joined by ".". ObjectId hex strings are
+# fixed-width and (roughly) increase over time, so sorting a thread's comments
+# by path gives display order -- each comment followed by its replies, oldest
+# first -- straight from the (thread_id, path) index. A subtree is the range
+# path > "<p>." and < "<p>/" ("/" sorts right after ".").
+MAX_COMMENT_DEPTH = 8
+_PARENT_PROJECTION = {"thread_id": 1, "parent_id": 1, "path": 1, "depth": 1}
 
-    doc = {
+
+def new_comment_doc(thread_id, author_id, author_display_name, body, parent=None, now=None, comment_id=None):
+    """
+    Build a comment document. `parent` is the parent comment (with
+    _PARENT_PROJECTION fields) or None for a top-level comment. Replies
+    deeper than MAX_COMMENT_DEPTH attach to the parent's parent instead.
+    """
+    now = now or datetime.now(timezone.utc)
+    _id = comment_id or ObjectId()
+    parent_id, path, depth = None, str(_id), 0
+    if parent is not None:
+        parent_path = parent.get("path") or str(parent["_id"])
+        parent_id, depth = parent["_id"], parent.get("depth", 0) + 1
+        if depth >= MAX_COMMENT_DEPTH:
+            parent_id, depth = parent.get("parent_id"), depth - 1
+            parent_path = parent_path.rpartition(".")[0]
+        path = f"{parent_path}.{_id}" if parent_path else str(_id)
+    return {
+        "_id": _id,
         "thread_id": _oid(thread_id),
+        "parent_id": parent_id,
+        "path": path,
+        "depth": depth,
+        "reply_count": 0,
         "author_id": _oid(author_id),
         "author_display_name": author_display_name,
         "body": body.strip(),
         "created_at": now,
         "updated_at": now,
     }
-    res = db.comments.insert_one(doc)
-    doc["_id"] = res.inserted_id
+
+
+def add_comment(thread_id, author_id, author_display_name, body, parent_id=None):
+    """
+    Insert a comment for a given thread, optionally as a reply to `parent_id`.
+    Raises ValueError if the parent isn't a comment on this thread.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+
+    parent = None
+    if parent_id:
+        parent = db.comments.find_one({"_id": _oid(parent_id), "thread_id": _oid(thread_id)}, _PARENT_PROJECTION)
+        if parent is None:
+            raise ValueError("Parent comment not found.")
+
+    doc = new_comment_doc(thread_id, author_id, author_display_name, body, parent, now)
+    db.comments.insert_one(doc)
+    if doc["parent_id"] is not None:
+        db.comments.update_one({"_id": doc["parent_id"]}, {"$inc": {"reply_count": 1}})
+    # Keep the parent thread's denormalized stats current.
+    db.threads.update_one(
+        {"_id": doc["thread_id"]},
+        {"$inc": {"comment_count": 1}, "$max": {"last_activity_at": now}},
+    )
+    invalidate_threads(doc["thread_id"])
     return doc
 
 
@@ -40,16 +92,129 @@ def list_comments(thread_id, limit=50, skip=0):
     return list(cursor)
 
 
+# Keyset paging in display order (path ascending), served by the
+# (thread_id, path) index: page N costs the same as page 1.
+COMMENT_SORT = [("path", 1)]
+# Newest comment in a thread (uses the thread_id/created_at/_id index backwards).
+NEWEST_COMMENT_SORT = [("created_at", -1), ("_id", -1)]
+NEWEST_COMMENT_PROJECTION = {"created_at": 1}
+
+
+def _encode_path_cursor(path):
+    return base64.urlsafe_b64encode(path.encode()).decode().rstrip("=")
+
+
+def _decode_path_cursor(token):
+    try:
+        return base64.urlsafe_b64decode((token + "=" * (-len(token) % 4)).encode()).decode()
+    except Exception as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def comment_page_filter(thread_id, after=None):
+    """Filter for the comments after cursor `after`. Raises ValueError on a bad cursor."""
+    filter_ = {"thread_id": _oid(thread_id)}
+    if after:
+        filter_["path"] = {"$gt": _decode_path_cursor(after)}
+    return filter_
+
+
+def next_comment_cursor(items, limit):
+    """Cursor for the page after `items`, or None if this was the last page."""
+    if len(items) < int(limit):
+        return None
+    return _encode_path_cursor(items[-1]["path"])
+
+
+def list_comments_page(thread_id, limit=50, after=None):
+    """
+    One page of a thread's comment tree in display order (each comment
+    followed by its replies). Returns (comments, next_after); next_after is
+    None on the last page.
+    """
+    db = get_db()
+    cursor = db.comments.find(comment_page_filter(thread_id, after)).sort(COMMENT_SORT).limit(int(limit))
+    items = list(cursor)
+    return items, next_comment_cursor(items, limit)
+
+
+def subtree_filter(comment):
+    """Filter for every reply under `comment` (any depth)."""
+    path = comment.get("path") or str(comment["_id"])
+    return {"thread_id": comment["thread_id"], "path": {"$gt": f"{path}.", "$lt": f"{path}/"}}
+
+
+def list_replies(comment_id, limit=200):
+    """
+    A comment's whole reply subtree in display order, via one index range
+    scan. Returns (comment, replies), or (None, []) if the comment is gone.
+    """
+    db = get_db()
+    comment = db.comments.find_one({"_id": _oid(comment_id)})
+    if comment is None:
+        return None, []
+    replies = db.comments.find(subtree_filter(comment)).sort(COMMENT_SORT).limit(int(limit))
+    return comment, list(replies)
+
+
 def delete_comment(comment_id, author_id):
     """
     Delete a comment.
 
     Minimal permission rule:
     - Only the author can delete their own comment.
+
+    A comment that has replies is blanked and marked `deleted` instead, so
+    its subtree stays attached. A real delete decrements the parent's
+    reply_count and the thread's comment_count, bumps the thread's
+    comments_updated_at (part of the thread page ETag) and, if it was the
+    newest comment, moves last_activity_at back to what remains.
     """
     db = get_db()
-    res = db.comments.delete_one({"_id": _oid(comment_id), "author_id": _oid(author_id)})
-    return res.deleted_count == 1
+    now = datetime.now(timezone.utc)
+    owned = {"_id": _oid(comment_id), "author_id": _oid(author_id)}
+    doc = db.comments.find_one_and_delete(
+        {**owned, "reply_count": {"$not": {"$gt": 0}}},
+        projection={"thread_id": 1, "parent_id": 1, "created_at": 1},
+    )
+    if doc is None:
+        doc = db.comments.find_one_and_update(
+            {**owned, "reply_count": {"$gt": 0}},
+            {"$set": {"body": "", "deleted": True, "updated_at": now}},
+            projection={"thread_id": 1},
+        )
+        if doc is None:
+            return False
+        db.threads.update_one({"_id": doc["thread_id"]}, {"$max": {"comments_updated_at": now}})
+        invalidate_thread(doc["thread_id"])  # counts unchanged: lists stay valid
+        return True
+    if doc.get("parent_id") is not None:
+        db.comments.update_one(
+            {"_id": doc["parent_id"], "reply_count": {"$gt": 0}}, {"$inc": {"reply_count": -1}}
+        )
+    thread = db.threads.find_one_and_update(
+        {"_id": doc["thread_id"], "comment_count": {"$gt": 0}},
+        {"$inc": {"comment_count": -1}, "$max": {"comments_updated_at": now}},
+        projection={"created_at": 1, "last_activity_at": 1},
+    )
+    if thread is not None and thread.get("last_activity_at") == doc.get("created_at"):
+        newest = db.comments.find_one({"thread_id": doc["thread_id"]}, NEWEST_COMMENT_PROJECTION, sort=NEWEST_COMMENT_SORT)
+        db.threads.update_one(
+            {"_id": doc["thread_id"], "last_activity_at": doc["created_at"]},  # unless a comment landed since
+            {"$set": {"last_activity_at": last_activity_without(thread, newest)}},
+        )
+    invalidate_threads(doc["thread_id"])
+    return True
+
+
+def last_activity_without(thread, newest):
+    """
+    A thread's last_activity_at once its newest comment is gone, given the
+    newest remaining one (or None); same rule as repair_comment_stats.
+    """
+    if newest is None:
+        return thread.get("created_at")
+    return max(thread.get("created_at") or newest["created_at"], newest["created_at"])
 
 def update_comment(comment_id, author_id, body):
     """
@@ -61,13 +226,45 @@ def update_comment(comment_id, author_id, body):
     db = get_db()
     now = datetime.now(timezone.utc)
 
-    res = db.comments.update_one(
-        {"_id": _oid(comment_id), "author_id": _oid(author_id)},
+    doc = db.comments.find_one_and_update(
+        {"_id": _oid(comment_id), "author_id": _oid(author_id), "deleted": {"$ne": True}},
         {"$set": {"body": body.strip(), "updated_at": now}},
+        projection={"thread_id": 1},
     )
-    return res.modified_count == 1
+    if doc is None:
+        return False
+    # Edits don't change comment_count/last_activity_at, so record them for the page ETag.
+    db.threads.update_one({"_id": doc["thread_id"]}, {"$max": {"comments_updated_at": now}})
+    invalidate_thread(doc["thread_id"])
+    return True
 
 def ensure_comment_indexes():
     """Create indexes for the comments collection."""
     db = get_db()
-    db.comments.create_index([("thread_id", 1), ("created_at", 1)])
\ No newline at end of file
+    db.comments.create_index([("thread_id", 1), ("created_at", 1), ("_id", 1)])
+    # Display order / reply subtrees (see `path` above).
+    db.comments.create_index([("thread_id", 1), ("path", 1)])
+
+
+def repair_comment_paths():
+    """
+    Give comments from before nested replies (no `path`) a top-level path, and
+    recompute every reply_count from parent_id. Server-side and idempotent.
+    """
+    db = get_db()
+    db.comments.update_many(
+        {"path": {"$exists": False}},
+        [{"$set": {"path": {"$toString": "$_id"}, "depth": 0, "parent_id": None}}],
+    )
+    db.comments.update_many({}, {"$set": {"reply_count": 0}})
+    db.comments.aggregate([
+        {"$match": {"parent_id": {"$ne": None}}},
+        {"$group": {"_id": "$parent_id", "reply_count": {"$sum": 1}}},
+        {"$merge": {"into": "comments", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ])
+    invalidate_threads()
+
+
+if __name__ == "__main__":  # `python -m backend.comments_db` backfills paths / reply counts
+    repair_comment_paths()
+    print("Comment paths and reply counts repaired.")
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from backend import db as db_module
+from backend import feed_db
+from backend.query_cache import query_cache
+
+# test_all_db.py / test_threads_crud.py are scripts against a live mongod;
+# they only run with RUN_LIVE_DB_TESTS=1. Everything else uses the
+# `mongo` fixture (optional `mongomock` package, skipped if missing).
+collect_ignore = [] if os.getenv("RUN_LIVE_DB_TESTS") == "1" else ["test_all_db.py", "test_threads_crud.py"]
+
+
+def _accept_sort(add):
+    # pymongo >= 4.11 passes sort= to bulk builders; mongomock 4.x predates it.
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add(self, *args, **kwargs)
+    return wrapper
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An empty in-memory database behind backend.db.get_db()."""
+    mongomock = pytest.importorskip("mongomock")
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        monkeypatch.setattr(builder, name, _accept_sort(getattr(builder, name)))
+    client = mongomock.MongoClient(tz_aware=True)
+    monkeypatch.setattr(db_module, "get_client", lambda: client)
+    monkeypatch.setattr(feed_db, "FEED_FANOUT_WORKERS", 0)  # deterministic: fan out inline
+    query_cache.clear()
+    yield db_module.get_db()
+    query_cache.clear()
+
+
+@pytest.fixture
+def app(mongo, monkeypatch):
+    from backend import passwords
+    from backend.flask.app import create_app
+
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 0)  # hash inline
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def user(app):
+    """A registered user (password "first-password")."""
+    from backend.users_db import create_user_with_password
+
+    return create_user_with_password("ada@example.com", "first-password", "Ada")
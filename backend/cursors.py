@@ -0,0 +1,32 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+
+# Opaque keyset paging tokens shared by threads_db and feed_db.
+# A token is just (sort key datetime, ObjectId tie-breaker), base64-encoded.
+# The key may be None for docs that lack the sort field ("-" in the token).
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_keyset(key, oid):
+    """(datetime or None, ObjectId) -> opaque token string."""
+    if key is None:
+        ms = "-"
+    else:
+        if key.tzinfo is None:  # pymongo hands back naive UTC datetimes
+            key = key.replace(tzinfo=timezone.utc)
+        ms = (key - _EPOCH) // timedelta(milliseconds=1)
+    raw = f"{ms}:{oid}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_keyset(token):
+    """Opaque token -> (datetime or None, ObjectId). Raises ValueError if malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ms, oid = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        key = None if ms == "-" else _EPOCH + timedelta(milliseconds=int(ms))
+        return key, ObjectId(oid)
+    except Exception as exc:
+        raise ValueError("Invalid cursor.") from exc
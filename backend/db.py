@@ -1,18 +1,285 @@
+import logging
 import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from pathlib import Path
 from pymongo import MongoClient
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]  # repo root
 load_dotenv(ROOT / ".env")
 
 _client = None
+_client_pid = None
+_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+# Commands still waiting for a reply after this long (their connection died
+# without a failed event) are dropped from CommandStats' pending map.
+_PENDING_MAX_AGE_S = 600.0
+
+
+class PoolStats(ConnectionPoolListener):
+    """
+    Counts pymongo CMAP (connection pool) events for this process.
+    `checked_out` is the number of connections currently in use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0
+            self.closed = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.pool_clears = 0
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump(pool_clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._bump(checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._bump(checked_out=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def command_shape(command_name, command):
+    """
+    A loggable summary of a command: its collection plus the structure of its
+    filter/pipeline/sort with every value replaced by "?" (no user data).
+    """
+    def shape(value):
+        if isinstance(value, dict):
+            return {k: shape(v) for k, v in value.items()}
+        if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+            return [shape(v) for v in value]
+        return "?"
+
+    parts = {"cmd": command_name, "coll": command.get(command_name)}
+    for key in ("filter", "query", "pipeline", "sort", "projection"):
+        if key in command:
+            parts[key] = shape(command[key])
+    for key in ("updates", "deletes"):  # write commands: shape of the first statement's query
+        if command.get(key):
+            parts["q"] = shape(command[key][0].get("q", {}))
+    return parts
+
+
+class CommandScope:
+    """Mongo commands issued inside one request (see track_commands)."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()  # repr(shape) -> times issued
+
+    def top(self, n=5):
+        return self.shapes.most_common(n)
+
+
+_command_scope = ContextVar("mongo_command_scope", default=None)
+
+
+class CommandStats(CommandListener):
+    """
+    Counts commands and server time into the current CommandScope (if any)
+    and logs any command slower than MONGO_SLOW_QUERY_MS with its shape.
+    Listener callbacks run on the thread that issued the command, so the
+    scope follows the request that caused it. Shapes are only computed for
+    commands that are in a scope or turn out slow.
+    """
+
+    def __init__(self):
+        # (connection, request id) -> (name, command, started), until the reply
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+
+    def started(self, event):
+        if _command_scope.get() is not None or MONGO_SLOW_QUERY_MS > 0:
+            now = time.monotonic()
+            with self._lock:
+                self._pending[(event.connection_id, event.request_id)] = (event.command_name, event.command, now)
+                if now - self._swept >= _PENDING_MAX_AGE_S:
+                    self._sweep_locked(now)
+
+    def _sweep_locked(self, now):
+        # At most once per _PENDING_MAX_AGE_S, so the scan stays off the hot path.
+        self._swept = now
+        cutoff = now - _PENDING_MAX_AGE_S
+        for key in [key for key, (_, _, started) in self._pending.items() if started < cutoff]:
+            del self._pending[key]
+
+    def _finished(self, event, failed):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        seconds = event.duration_micros / 1e6
+        scope = _command_scope.get()
+        slow = MONGO_SLOW_QUERY_MS > 0 and seconds * 1000 >= MONGO_SLOW_QUERY_MS
+        shape = command_shape(*pending[:2]) if pending is not None and (scope is not None or slow) else None
+        if scope is not None:
+            scope.count += 1
+            scope.seconds += seconds
+            if shape is not None:
+                scope.shapes[repr(shape)] += 1
+        if slow:
+            logger.warning("slow mongo command %.1fms%s: %s", seconds * 1000, " (failed)" if failed else "", shape)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+
+command_stats = CommandStats()
+
+
+def track_commands(scope=None):
+    """Start counting this context's Mongo commands into `scope` (a new CommandScope by default); returns it."""
+    if scope is None:
+        scope = CommandScope()
+    _command_scope.set(scope)
+    return scope
+
+
+def stop_tracking_commands():
+    _command_scope.set(None)
+
+
+def client_options(event_listeners=None):
+    """MongoClient kwargs from env (see env.example); listeners default to this module's stats."""
+    opts = {
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_TIMEOUT_MS", "2000")),  # added timeout for better error handling
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "event_listeners": event_listeners if event_listeners is not None else [pool_stats, command_stats],
+    }
+    if os.getenv("MONGO_MAX_IDLE_TIME_MS"):
+        opts["maxIdleTimeMS"] = int(os.getenv("MONGO_MAX_IDLE_TIME_MS"))
+    if os.getenv("MONGO_COMPRESSORS"):  # e.g. "zstd,snappy,zlib"
+        opts["compressors"] = os.getenv("MONGO_COMPRESSORS")
+    if os.getenv("MONGO_READ_PREFERENCE"):  # e.g. "secondaryPreferred"
+        opts["readPreference"] = os.getenv("MONGO_READ_PREFERENCE")
+    return opts
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+    MongoClient is not fork-safe, so a forked worker (gunicorn) always
+    gets its own client instead of the parent's.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+                _client = MongoClient(mongo_uri, **client_options())
+                _client_pid = pid
+    return _client
+
+
+def _reset_after_fork():
+    # Drop (don't close) the parent's client: its sockets belong to the parent.
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+    pool_stats.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def set_client(client):
+    """Use `client` as this process's MongoClient (benchmarks, tests); None drops it."""
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid() if client is not None else None
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def warm_up(connections=None):
+    """
+    Open `connections` pooled sockets up front (default: MONGO_MIN_POOL_SIZE,
+    at least 1) so the first requests after startup don't pay for the TCP/TLS
+    handshakes. Raises if the server is unreachable.
+    """
+    client = get_client()
+    n = connections or max(1, int(os.getenv("MONGO_MIN_POOL_SIZE", "0")))
+    if n == 1:
+        client.admin.command("ping")
+        return
+    # Concurrent pings force distinct connections to be checked out.
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        list(pool.map(lambda _: client.admin.command("ping"), range(n)))
+
 
 def get_db():
-    global _client
-    if _client is None:
-        mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-        timeout_ms = int(os.getenv("MONGO_TIMEOUT_MS", "2000")) # added timeout for better error handling
-        _client = MongoClient(mongo_uri, serverSelectionTimeoutMS=timeout_ms)
     db_name = os.getenv("DB_NAME", "student_connect")
-    return _client[db_name]
+    return get_client()[db_name]
@@ -0,0 +1,313 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from pymongo import UpdateOne
+try:
+    from .db import get_db
+    from .cursors import decode_keyset, encode_keyset
+    from .user_cache import TTLCache
+except ImportError:  # allows `python backend/feed_db.py`
+    from db import get_db
+    from cursors import decode_keyset, encode_keyset
+    from user_cache import TTLCache
+
+# Home feed = threads from people a user follows (plus their own), newest first.
+#
+# Storage: one `feeds` document per user, `_id` = user_id, holding an `items`
+# array of {thread_id, author_id, created_at} kept sorted newest-first and
+# capped at FEED_MAX_ITEMS by $push/$sort/$slice. Reading a page is a single
+# _id lookup no matter how many people the user follows.
+#
+# Authors with more than FEED_FANOUT_MAX_FOLLOWERS followers are flagged
+# `feed_pull` on their user doc and are *not* fanned out on write; their
+# threads are merged in at read time instead. Threads they posted before the
+# flag flipped are still in followers' feeds, so reads dedupe by thread_id.
+#
+# Follower fan-out runs on a small per-process thread pool, off the request
+# thread; at most FEED_FANOUT_MAX_PENDING fan-outs may be queued, past that the
+# request does its own. FEED_FANOUT_WORKERS=0 fans out inline. A fan-out lost
+# to a crash is repaired by rebuild_feed.
+
+FEED_MAX_ITEMS = int(os.getenv("FEED_MAX_ITEMS", "500"))
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", "5000"))
+FEED_BACKFILL_ITEMS = int(os.getenv("FEED_BACKFILL_ITEMS", "50"))
+FEED_FANOUT_WORKERS = int(os.getenv("FEED_FANOUT_WORKERS", "2"))
+FEED_FANOUT_MAX_PENDING = int(os.getenv("FEED_FANOUT_MAX_PENDING", "100"))
+_FANOUT_BATCH = 1000
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, FEED_FANOUT_MAX_PENDING))
+
+# The set of pull authors is tiny and changes rarely; don't re-read it per request.
+_pull_authors_cache = TTLCache(maxsize=1, ttl=60)
+
+
+def _oid(x):
+    """Convert a string/ObjectId into ObjectId."""
+    if isinstance(x, ObjectId):
+        return x
+    return ObjectId(str(x))
+
+
+def _entry(thread):
+    return {
+        "thread_id": thread["_id"],
+        "author_id": thread["author_id"],
+        "created_at": thread["created_at"],
+    }
+
+
+def _push(entries):
+    # $push modifier that keeps `items` sorted newest-first and capped.
+    return {
+        "$push": {
+            "items": {
+                "$each": entries,
+                "$sort": {"created_at": -1, "thread_id": -1},
+                "$slice": FEED_MAX_ITEMS,
+            }
+        }
+    }
+
+
+def _pull_author_ids():
+    ids = _pull_authors_cache.get("ids")
+    if ids is None:
+        db = get_db()
+        ids = [d["_id"] for d in db.users.find({"feed_pull": True}, {"_id": 1})]
+        _pull_authors_cache.set("ids", ids)
+    return ids
+
+
+def _is_pull_author(author_id):
+    """
+    True if `author_id` has too many followers to fan out to.
+    Reads the follower_count counter kept on the user doc by follows_db.
+    """
+    db = get_db()
+    user = db.users.find_one({"_id": author_id}, {"feed_pull": 1, "follower_count": 1})
+    if not user:
+        return False
+    if user.get("feed_pull"):
+        return True
+    if user.get("follower_count", 0) > FEED_FANOUT_MAX_FOLLOWERS:
+        db.users.update_one({"_id": author_id}, {"$set": {"feed_pull": True}})
+        _pull_authors_cache.clear()
+        return True
+    return False
+
+
+def _get_pool():
+    # One pool per process; a forked gunicorn worker never reuses its parent's.
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(max_workers=FEED_FANOUT_WORKERS, thread_name_prefix="feed-fanout")
+                _pool_pid = pid
+    return _pool
+
+
+def _fan_out_to_followers(author_id, update):
+    db = get_db()
+    if _is_pull_author(author_id):
+        return
+    batch = []
+    for edge in db.follows.find({"followee_id": author_id}, {"follower_id": 1}):
+        batch.append(UpdateOne({"_id": edge["follower_id"]}, update, upsert=True))
+        if len(batch) >= _FANOUT_BATCH:
+            db.feeds.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        db.feeds.bulk_write(batch, ordered=False)
+
+
+def _fan_out_in_background(author_id, update):
+    try:
+        _fan_out_to_followers(author_id, update)
+    finally:
+        _slots.release()
+
+
+def fan_out_thread(thread):
+    """
+    Push a newly created thread into its author's feed now and (for normal
+    authors) every follower's feed in the background. Called from
+    threads_db.create_thread.
+    """
+    db = get_db()
+    entry = _entry(thread)
+    author_id = entry["author_id"]
+    update = _push([entry])
+
+    db.feeds.update_one({"_id": author_id}, update, upsert=True)
+    if FEED_FANOUT_WORKERS > 0 and _slots.acquire(blocking=False):
+        try:
+            _get_pool().submit(_fan_out_in_background, author_id, update)
+            return
+        except RuntimeError:  # pool shut down (interpreter exit)
+            _slots.release()
+    _fan_out_to_followers(author_id, update)
+
+
+def backfill_follow(follower_id, followee_id, limit=None):
+    """
+    Seed a follower's feed with the followee's most recent threads after a new
+    follow. Pull authors are skipped (their threads are merged at read time).
+    """
+    db = get_db()
+    followee_id = _oid(followee_id)
+    if _is_pull_author(followee_id):
+        return 0
+    recent = list(
+        db.threads.find(
+            {"author_id": followee_id},
+            {"author_id": 1, "created_at": 1},
+        )
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(int(limit or FEED_BACKFILL_ITEMS))
+    )
+    if not recent:
+        return 0
+    db.feeds.update_one(
+        {"_id": _oid(follower_id)}, _push([_entry(t) for t in recent]), upsert=True
+    )
+    return len(recent)
+
+
+def remove_followee(follower_id, followee_id):
+    """Drop a followee's threads from a follower's feed after an unfollow."""
+    db = get_db()
+    db.feeds.update_one(
+        {"_id": _oid(follower_id)},
+        {"$pull": {"items": {"author_id": _oid(followee_id)}}},
+    )
+
+
+def rebuild_feed(user_id):
+    """
+    Recompute a user's feed from scratch (own threads + non-pull followees).
+    Maintenance/repair only; the write path keeps feeds current.
+    """
+    db = get_db()
+    user_id = _oid(user_id)
+    pull = set(_pull_author_ids())
+    authors = [user_id] + [
+        e["followee_id"]
+        for e in db.follows.find({"follower_id": user_id}, {"followee_id": 1})
+        if e["followee_id"] not in pull
+    ]
+    recent = (
+        db.threads.find({"author_id": {"$in": authors}}, {"author_id": 1, "created_at": 1})
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(FEED_MAX_ITEMS)
+    )
+    items = [_entry(t) for t in recent]
+    db.feeds.replace_one({"_id": user_id}, {"_id": user_id, "items": items}, upsert=True)
+    return len(items)
+
+
+def _feed_entries(user_id, limit, after):
+    # One _id lookup; keyset filter + slice happen server-side.
+    db = get_db()
+    items = "$items"
+    if after:
+        key, oid = decode_keyset(after)
+        items = {
+            "$filter": {
+                "input": "$items",
+                "as": "e",
+                "cond": {
+                    "$or": [
+                        {"$lt": ["$$e.created_at", key]},
+                        {"$and": [
+                            {"$eq": ["$$e.created_at", key]},
+                            {"$lt": ["$$e.thread_id", oid]},
+                        ]},
+                    ]
+                },
+            }
+        }
+    docs = list(db.feeds.aggregate([
+        {"$match": {"_id": user_id}},
+        {"$project": {"_id": 0, "items": {"$slice": [items, int(limit)]}}},
+    ]))
+    return docs[0]["items"] if docs else []
+
+
+def _pulled_entries(user_id, limit, after):
+    # Fan-out-on-read part: threads by followed high-follower authors.
+    pull = [a for a in _pull_author_ids() if a != user_id]
+    if not pull:
+        return []
+    db = get_db()
+    followed = [
+        e["followee_id"]
+        for e in db.follows.find(
+            {"follower_id": user_id, "followee_id": {"$in": pull}}, {"followee_id": 1}
+        )
+    ]
+    if not followed:
+        return []
+    filter_ = {"author_id": {"$in": followed}}
+    if after:
+        key, oid = decode_keyset(after)
+        filter_["$or"] = [
+            {"created_at": {"$lt": key}},
+            {"created_at": key, "_id": {"$lt": oid}},
+        ]
+    cursor = (
+        db.threads.find(filter_, {"author_id": 1, "created_at": 1})
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(int(limit))
+    )
+    return [_entry(t) for t in cursor]
+
+
+def get_feed(user_id, limit=20, after=None, projection=None):
+    """
+    Return (threads, next_after) for a user's home feed, newest first.
+    `after` is the `next_after` token from the previous page.
+    Threads deleted since they were fanned out are silently skipped.
+    """
+    db = get_db()
+    user_id = _oid(user_id)
+    limit = int(limit)
+
+    stored = _feed_entries(user_id, limit, after)
+    pulled = _pulled_entries(user_id, limit, after)
+    merged = sorted(stored + pulled, key=lambda e: (e["created_at"], e["thread_id"]), reverse=True)
+    entries, seen = [], set()
+    for e in merged:
+        # A pull author's older threads can be both stored and pulled.
+        if e["thread_id"] not in seen:
+            seen.add(e["thread_id"])
+            entries.append(e)
+    entries = entries[:limit]
+
+    next_after = None
+    if entries and (len(entries) == limit or len(stored) == limit or len(pulled) == limit):
+        last = entries[-1]
+        next_after = encode_keyset(last["created_at"], last["thread_id"])
+
+    ids = [e["thread_id"] for e in entries]
+    by_id = {t["_id"]: t for t in db.threads.find({"_id": {"$in": ids}}, projection)}
+    return [by_id[i] for i in ids if i in by_id], next_after
+
+
+def ensure_feed_indexes():
+    """Feeds are keyed by _id; pull-author lookups use a sparse flag index."""
+    db = get_db()
+    db.users.create_index([("feed_pull", 1)], sparse=True)
+    db.threads.create_index([("author_id", 1), ("created_at", -1), ("_id", -1)])
+
+
+if __name__ == "__main__":  # `python -m backend.feed_db <user_id> [...]` rebuilds feeds
+    import sys
+
+    for uid in sys.argv[1:]:
+        print(uid, "feed items:", rebuild_feed(uid))
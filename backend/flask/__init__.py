@@ -1,7 +1,8 @@
 """Flask API package.
 
 Run with:
-  flask --app backend.flask.app:create_app run
+  flask --app backend.flask.app:create_app run            (development)
+  gunicorn -c gunicorn.conf.py backend.flask.wsgi:app     (production)
 """
 
 __all__ = []
@@ -2,18 +2,38 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from datetime import datetime
 from typing import Any
 
 from bson import ObjectId
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from bson.errors import InvalidId
+from flask import Flask, jsonify, render_template, request, send_from_directory, stream_template
 from flask_login import LoginManager, current_user, login_required
-from werkzeug.exceptions import BadRequest, HTTPException, NotFound
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound, ServiceUnavailable
 
+from backend.flask.async_api import bp as async_api_bp
 from backend.flask.auth import bp as auth_bp
-from backend.flask.auth import ensure_user_indexes, load_user_by_id
-from backend.db import get_db
+from backend.flask.auth import ensure_user_indexes, load_session_user, load_user_from_token, refresh_claims
+from backend.flask.http_cache import (
+    LIST_CACHE_CONTROL,
+    PAGE_CACHE_CONTROL,
+    THREAD_CACHE_CONTROL,
+    list_etag,
+    not_modified,
+    thread_etag,
+    thread_with_comments_etag,
+    with_cache_headers,
+)
+from backend.flask.json_provider import BSONJSONProvider
+from backend.flask.timing import init_app as init_timing
+from backend.passwords import HashingBusy
+from backend.aio.db import pool_stats as aio_pool_stats
+from backend.db import get_db, pool_stats, warm_up
+from backend.query_cache import query_cache
+from backend.tags_db import top_tags
+from backend.typeahead import tag_suggester, user_suggester
+from backend.user_cache import user_cache
 from backend.users_db import (
+    PUBLIC_USER_PROJECTION,
     get_user,
     get_user_by_email,
     update_user_account,
@@ -24,40 +44,81 @@ from backend.threads_db import (
     create_thread,
     delete_thread,
     get_thread,
+    get_thread_with_comments,
     list_threads,
+    SORTS,
+    next_cursor,
     search_threads,
+    search_threads_ranked,
+    thread_projection,
     update_thread,
 )
 
+from backend.follows_db import follow, list_followers_users, list_following_users, unfollow
+from backend.feed_db import backfill_follow, get_feed, remove_followee
+
 from backend.comments_db import (
-    list_comments,
+    list_comments_page,
+    list_replies,
+    next_comment_cursor,
     add_comment,
     update_comment,
     delete_comment,
 )
 
 
-def _to_jsonable(value: Any) -> Any:
-    # Normalize Mongo/Datetime values so jsonify can serialize them.
-    if isinstance(value, ObjectId):
-        return str(value)
-    if isinstance(value, datetime):
-        return value.isoformat()
-    if isinstance(value, list):
-        return [_to_jsonable(v) for v in value]
-    if isinstance(value, dict):
-        return {k: _to_jsonable(v) for k, v in value.items()}
-    return value
+# Thread pages stream comments COMMENT_PAGE_SIZE at a time, up to
+# THREAD_PAGE_MAX_COMMENTS per page view (then link to the next page).
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "50"))
+THREAD_PAGE_MAX_COMMENTS = int(os.getenv("THREAD_PAGE_MAX_COMMENTS", "500"))
+_STREAM_CHUNK_CHARS = 8192
 
 
 def _json(payload: Any, status: int = 200):
-    return jsonify(_to_jsonable(payload)), status
+    # ObjectId/datetime are handled by BSONJSONProvider while encoding.
+    return jsonify(payload), status
+
+
+CORS_ALLOWED_ORIGINS = {
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ALLOWED_ORIGINS",
+        "http://127.0.0.1:5500,http://localhost:5500",
+    ).split(",")
+    if origin.strip()
+}
+
+
+def cors_headers(origin: str | None) -> dict[str, str]:
+    """CORS headers for a request from `origin` (none unless it's trusted in env config)."""
+    if not origin or origin not in CORS_ALLOWED_ORIGINS:
+        return {}
+    return {
+        "Access-Control-Allow-Origin": origin,
+        "Access-Control-Allow-Credentials": "true",
+        "Access-Control-Allow-Headers": "Content-Type, Authorization",
+        "Access-Control-Allow-Methods": "GET, POST, PATCH, DELETE, OPTIONS",
+    }
 
 
 def _csv_to_list(raw: str) -> list[str]:
     return [item.strip() for item in raw.split(",") if item.strip()]
 
 
+def _buffered(chunks, size: int = _STREAM_CHUNK_CHARS):
+    # Jinja streams tiny fragments; send them in ~size-character writes.
+    buf: list[str] = []
+    n = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        n += len(chunk)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+
 def _list_to_csv(value: Any) -> str:
     if isinstance(value, list):
         return ", ".join(str(item).strip() for item in value if str(item).strip())
@@ -132,42 +193,51 @@ def create_app() -> Flask:
         static_folder=str(project_root / "public"),
         static_url_path="",
     )
+    app.json = BSONJSONProvider(app)
     app.config["JSON_SORT_KEYS"] = False
     app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
-    cors_origins = {
-        origin.strip()
-        for origin in os.getenv(
-            "CORS_ALLOWED_ORIGINS",
-            "http://127.0.0.1:5500,http://localhost:5500",
-        ).split(",")
-        if origin.strip()
-    }
+    # Registered first so its after_request hook runs last and sees the whole request.
+    init_timing(app)
 
     @app.after_request
     def _add_cors_headers(response):
-        # Only echo trusted origins from env config.
-        origin = request.headers.get("Origin")
-        if origin and origin in cors_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PATCH, DELETE, OPTIONS"
-            response.headers["Vary"] = "Origin"
+        headers = cors_headers(request.headers.get("Origin"))
+        if headers:
+            response.headers.update(headers)
+            response.vary.add("Origin")
         return response
 
+    if os.getenv("MONGO_WARM_UP", "0") == "1":
+        # Open pooled connections before the first request arrives.
+        warm_up()
+
     login_manager = LoginManager()
     login_manager.init_app(app)
 
     @login_manager.user_loader
     def _user_loader(user_id: str):
-        return load_user_by_id(user_id)
+        return load_session_user(user_id)
+
+    @login_manager.request_loader
+    def _request_loader(req):
+        return load_user_from_token(req)
 
     @app.errorhandler(HTTPException)
     def _handle_http_exception(exc: HTTPException):
-        return _json({"ok": False, "error": exc.description}, exc.code or 500)
+        response, status = _json({"ok": False, "error": exc.description}, exc.code or 500)
+        # Keep headers such as Retry-After (429/503) and Allow (405).
+        for key, value in exc.get_headers():
+            if key.lower() != "content-type":
+                response.headers[key] = value
+        return response, status
+
+    @app.errorhandler(HashingBusy)
+    def _handle_hashing_busy(exc: HashingBusy):
+        return _handle_http_exception(ServiceUnavailable(str(exc), retry_after=1))
 
     @app.errorhandler(Exception)
     def _handle_uncaught_exception(exc: Exception):
+        app.logger.exception("Unhandled error on %s %s", request.method, request.path)
         return _json({"ok": False, "error": str(exc)}, 500)
 
     @app.get("/api/health")
@@ -175,7 +245,14 @@ def create_app() -> Flask:
         # Lightweight DB connectivity probe.
         db = get_db()
         db.client.admin.command("ping")
-        return _json({"ok": True, "db": db.name})
+        return _json({
+            "ok": True,
+            "db": db.name,
+            "pool": pool_stats.snapshot(),
+            "async_pool": aio_pool_stats.snapshot(),
+            "query_cache": query_cache.stats(),
+            "user_cache": user_cache.stats(),
+        })
 
     @app.get("/")
     def signup_page():
@@ -188,24 +265,64 @@ def create_app() -> Flask:
         return send_from_directory(project_root / "img", filename)
 
     app.register_blueprint(auth_bp, url_prefix="/api")
+    app.register_blueprint(async_api_bp, url_prefix="/api/async")
 
     @app.get("/api/threads")
     def api_list_threads():
         # Supports pagination and optional text/tag filtering.
+        # Prefer `after` (cursor from `next_after`); `skip` is kept for older clients.
         limit = request.args.get("limit", default=20, type=int)
         skip = request.args.get("skip", default=0, type=int)
+        after = request.args.get("after", default=None, type=str)
         q = request.args.get("q", default=None, type=str)
         tag = request.args.get("tag", default=None, type=str)
+        fields = _csv_to_list(request.args.get("fields") or "")
+        sort = request.args.get("sort", default="recent", type=str)
 
         limit = max(1, min(int(limit), 100))
-        skip = max(0, int(skip))
-
-        if q or tag:
-            threads = search_threads(q=q, tag=tag, limit=limit, skip=skip)
-        else:
-            threads = list_threads(limit=limit, skip=skip)
+        skip = 0 if after else max(0, int(skip))
+        if sort not in SORTS:
+            raise BadRequest(f"sort must be one of: {', '.join(SORTS)}.")
+        if sort == "relevance" and not q:
+            raise BadRequest("sort=relevance requires q.")
+        if sort == "relevance" and after:
+            raise BadRequest("sort=relevance pages by skip, not after.")
 
-        return _json({"items": threads, "limit": limit, "skip": skip})
+        try:
+            projection = thread_projection(fields)
+        except ValueError as exc:
+            raise BadRequest(str(exc)) from exc
+
+        def _query():
+            if sort == "relevance":
+                return search_threads_ranked(q=q, tag=tag, limit=limit, skip=skip, projection=projection)
+            if q or tag:
+                return search_threads(
+                    q=q, tag=tag, limit=limit, skip=skip, after=after, projection=projection, sort=sort
+                )
+            return list_threads(limit=limit, skip=skip, after=after, projection=projection, sort=sort)
+
+        args = {"q": q, "tag": tag, "limit": limit, "skip": skip, "after": after,
+                "fields": ",".join(fields), "sort": sort}
+        try:
+            threads = query_cache.get_or_compute("api_threads", args, ["threads"], _query)
+        except ValueError as exc:
+            raise BadRequest("Invalid cursor.") from exc
+
+        # Same URL + same (ids, versions) on the page -> same body.
+        etag = list_etag(threads)
+        cached = not_modified(etag, LIST_CACHE_CONTROL)
+        if cached is not None:
+            return cached
+
+        response = jsonify({
+            "items": threads,
+            "limit": limit,
+            "skip": skip,
+            "sort": sort,
+            "next_after": None if sort == "relevance" else next_cursor(threads, limit, sort),
+        })
+        return with_cache_headers(response, etag, LIST_CACHE_CONTROL)
 
     @app.post("/api/threads")
     @login_required
@@ -220,47 +337,257 @@ def create_app() -> Flask:
         author_id = current_user.id
         author_display_name = current_user.display_name or current_user.email
 
-        thread = create_thread(
-            author_id=author_id,
-            author_display_name=author_display_name,
-            title=title,
-            body=body,
-            tags=data.get("tags"),
-            photo_ids=data.get("photo_ids"),
-        )
+        try:
+            thread = create_thread(
+                author_id=author_id,
+                author_display_name=author_display_name,
+                title=title,
+                body=body,
+                tags=data.get("tags"),
+                photo_ids=data.get("photo_ids"),
+            )
+        except ValueError as exc:
+            raise BadRequest(str(exc)) from exc
         return _json(thread, 201)
 
     @app.get("/api/threads/<thread_id>")
     def api_get_thread(thread_id: str):
-        # Return one thread by id.
+        # Return one thread by id; `?include=comments` embeds the first page of comments.
+        include = _csv_to_list(request.args.get("include") or "")
         try:
-            thread = get_thread(thread_id)
+            if "comments" in include:
+                limit = request.args.get("comment_limit", default=50, type=int)
+                limit = max(1, min(int(limit), 200))
+                thread = query_cache.get_or_compute(
+                    "thread_with_comments", {"id": thread_id, "limit": limit}, [f"thread:{thread_id}"],
+                    lambda: get_thread_with_comments(thread_id, comment_limit=limit),
+                )
+            else:
+                thread = query_cache.get_or_compute(
+                    "thread", {"id": thread_id}, [f"thread:{thread_id}"],
+                    lambda: get_thread(thread_id),
+                )
         except Exception as exc:
             raise BadRequest("Invalid thread_id.") from exc
 
-        if not thread:              
+        if not thread:
             raise NotFound("Thread not found.")
-        return _json(thread)
+
+        if "comments" in include:
+            etag = thread_with_comments_etag(thread, thread["comments"], "comments", limit)
+            # Continue with /api/threads/<id>/comments?after=...
+            thread["comments_next_after"] = next_comment_cursor(thread["comments"], limit)
+        else:
+            etag = thread_etag(thread)
+        cached = not_modified(etag, THREAD_CACHE_CONTROL)
+        if cached is not None:
+            return cached
+        return with_cache_headers(jsonify(thread), etag, THREAD_CACHE_CONTROL)
+
+    @app.get("/api/threads/<thread_id>/comments")
+    def api_list_comments(thread_id: str):
+        # Keyset-paginated comments in display order (replies under their parent);
+        # pass `next_after` back as `after`.
+        limit = request.args.get("limit", default=COMMENT_PAGE_SIZE, type=int)
+        after = request.args.get("after", default=None, type=str)
+        limit = max(1, min(int(limit), 200))
+        try:
+            comments, next_after = query_cache.get_or_compute(
+                "comments_page", {"id": thread_id, "limit": limit, "after": after}, [f"thread:{thread_id}"],
+                lambda: list_comments_page(thread_id, limit=limit, after=after),
+            )
+        except ValueError as exc:  # bad cursor
+            raise BadRequest(str(exc)) from exc
+        except Exception as exc:
+            raise BadRequest("Invalid thread_id.") from exc
+        return _json({"items": comments, "limit": limit, "next_after": next_after})
+
+    @app.get("/api/comments/<comment_id>/replies")
+    def api_list_replies(comment_id: str):
+        # A comment's whole reply tree in display order (one index range scan).
+        limit = request.args.get("limit", default=200, type=int)
+        limit = max(1, min(int(limit), 1000))
+        try:
+            comment, replies = list_replies(comment_id, limit=limit)
+        except InvalidId as exc:
+            raise BadRequest("Invalid comment_id.") from exc
+        if comment is None:
+            raise NotFound("Comment not found.")
+        return _json({"comment": comment, "items": replies, "limit": limit})
 
     @app.get("/t/<thread_id>")
     def page_thread(thread_id: str):
+        # The thread and its first page of comments come from one aggregation;
+        # later pages are fetched while the HTML streams out, so a big thread
+        # doesn't delay the first byte. `?after=` starts further into the thread.
+        after = request.args.get("after") or None
         try:
-            thread = get_thread(thread_id)
+            if after:
+                thread = query_cache.get_or_compute(
+                    "thread", {"id": thread_id}, [f"thread:{thread_id}"],
+                    lambda: get_thread(thread_id),
+                )
+            else:
+                thread = query_cache.get_or_compute(
+                    "thread_with_comments", {"id": thread_id, "limit": COMMENT_PAGE_SIZE}, [f"thread:{thread_id}"],
+                    lambda: get_thread_with_comments(thread_id, comment_limit=COMMENT_PAGE_SIZE),
+                )
         except Exception as exc:
             raise BadRequest("Invalid thread_id.") from exc
 
         if not thread:
             raise NotFound("Thread not found.")
 
-        comments = list_comments(thread_id, limit=200, skip=0)  # 你已有 comments_db.list_comments
+        first = thread.pop("comments", None)
+        viewer = current_user.id if current_user.is_authenticated else ""
+
+        # comment_count/last_activity_at/comments_updated_at change with any
+        # comment write, so the thread doc alone versions the whole page.
+        # The page shows owner-only controls, so the viewer is part of the ETag.
+        etag = thread_etag(thread, "page", viewer, after or "")
+        cached = not_modified(etag, PAGE_CACHE_CONTROL)
+        if cached is not None:
+            cached.vary.add("Cookie")
+            return cached
+
+        if first is None:
+            try:
+                first, next_after = list_comments_page(thread_id, limit=COMMENT_PAGE_SIZE, after=after)
+            except ValueError as exc:
+                raise BadRequest("Invalid cursor.") from exc
+        else:
+            next_after = next_comment_cursor(first, COMMENT_PAGE_SIZE)
+
+        more = {"after": None}  # filled in once the last comment has been rendered
+
+        def comments():
+            yield from first
+            cursor, shown = next_after, len(first)
+            while cursor and shown < THREAD_PAGE_MAX_COMMENTS:
+                page, cursor = list_comments_page(thread_id, limit=COMMENT_PAGE_SIZE, after=cursor)
+                yield from page
+                shown += len(page)
+            more["after"] = cursor
+
         is_owner = current_user.is_authenticated and str(current_user.id) == str(thread.get("author_id"))
 
-        return render_template(
-            "thread.html",
-            thread=thread,
-            comments=comments,
-            is_owner=is_owner,
+        response = app.response_class(
+            _buffered(stream_template(
+                "thread.html",
+                thread=thread,
+                comments=comments(),
+                is_owner=is_owner,
+                after=after,
+                more=more,
+            )),
+            mimetype="text/html",
         )
+        return with_cache_headers(response, etag, PAGE_CACHE_CONTROL, vary_cookie=True)
+
+    @app.get("/api/feed")
+    @login_required
+    def api_feed():
+        # Threads from people the current user follows, newest first.
+        limit = request.args.get("limit", default=20, type=int)
+        after = request.args.get("after", default=None, type=str)
+        fields = _csv_to_list(request.args.get("fields") or "")
+        limit = max(1, min(int(limit), 100))
+
+        try:
+            projection = thread_projection(fields)
+        except ValueError as exc:
+            raise BadRequest(str(exc)) from exc
+
+        try:
+            items, next_after = get_feed(current_user.id, limit=limit, after=after, projection=projection)
+        except ValueError as exc:
+            raise BadRequest("Invalid cursor.") from exc
+
+        return _json({"items": items, "limit": limit, "next_after": next_after})
+
+    @app.post("/api/users/<user_id>/follow")
+    @login_required
+    def api_follow(user_id: str):
+        if user_id == current_user.id:
+            raise BadRequest("You can't follow yourself.")
+        try:
+            target = get_user(user_id)
+        except Exception as exc:
+            raise BadRequest("Invalid user_id.") from exc
+        if not target:
+            raise NotFound("User not found.")
+
+        created = follow(current_user.id, target["_id"]) is not None
+        if created:
+            backfill_follow(current_user.id, target["_id"])
+        return _json({"ok": True, "created": created})
+
+    def _suggest(suggester):
+        # Served from memory; fires on every keystroke.
+        prefix = (request.args.get("prefix") or "").strip()
+        limit = request.args.get("limit", default=10, type=int)
+        limit = max(1, min(int(limit), 50))
+        if not prefix:
+            return _json({"items": []})
+        return _json({"items": suggester.suggest(prefix, limit=limit)})
+
+    @app.get("/api/tags")
+    def api_top_tags():
+        # Most used tags with thread counts (indexed read on `tags`).
+        limit = request.args.get("limit", default=20, type=int)
+        limit = max(1, min(int(limit), 200))
+        tags = query_cache.get_or_compute("top_tags", {"limit": limit}, ["threads"], lambda: top_tags(limit))
+        return _json({"items": [{"tag": t["_id"], "count": t["count"]} for t in tags]})
+
+    @app.get("/api/tags/suggest")
+    def api_suggest_tags():
+        return _suggest(tag_suggester)
+
+    @app.get("/api/users/suggest")
+    @login_required
+    def api_suggest_users():
+        # Signed-in only: an open prefix lookup would let anyone walk the user list.
+        return _suggest(user_suggester)
+
+    @app.get("/api/users/<user_id>")
+    def api_get_user(user_id: str):
+        # Public profile, including the cached follower/following counts.
+        try:
+            doc = get_user(user_id, projection=PUBLIC_USER_PROJECTION)
+        except Exception as exc:
+            raise BadRequest("Invalid user_id.") from exc
+        if not doc:
+            raise NotFound("User not found.")
+        return _json(doc)
+
+    def _follow_page(list_fn, user_id: str):
+        limit = request.args.get("limit", default=50, type=int)
+        after = request.args.get("after", default=None, type=str)
+        limit = max(1, min(int(limit), 100))
+        try:
+            items, next_after = list_fn(user_id, limit=limit, after=after)
+        except Exception as exc:
+            raise BadRequest("Invalid user_id or cursor.") from exc
+        return _json({"items": items, "limit": limit, "next_after": next_after})
+
+    @app.get("/api/users/<user_id>/followers")
+    def api_list_followers(user_id: str):
+        return _follow_page(list_followers_users, user_id)
+
+    @app.get("/api/users/<user_id>/following")
+    def api_list_following(user_id: str):
+        return _follow_page(list_following_users, user_id)
+
+    @app.delete("/api/users/<user_id>/follow")
+    @login_required
+    def api_unfollow(user_id: str):
+        try:
+            removed = unfollow(current_user.id, user_id)
+        except Exception as exc:
+            raise BadRequest("Invalid user_id.") from exc
+        if removed:
+            remove_followee(current_user.id, user_id)
+        return _json({"ok": True, "removed": removed})
 
     @app.patch("/api/threads/<thread_id>")
     @login_required
@@ -271,6 +598,8 @@ def create_app() -> Flask:
 
         try:
             ok = update_thread(thread_id=thread_id, author_id=current_user.id, patch=patch)
+        except ValueError as exc:  # malformed tags
+            raise BadRequest(str(exc)) from exc
         except Exception as exc:
             raise BadRequest("Invalid thread_id.") from exc
 
@@ -292,238 +621,246 @@ def create_app() -> Flask:
 
         return _json({"ok": True})
 
-    return app
-
-
-app = create_app()
-
-@app.get("/login")
-def login_page():
-    return render_template("login.html")
-
+    @app.get("/login")
+    def login_page():
+        return render_template("login.html")
 
-@app.get("/setup")
-@login_required
-def setup_page():
-    return render_template(
-        "setup.html",
-        **_profile_template_context(
-            user_id=current_user.id,
-            page_mode="setup",
-            account_status=request.args.get("account_status"),
-            profile_status=request.args.get("profile_status"),
-        ),
-    )
+    @app.get("/setup")
+    @login_required
+    def setup_page():
+        return render_template(
+            "setup.html",
+            **_profile_template_context(
+                user_id=current_user.id,
+                page_mode="setup",
+                account_status=request.args.get("account_status"),
+                profile_status=request.args.get("profile_status"),
+            ),
+        )
 
+    @app.post("/setup")
+    @login_required
+    def setup_submit():
+        return _submit_profile_form()
 
-@app.post("/setup")
-@login_required
-def setup_submit():
-    return _submit_profile_form()
+    @app.get("/profile")
+    @login_required
+    def profile_page():
+        return render_template(
+            "profile.html",
+            **_profile_template_context(
+                user_id=current_user.id,
+                page_mode="profile",
+                account_status=request.args.get("account_status"),
+                profile_status=request.args.get("profile_status"),
+            ),
+        )
 
+    @app.post("/profile/setup")
+    @login_required
+    def profile_setup():
+        return _submit_profile_form()
 
-@app.get("/profile")
-@login_required
-def profile_page():
-    return render_template(
-        "profile.html",
-        **_profile_template_context(
+    @app.post("/profile/account")
+    @login_required
+    def account_update():
+        display_name = (request.form.get("display_name") or "").strip()
+        email = (request.form.get("email") or "").strip().lower()
+        # A blank password field means "unchanged"; update_user_account skips hashing then.
+        password = request.form.get("password") or ""
+        next_page = (request.form.get("next") or "profile").strip().lower()
+
+        if not display_name or not email:
+            raise BadRequest("display_name and email are required.")
+
+        existing = get_user_by_email(email)
+        if existing and str(existing["_id"]) != str(current_user.id):
+            if next_page == "setup":
+                return render_template("redirect.html", to="/setup?account_status=email_taken")
+            return render_template("redirect.html", to="/profile?account_status=email_taken")
+
+        ok = update_user_account(
             user_id=current_user.id,
-            page_mode="profile",
-            account_status=request.args.get("account_status"),
-            profile_status=request.args.get("profile_status"),
-        ),
-    )
-
+            patch={
+                "display_name": display_name,
+                "email": email,
+                "password": password,
+            },
+        )
+        if not ok:
+            raise NotFound("User not found.")
+        refresh_claims(current_user.id)
 
-@app.post("/profile/setup")
-@login_required
-def profile_setup():
-    return _submit_profile_form()
+        if next_page == "setup":
+            return render_template("redirect.html", to="/setup?account_status=saved")
+        return render_template("redirect.html", to="/profile?account_status=saved")
 
+    @app.get("/logout")
+    @login_required
+    def logout_page():
+        return render_template("logout.html")
 
-@app.post("/profile/account")
-@login_required
-def account_update():
-    display_name = (request.form.get("display_name") or "").strip()
-    email = (request.form.get("email") or "").strip().lower()
-    password = request.form.get("password") or ""
-    next_page = (request.form.get("next") or "profile").strip().lower()
+    @app.get("/dashboard")
+    @login_required
+    def dashboard_page():
+        # Optional: allow browsing even if not logged in
+        q = request.args.get("q")
+        tag = request.args.get("tag")
+        after = request.args.get("after")
+        sort = request.args.get("sort") or "recent"
+        if sort not in SORTS or (sort == "relevance" and not q):
+            sort = "recent"
+        # The list only renders summary fields, so don't pull full bodies.
+        projection = thread_projection("summary")
+
+        def _render():
+            # Nothing user-specific on this page, so the rendered HTML is shared.
+            if sort == "relevance":
+                items = search_threads_ranked(q=q, tag=tag, limit=50, projection=projection)
+            elif q or tag:
+                items = search_threads(
+                    q=q, tag=tag, limit=50, skip=0, after=after, projection=projection, sort=sort
+                )
+            else:
+                items = list_threads(limit=50, skip=0, after=after, projection=projection, sort=sort)
+            return render_template(
+                "dashboard.html",
+                threads=items,
+                q=q or "",
+                tag=tag or "",
+                sort=sort,
+                next_after=None if sort == "relevance" else next_cursor(items, 50, sort),
+            )
+
+        args = {"q": q or "", "tag": tag or "", "after": after or "", "sort": sort}
+        try:
+            return query_cache.get_or_compute("dashboard", args, ["threads"], _render)
+        except ValueError as exc:
+            raise BadRequest("Invalid cursor.") from exc
 
-    if not display_name or not email:
-        raise BadRequest("display_name and email are required.")
+    @app.route("/t/new", methods=["GET", "POST"])
+    @login_required
+    def thread_new_page():
+        if request.method == "GET":
+            return render_template("thread_form.html", mode="new", thread=None)
 
-    existing = get_user_by_email(email)
-    if existing and str(existing["_id"]) != str(current_user.id):
-        if next_page == "setup":
-            return render_template("redirect.html", to="/setup?account_status=email_taken")
-        return render_template("redirect.html", to="/profile?account_status=email_taken")
+        title = (request.form.get("title") or "").strip()
+        body = (request.form.get("body") or "").strip()
+        tags_raw = (request.form.get("tags") or "").strip()
 
-    ok = update_user_account(
-        user_id=current_user.id,
-        patch={
-            "display_name": display_name,
-            "email": email,
-            "password": password,
-        },
-    )
-    if not ok:
-        raise NotFound("User not found.")
-
-    if next_page == "setup":
-        return render_template("redirect.html", to="/setup?account_status=saved")
-    return render_template("redirect.html", to="/profile?account_status=saved")
-
-
-@app.get("/logout")
-@login_required
-def logout_page():
-    return render_template("logout.html")
-
-
-@app.get("/dashboard")
-@login_required
-def dashboard_page():
-    # Optional: allow browsing even if not logged in
-    q = request.args.get("q")
-    tag = request.args.get("tag")
-    if q or tag:
-        items = search_threads(q=q, tag=tag, limit=50, skip=0)
-    else:
-        items = list_threads(limit=50, skip=0)
-    return render_template("dashboard.html", threads=items, q=q or "", tag=tag or "")
-
-
-@app.get("/t/<thread_id>")
-def thread_page(thread_id: str):
-    thread = get_thread(thread_id)
-    if not thread:
-        raise NotFound("Thread not found.")
-    comments = list_comments(thread_id, limit=200, skip=0)
-    return render_template("thread.html", thread=thread, comments=comments)
-
-
-@app.route("/t/new", methods=["GET", "POST"])
-@login_required
-def thread_new_page():
-    if request.method == "GET":
-        return render_template("thread_form.html", mode="new", thread=None)
-
-    title = (request.form.get("title") or "").strip()
-    body = (request.form.get("body") or "").strip()
-    tags_raw = (request.form.get("tags") or "").strip()
-
-    if not title or not body:
-        raise BadRequest("title and body are required.")
-
-    tags = [t.strip() for t in tags_raw.split(",") if t.strip()]
-
-    doc = create_thread(
-        author_id=current_user.id,
-        author_display_name=current_user.display_name or current_user.email,
-        title=title,
-        body=body,
-        tags=tags,
-        photo_ids=[],
-    )
-    return render_template("redirect.html", to=f"/t/{doc['_id']}")
+        if not title or not body:
+            raise BadRequest("title and body are required.")
 
+        tags = [t.strip() for t in tags_raw.split(",") if t.strip()]
 
-@app.route("/t/<thread_id>/edit", methods=["GET", "POST"])
-@login_required
-def thread_edit_page(thread_id: str):
-    thread = get_thread(thread_id)
-    if not thread:
-        raise NotFound("Thread not found.")
+        doc = create_thread(
+            author_id=current_user.id,
+            author_display_name=current_user.display_name or current_user.email,
+            title=title,
+            body=body,
+            tags=tags,
+            photo_ids=[],
+        )
+        return render_template("redirect.html", to=f"/t/{doc['_id']}")
 
-    # ownership check (thread['author_id'] is ObjectId)
-    if str(thread.get("author_id")) != str(current_user.id):
-        raise NotFound("Thread not found (or you are not the author).")
+    @app.route("/t/<thread_id>/edit", methods=["GET", "POST"])
+    @login_required
+    def thread_edit_page(thread_id: str):
+        thread = get_thread(thread_id)
+        if not thread:
+            raise NotFound("Thread not found.")
 
-    if request.method == "GET":
-        return render_template("thread_form.html", mode="edit", thread=thread)
+        # ownership check (thread['author_id'] is ObjectId)
+        if str(thread.get("author_id")) != str(current_user.id):
+            raise NotFound("Thread not found (or you are not the author).")
 
-    title = (request.form.get("title") or "").strip()
-    body = (request.form.get("body") or "").strip()
-    tags_raw = (request.form.get("tags") or "").strip()
-    tags = [t.strip() for t in tags_raw.split(",") if t.strip()]
+        if request.method == "GET":
+            return render_template("thread_form.html", mode="edit", thread=thread)
 
-    ok = update_thread(thread_id=thread_id, author_id=current_user.id, patch={
-        "title": title,
-        "body": body,
-        "tags": tags,
-    })
-    if not ok:
-        raise NotFound("Thread not found (or you are not the author).")
+        title = (request.form.get("title") or "").strip()
+        body = (request.form.get("body") or "").strip()
+        tags_raw = (request.form.get("tags") or "").strip()
+        tags = [t.strip() for t in tags_raw.split(",") if t.strip()]
 
-    return render_template("redirect.html", to=f"/t/{thread_id}")
+        ok = update_thread(thread_id=thread_id, author_id=current_user.id, patch={
+            "title": title,
+            "body": body,
+            "tags": tags,
+        })
+        if not ok:
+            raise NotFound("Thread not found (or you are not the author).")
 
+        return render_template("redirect.html", to=f"/t/{thread_id}")
 
-@app.post("/t/<thread_id>/delete")
-@login_required
-def thread_delete_page(thread_id: str):
-    ok = delete_thread(thread_id=thread_id, author_id=current_user.id)
-    if not ok:
-        raise NotFound("Thread not found (or you are not the author).")
-    return render_template("redirect.html", to="/dashboard")
-
-
-@app.post("/t/<thread_id>/comment")
-@login_required
-def comment_add_page(thread_id: str):
-    body = (request.form.get("body") or "").strip()
-    if not body:
-        raise BadRequest("comment body required.")
-
-    add_comment(
-        thread_id=thread_id,
-        author_id=current_user.id,
-        author_display_name=current_user.display_name or current_user.email,
-        body=body,
-    )
-    return render_template("redirect.html", to=f"/t/{thread_id}")
+    @app.post("/t/<thread_id>/delete")
+    @login_required
+    def thread_delete_page(thread_id: str):
+        ok = delete_thread(thread_id=thread_id, author_id=current_user.id)
+        if not ok:
+            raise NotFound("Thread not found (or you are not the author).")
+        return render_template("redirect.html", to="/dashboard")
 
+    @app.post("/t/<thread_id>/comment")
+    @login_required
+    def comment_add_page(thread_id: str):
+        body = (request.form.get("body") or "").strip()
+        if not body:
+            raise BadRequest("comment body required.")
 
-@app.route("/c/<comment_id>/edit", methods=["GET", "POST"])
-@login_required
-def comment_edit_page(comment_id: str):
-    # We don’t have get_comment() in DB layer, so fetch via query:
-    db = get_db()
-    c = db.comments.find_one({"_id": ObjectId(comment_id)})
-    if not c:
-        raise NotFound("Comment not found.")
-    if str(c.get("author_id")) != str(current_user.id):
-        raise NotFound("Comment not found (or you are not the author).")
+        try:
+            comment = add_comment(
+                thread_id=thread_id,
+                author_id=current_user.id,
+                author_display_name=current_user.display_name or current_user.email,
+                body=body,
+                parent_id=request.form.get("parent_id") or None,
+            )
+        except (ValueError, InvalidId) as exc:
+            raise NotFound("Parent comment not found.") from exc
+        return render_template("redirect.html", to=f"/t/{thread_id}#c-{comment['_id']}")
+
+    @app.route("/c/<comment_id>/edit", methods=["GET", "POST"])
+    @login_required
+    def comment_edit_page(comment_id: str):
+        # We don’t have get_comment() in DB layer, so fetch via query:
+        db = get_db()
+        c = db.comments.find_one({"_id": ObjectId(comment_id)})
+        if not c:
+            raise NotFound("Comment not found.")
+        if str(c.get("author_id")) != str(current_user.id):
+            raise NotFound("Comment not found (or you are not the author).")
 
-    if request.method == "GET":
-        return render_template("comment_form.html", comment=c)
+        if request.method == "GET":
+            return render_template("comment_form.html", comment=c)
 
-    body = (request.form.get("body") or "").strip()
-    ok = update_comment(comment_id=comment_id, author_id=current_user.id, body=body)
-    if not ok:
-        raise NotFound("Comment not found (or you are not the author).")
+        body = (request.form.get("body") or "").strip()
+        ok = update_comment(comment_id=comment_id, author_id=current_user.id, body=body)
+        if not ok:
+            raise NotFound("Comment not found (or you are not the author).")
 
-    return render_template("redirect.html", to=f"/t/{c['thread_id']}")
+        return render_template("redirect.html", to=f"/t/{c['thread_id']}")
 
+    @app.post("/c/<comment_id>/delete")
+    @login_required
+    def comment_delete_page(comment_id: str):
+        db = get_db()
+        c = db.comments.find_one({"_id": ObjectId(comment_id)})
+        if not c:
+            raise NotFound("Comment not found.")
 
-@app.post("/c/<comment_id>/delete")
-@login_required
-def comment_delete_page(comment_id: str):
-    db = get_db()
-    c = db.comments.find_one({"_id": ObjectId(comment_id)})
-    if not c:
-        raise NotFound("Comment not found.")
+        ok = delete_comment(comment_id=comment_id, author_id=current_user.id)
+        if not ok:
+            raise NotFound("Comment not found (or you are not the author).")
 
-    ok = delete_comment(comment_id=comment_id, author_id=current_user.id)
-    if not ok:
-        raise NotFound("Comment not found (or you are not the author).")
+        return render_template("redirect.html", to=f"/t/{c['thread_id']}")
 
-    return render_template("redirect.html", to=f"/t/{c['thread_id']}")
+    return app
 
 
 if __name__ == "__main__":
-    app.run(
+    # Development server only; see gunicorn.conf.py for production.
+    create_app().run(
         host=os.getenv("FLASK_HOST", "127.0.0.1"),
         port=int(os.getenv("FLASK_PORT", "5000")),
-        debug=os.getenv("FLASK_DEBUG", "1") == "1",
+        debug=os.getenv("FLASK_DEBUG", "0") == "1",
     )
@@ -0,0 +1,104 @@
+"""ASGI entry point for production servers.
+
+  WEB_CONCURRENCY=4 uvicorn backend.flask.asgi:app --host 127.0.0.1 --port 5000
+
+GET/HEAD requests for the public reads in backend.flask.async_api
+(READ_ROUTES, under /api/async) run as coroutines on the server's event
+loop, so one worker process holds as many of them in flight as Mongo can
+serve rather than one per thread. Everything else (pages, writes, the sync
+API) goes to the Flask app through asgiref's WSGI adapter, which runs each
+request on a thread pool the way gunicorn gthread does.
+"""
+
+import logging
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags, quote_etag
+
+from backend.flask.app import cors_headers, create_app
+from backend.flask.async_api import READ_ROUTES
+
+ASYNC_PREFIX = "/api/async"
+
+logger = logging.getLogger(__name__)
+
+flask_app = create_app()
+_wsgi = WsgiToAsgi(flask_app)
+_routes = READ_ROUTES.bind("localhost")
+
+
+def _match(scope):
+    """(route, view_args) if the native read routes handle this request, else None."""
+    if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+        return None
+    path = scope["path"]
+    if not path.startswith(ASYNC_PREFIX + "/"):
+        return None
+    try:
+        return _routes.match(path[len(ASYNC_PREFIX):], method="GET")
+    except HTTPException:  # not ours (404, or a trailing-slash redirect): Flask answers
+        return None
+
+
+async def _send(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _serve(scope, send, route, view_args):
+    request_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+    args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+    headers = {"Content-Type": "application/json"}
+    cors = cors_headers(request_headers.get("origin"))
+    if cors:
+        headers.update(cors, Vary="Origin")
+
+    # Same error bodies as the Flask app's handlers.
+    try:
+        payload, etag, cache_control = await route(args, **view_args)
+        status = 200
+    except HTTPException as exc:
+        status, payload, etag = exc.code or 500, {"ok": False, "error": exc.description}, None
+        headers.update((k, v) for k, v in exc.get_headers() if k.lower() != "content-type")
+    except Exception as exc:
+        logger.exception("Unhandled error on %s %s", scope["method"], scope["path"])
+        status, payload, etag = 500, {"ok": False, "error": str(exc)}, None
+
+    if etag is not None:
+        headers.update({"ETag": quote_etag(etag), "Cache-Control": cache_control})
+        if parse_etags(request_headers.get("if-none-match")).contains_weak(etag):
+            del headers["Content-Type"]
+            await _send(send, 304, headers, b"")
+            return
+
+    body = f"{flask_app.json.dumps(payload)}\n".encode()
+    headers["Content-Length"] = str(len(body))
+    await _send(send, status, headers, b"" if scope["method"] == "HEAD" else body)
+
+
+async def _lifespan(receive, send):
+    # Nothing to set up: clients are created lazily per process.
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    match = _match(scope)
+    if match is None:
+        return await _wsgi(scope, receive, send)
+    route, view_args = match
+    await _serve(scope, send, route, view_args)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from typing import Any
+
+from bson.errors import InvalidId
+from flask import Blueprint, jsonify, request
+from flask_login import current_user, login_required
+from werkzeug.exceptions import BadRequest, NotFound
+from werkzeug.routing import Map, Rule
+
+from backend.aio import comments_db, follows_db, threads_db, users_db
+from backend.aio.db import run, run_all
+from backend.flask.http_cache import LIST_CACHE_CONTROL, list_etag, not_modified, with_cache_headers
+from backend.query_cache import query_cache
+from backend.threads_db import SORT_FIELDS, next_cursor, thread_projection
+from backend.users_db import PUBLIC_USER_PROJECTION
+
+# Async variants of the thread/comment/follow API (mounted at /api/async).
+# Same request/response shapes as the sync routes in app.py, including
+# sort=relevance, ETag/If-None-Match and the query cache on /threads. The DB
+# calls run on the shared async Mongo loop, so independent queries within
+# one request overlap.
+#
+# The public reads are plain coroutines over the query args, listed in
+# READ_ROUTES: backend.flask.asgi serves them straight off the ASGI event
+# loop, so a worker can hold many of them in flight without a thread each.
+# The Flask views below wrap the same coroutines for WSGI deployments
+# (gunicorn gthread), where each request still occupies its worker thread
+# until it returns; there they only lower the latency of multi-query views.
+
+bp = Blueprint("async_api", __name__)
+
+SORTS = (*SORT_FIELDS, "relevance")
+
+# (payload, etag or None, Cache-Control or None)
+ReadResult = tuple[Any, str | None, str | None]
+
+
+def _fields_arg(args) -> list[str]:
+    raw = args.get("fields") or ""
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+async def threads_page(args) -> ReadResult:
+    limit = args.get("limit", default=20, type=int)
+    skip = args.get("skip", default=0, type=int)
+    after = args.get("after", default=None, type=str)
+    q = args.get("q", default=None, type=str)
+    tag = args.get("tag", default=None, type=str)
+    fields = _fields_arg(args)
+    sort = args.get("sort", default="recent", type=str)
+
+    limit = max(1, min(int(limit), 100))
+    skip = 0 if after else max(0, int(skip))
+    if sort not in SORTS:
+        raise BadRequest(f"sort must be one of: {', '.join(SORTS)}.")
+    if sort == "relevance" and not q:
+        raise BadRequest("sort=relevance requires q.")
+    if sort == "relevance" and after:
+        raise BadRequest("sort=relevance pages by skip, not after.")
+    try:
+        projection = thread_projection(fields)
+    except ValueError as exc:
+        raise BadRequest(str(exc)) from exc
+
+    async def _query():
+        if sort == "relevance":
+            return await run(threads_db.search_threads_ranked(q=q, tag=tag, limit=limit, skip=skip,
+                                                              projection=projection))
+        kwargs = {"limit": limit, "skip": skip, "after": after, "projection": projection, "sort": sort}
+        if q or tag:
+            return await run(threads_db.search_threads(q=q, tag=tag, **kwargs))
+        return await run(threads_db.list_threads(**kwargs))
+
+    # Same namespace and args as /api/threads, so both share cache entries.
+    cache_args = {"q": q, "tag": tag, "limit": limit, "skip": skip, "after": after,
+                  "fields": ",".join(fields), "sort": sort}
+    try:
+        threads = await query_cache.get_or_compute_async("api_threads", cache_args, ["threads"], _query)
+    except ValueError as exc:
+        raise BadRequest("Invalid cursor.") from exc
+
+    payload = {
+        "items": threads,
+        "limit": limit,
+        "skip": skip,
+        "sort": sort,
+        "next_after": None if sort == "relevance" else next_cursor(threads, limit, sort),
+    }
+    return payload, list_etag(threads), LIST_CACHE_CONTROL
+
+
+async def thread_view(args, thread_id: str) -> ReadResult:
+    # Thread and its comments are fetched concurrently, then the author.
+    limit = args.get("comment_limit", default=50, type=int)
+    limit = max(1, min(int(limit), 200))
+    try:
+        thread, (comments, comments_next_after) = await run_all(
+            threads_db.get_thread(thread_id),
+            comments_db.list_comments_page(thread_id, limit=limit),
+        )
+    except Exception as exc:
+        raise BadRequest("Invalid thread_id.") from exc
+    if not thread:
+        raise NotFound("Thread not found.")
+
+    author = await run(users_db.get_user(thread["author_id"], projection=PUBLIC_USER_PROJECTION))
+    payload = {
+        "thread": thread,
+        "comments": comments,
+        "comments_next_after": comments_next_after,
+        "author": author,
+    }
+    return payload, None, None
+
+
+async def comments_page(args, thread_id: str) -> ReadResult:
+    # Same keyset paging (display order, `after`/`next_after`) as /api/threads/<id>/comments.
+    limit = args.get("limit", default=50, type=int)
+    after = args.get("after", default=None, type=str)
+    limit = max(1, min(int(limit), 200))
+    try:
+        comments, next_after = await run(comments_db.list_comments_page(thread_id, limit=limit, after=after))
+    except ValueError as exc:  # bad cursor
+        raise BadRequest(str(exc)) from exc
+    except Exception as exc:
+        raise BadRequest("Invalid thread_id.") from exc
+    return {"items": comments, "limit": limit, "next_after": next_after}, None, None
+
+
+async def _follow_page(list_fn, args, user_id: str) -> ReadResult:
+    limit = args.get("limit", default=50, type=int)
+    after = args.get("after", default=None, type=str)
+    limit = max(1, min(int(limit), 100))
+    try:
+        items, next_after = await run(list_fn(user_id, limit=limit, after=after))
+    except Exception as exc:
+        raise BadRequest("Invalid user_id or cursor.") from exc
+    return {"items": items, "limit": limit, "next_after": next_after}, None, None
+
+
+async def followers_page(args, user_id: str) -> ReadResult:
+    return await _follow_page(follows_db.list_followers_users, args, user_id)
+
+
+async def following_page(args, user_id: str) -> ReadResult:
+    return await _follow_page(follows_db.list_following_users, args, user_id)
+
+
+# Public GET routes, relative to the /api/async mount point.
+READ_ROUTES = Map([
+    Rule("/threads", endpoint=threads_page),
+    Rule("/threads/<thread_id>", endpoint=thread_view),
+    Rule("/threads/<thread_id>/comments", endpoint=comments_page),
+    Rule("/users/<user_id>/followers", endpoint=followers_page),
+    Rule("/users/<user_id>/following", endpoint=following_page),
+])
+
+
+async def _respond(route, **view_args):
+    payload, etag, cache_control = await route(request.args, **view_args)
+    if etag is None:
+        return jsonify(payload)
+    cached = not_modified(etag, cache_control)
+    if cached is not None:
+        return cached
+    return with_cache_headers(jsonify(payload), etag, cache_control)
+
+
+@bp.get("/threads")
+async def list_threads():
+    return await _respond(threads_page)
+
+
+@bp.get("/threads/<thread_id>")
+async def get_thread(thread_id: str):
+    return await _respond(thread_view, thread_id=thread_id)
+
+
+@bp.get("/threads/<thread_id>/comments")
+async def list_comments(thread_id: str):
+    return await _respond(comments_page, thread_id=thread_id)
+
+
+@bp.get("/users/<user_id>/followers")
+async def list_followers(user_id: str):
+    return await _respond(followers_page, user_id=user_id)
+
+
+@bp.get("/users/<user_id>/following")
+async def list_following(user_id: str):
+    return await _respond(following_page, user_id=user_id)
+
+
+@bp.post("/threads/<thread_id>/comments")
+@login_required
+async def add_comment(thread_id: str):
+    data = request.get_json(silent=True) or {}
+    body = (data.get("body") or "").strip()
+    if not body:
+        raise BadRequest("comment body required.")
+    try:
+        thread = await run(threads_db.get_thread(thread_id, projection={"_id": 1}))
+    except Exception as exc:
+        raise BadRequest("Invalid thread_id.") from exc
+    if not thread:
+        raise NotFound("Thread not found.")
+
+    try:
+        comment = await run(comments_db.add_comment(
+            thread_id=thread["_id"],
+            author_id=current_user.id,
+            author_display_name=current_user.display_name or current_user.email,
+            body=body,
+            parent_id=data.get("parent_id"),
+        ))
+    except (ValueError, InvalidId) as exc:
+        raise NotFound("Parent comment not found.") from exc
+    return jsonify(comment), 201
+
+
+@bp.patch("/comments/<comment_id>")
+@login_required
+async def update_comment(comment_id: str):
+    data = request.get_json(silent=True) or {}
+    body = (data.get("body") or "").strip()
+    if not body:
+        raise BadRequest("comment body required.")
+    try:
+        ok = await run(comments_db.update_comment(comment_id, current_user.id, body))
+    except Exception as exc:
+        raise BadRequest("Invalid comment_id.") from exc
+    if not ok:
+        raise NotFound("Comment not found (or you are not the author).")
+    return jsonify(await run(comments_db.get_comment(comment_id)))
+
+
+@bp.delete("/comments/<comment_id>")
+@login_required
+async def delete_comment(comment_id: str):
+    try:
+        ok = await run(comments_db.delete_comment(comment_id, current_user.id))
+    except Exception as exc:
+        raise BadRequest("Invalid comment_id.") from exc
+    if not ok:
+        raise NotFound("Comment not found (or you are not the author).")
+    return jsonify({"ok": True})
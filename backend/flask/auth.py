@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import os
+import time
 from dataclasses import dataclass
 from typing import Any
 from bson import ObjectId
-from flask import Blueprint, jsonify, redirect, request, url_for
-from flask_login import UserMixin, current_user, login_user, logout_user
+from flask import Blueprint, current_app, g, jsonify, redirect, request, session, url_for
+from flask_login import UserMixin, current_user, login_required, login_user, logout_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from werkzeug.exceptions import BadRequest, Conflict, Unauthorized
+from backend.flask.throttle import check_login_allowed, record_login_result
+from backend.passwords import HashingBusy
+from backend.user_cache import user_cache
 from backend.users_db import (
     authenticate_user,
     create_user_with_password,
@@ -19,6 +25,7 @@ class MongoUser(UserMixin):
     _id: ObjectId
     email: str
     display_name: str | None = None
+    version: int = 0  # users.version, bumped by update_user_account
 
     @property
     def id(self) -> str:  # Flask-Login uses this as the session identifier
@@ -29,11 +36,121 @@ class MongoUser(UserMixin):
 
 
 def load_user_by_id(user_id: str) -> MongoUser | None:
-    # Rehydrate Flask-Login user from Mongo.
+    # Rehydrate Flask-Login user, going to Mongo only on a cache miss.
+    user = user_cache.get(str(user_id))
+    if user is not None:
+        return user
     doc = get_user(user_id)
     if not doc:
         return None
-    return MongoUser(_id=doc["_id"], email=doc["email"], display_name=doc.get("display_name"))
+    user = user_from_doc(doc)
+    user_cache.set(user.id, user)
+    return user
+
+
+def user_from_doc(doc: dict) -> MongoUser:
+    return MongoUser(
+        _id=doc["_id"], email=doc["email"], display_name=doc.get("display_name"), version=doc.get("version", 0)
+    )
+
+# Stateless sessions (AUTH_STATELESS=1): the user's id, email, display_name
+# and version ride in the signed session cookie / bearer token, so an
+# authenticated request needs no user lookup at all. Every
+# SESSION_REVALIDATE_S the version is re-read; if update_user_account bumped
+# it since (e.g. password change from another device) the session is dropped.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "0") == "1"
+SESSION_REVALIDATE_S = float(os.getenv("SESSION_REVALIDATE_S", "300"))
+_CLAIMS_PROJECTION = {"email": 1, "display_name": 1, "version": 1}
+
+
+def _claims(user: MongoUser) -> dict[str, Any]:
+    return {"id": user.id, "email": user.email, "name": user.display_name, "v": user.version}
+
+
+def _user_from_claims(claims: dict[str, Any]) -> MongoUser:
+    return MongoUser(_id=ObjectId(claims["id"]), email=claims["email"], display_name=claims["name"], version=claims["v"])
+
+
+def _revalidate(claims: dict[str, Any]) -> MongoUser | None:
+    # One small read: does the account still exist at the version we signed?
+    doc = get_user(claims["id"], _CLAIMS_PROJECTION)
+    if not doc or doc.get("version", 0) != claims["v"]:
+        return None
+    return user_from_doc(doc)
+
+
+def remember_claims(user: MongoUser) -> None:
+    """Call after login_user (and after the user edits their own account)."""
+    if AUTH_STATELESS:
+        session["_claims"] = {**_claims(user), "at": time.time()}
+
+
+def refresh_claims(user_id: str) -> None:
+    # The user's own account edit bumped the version; re-sign their session
+    # so that edit doesn't log them out.
+    if AUTH_STATELESS and session.get("_claims"):
+        doc = get_user(user_id, _CLAIMS_PROJECTION)
+        if doc:
+            remember_claims(user_from_doc(doc))
+
+
+def load_session_user(user_id: str) -> MongoUser | None:
+    # Flask-Login user_loader.
+    claims = session.get("_claims") if AUTH_STATELESS else None
+    if not claims or claims.get("id") != str(user_id):
+        return load_user_by_id(user_id)
+    if time.time() - claims["at"] < SESSION_REVALIDATE_S:
+        return _user_from_claims(claims)
+    user = _revalidate(claims)
+    if user is None:
+        session.pop("_claims", None)
+        return None
+    remember_claims(user)
+    return user
+
+# Short-lived bearer tokens for scripted API clients: log in once with a
+# password, then send `Authorization: Bearer <token>` (checking it is an
+# HMAC, not a password hash) and renew it via /api/auth/token before expiry.
+# Tokens carry the user's version, so update_user_account (e.g. a password
+# change) revokes them, and the time of the password login: renewing never
+# extends a token past API_TOKEN_MAX_AGE_S from then.
+API_TOKEN_TTL_S = int(os.getenv("API_TOKEN_TTL_S", "900"))
+API_TOKEN_MAX_AGE_S = int(os.getenv("API_TOKEN_MAX_AGE_S", "86400"))
+
+
+def _token_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.secret_key, salt="api-token")
+
+
+def issue_token(user: MongoUser, authenticated_at: float | None = None) -> dict[str, Any]:
+    """A bearer token for `user`; `authenticated_at` is when they last gave a password (default: now)."""
+    payload = {**_claims(user), "auth": authenticated_at or time.time()}
+    return {"token": _token_serializer().dumps(payload), "expires_in": API_TOKEN_TTL_S}
+
+
+def load_user_from_token(req) -> MongoUser | None:
+    # Flask-Login request_loader: used when there is no session cookie.
+    scheme, _, token = (req.headers.get("Authorization") or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        data, issued = _token_serializer().loads(token.strip(), max_age=API_TOKEN_TTL_S, return_timestamp=True)
+    except BadSignature:
+        return None
+    if "v" not in data or "auth" not in data or time.time() - data["auth"] > API_TOKEN_MAX_AGE_S:
+        return None
+    if AUTH_STATELESS:
+        if time.time() - issued.timestamp() < SESSION_REVALIDATE_S:
+            user = _user_from_claims(data)
+        else:
+            user = _revalidate(data)
+    else:
+        user = load_user_by_id(data["id"])
+        if user is not None and user.version != data["v"]:
+            user = None
+    if user is not None:
+        g._token_authenticated_at = data["auth"]
+    return user
 
 bp = Blueprint("auth", __name__)
 
@@ -60,6 +177,7 @@ def register():
 
     if not email or not password:
         raise BadRequest("email and password are required.")
+    check_login_allowed()
 
     # Optional pre-check for a nicer error message (unique index will also enforce this)
     if get_user_by_email(email):
@@ -67,11 +185,14 @@ def register():
 
     try:
         doc = create_user_with_password(email=email, password=password, display_name=display_name)
+    except HashingBusy:
+        raise
     except Exception as exc:
         raise Conflict("Account already exists (or DB error).") from exc
 
-    user = MongoUser(_id=doc["_id"], email=doc["email"], display_name=doc.get("display_name"))
+    user = user_from_doc(doc)
     login_user(user)
+    remember_claims(user)
 
     if not is_json_request:
         # Browser form flow: continue to profile setup page.
@@ -86,13 +207,16 @@ def login_form():
 
     if not email or not password:
         raise BadRequest("email and password are required.")
+    check_login_allowed(email)
 
     doc = authenticate_user(email=email, password=password)
+    record_login_result(email, ok=doc is not None)
     if not doc:
         raise Unauthorized("Invalid email or password.")
 
-    user = MongoUser(_id=doc["_id"], email=doc["email"], display_name=doc.get("display_name"))
+    user = user_from_doc(doc)
     login_user(user)
+    remember_claims(user)
     return redirect("/dashboard")
 
 @bp.post("/auth/login")
@@ -104,14 +228,25 @@ def login():
 
     if not email or not password:
         raise BadRequest("email and password are required.")
+    check_login_allowed(email)
 
     doc = authenticate_user(email=email, password=password)
+    record_login_result(email, ok=doc is not None)
     if not doc:
         raise Unauthorized("Invalid email or password.")
 
-    user = MongoUser(_id=doc["_id"], email=doc["email"], display_name=doc.get("display_name"))
+    user = user_from_doc(doc)
     login_user(user)
-    return jsonify({"ok": True, "user": user.to_json()})
+    remember_claims(user)
+    return jsonify({"ok": True, "user": user.to_json(), **issue_token(user)})
+
+
+@bp.post("/auth/token")
+@login_required
+def refresh_token():
+    # Trade a valid session or unexpired token for a fresh token, no password
+    # needed; a token-authenticated renewal keeps the original login time.
+    return jsonify({"ok": True, **issue_token(current_user, g.get("_token_authenticated_at"))})
 
 
 @bp.post("/auth/logout")
@@ -119,6 +254,7 @@ def logout():
     # Clear current session cookie and support browser form posts.
     is_json_request = request.is_json
     logout_user()
+    session.pop("_claims", None)
 
     if not is_json_request:
         return redirect(url_for("signup_page"))
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Iterable
+
+from flask import current_app, request
+
+# ETag / conditional GET helpers for read endpoints.
+# ETags are computed from the few fields that change when a response would
+# change, so a 304 can be returned before serialization or rendering.
+
+LIST_CACHE_CONTROL = os.getenv("HTTP_LIST_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+THREAD_CACHE_CONTROL = os.getenv("HTTP_THREAD_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+PAGE_CACHE_CONTROL = "private, no-cache"  # pages vary by logged-in user
+
+
+def _digest(parts: Iterable[Any]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def _doc_version(doc: dict) -> tuple:
+    # Everything a list/thread view shows that can change without a new _id.
+    return (
+        doc.get("_id"),
+        doc.get("updated_at"),
+        doc.get("comment_count"),
+        doc.get("last_activity_at"),
+        doc.get("comments_updated_at"),
+    )
+
+
+def thread_etag(thread: dict, *extra: Any) -> str:
+    return _digest([*extra, *_doc_version(thread)])
+
+
+def list_etag(items: list[dict], *extra: Any) -> str:
+    """ETag for a page of threads: ids plus their versions (covers deletes too)."""
+    return _digest([*extra, *(v for doc in items for v in _doc_version(doc))])
+
+
+def thread_with_comments_etag(thread: dict, comments: list[dict], *extra: Any) -> str:
+    comment_state = (
+        len(comments),
+        max((c.get("updated_at") or c.get("created_at") for c in comments), default=None),
+    )
+    return _digest([*extra, *_doc_version(thread), *comment_state])
+
+
+def not_modified(etag: str, cache_control: str):
+    """A 304 response if the client already has `etag`, otherwise None."""
+    if request.method in ("GET", "HEAD") and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        return with_cache_headers(response, etag, cache_control)
+    return None
+
+
+def with_cache_headers(response, etag: str, cache_control: str, vary_cookie: bool = False):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    if vary_cookie:
+        response.vary.add("Cookie")
+    return response
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from bson import Decimal128, ObjectId, Timestamp
+from flask.json.provider import DefaultJSONProvider
+
+from backend.flask.timing import timed
+
+
+def _bson_default(value: Any) -> Any:
+    # Called by the encoder only for values it can't handle itself,
+    # so documents are never copied just to stringify ids/dates.
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value)
+    if isinstance(value, Timestamp):
+        return value.as_datetime().isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that understands Mongo documents directly.
+
+    Output is exactly the stdlib provider's (sorted keys, ASCII-escaped,
+    compact outside debug); only the fallback for non-JSON types changes.
+    """
+
+    default = staticmethod(_bson_default)
+
+    def response(self, *args: Any, **kwargs: Any):
+        with timed("serialize"):
+            return super().response(*args, **kwargs)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+# In-memory sliding-window throttling for the auth endpoints.
+#
+# Checked before any password hashing, so a login storm is shed for the cost
+# of a dict lookup. Per-IP limits count every attempt; per-email limits count
+# failures only and are cleared by a successful login. State is per process,
+# so the effective limit is roughly (limit x workers).
+
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "30"))
+LOGIN_IP_WINDOW_S = float(os.getenv("LOGIN_IP_WINDOW_S", "60"))
+LOGIN_EMAIL_FAILURE_LIMIT = int(os.getenv("LOGIN_EMAIL_FAILURE_LIMIT", "5"))
+LOGIN_EMAIL_WINDOW_S = float(os.getenv("LOGIN_EMAIL_WINDOW_S", "300"))
+_MAX_KEYS = 100_000
+
+
+class SlidingWindow:
+    """At most `limit` events per key in any `window` seconds."""
+
+    def __init__(self, limit: int, window: float, max_keys: int = _MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: OrderedDict[str, deque] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque:
+        events = self._events.get(key)
+        if events is None:
+            events = self._events[key] = deque()
+            if len(self._events) > self.max_keys:
+                self._events.popitem(last=False)  # forget the least recently seen key
+        else:
+            self._events.move_to_end(key)
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        return events
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may act again (0 if it may act now)."""
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            events = self._prune(key, now)
+            if len(events) < self.limit:
+                return 0.0
+            return events[0] + self.window - now
+
+    def hit(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(key, now).append(now)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+
+login_attempts_by_ip = SlidingWindow(LOGIN_IP_LIMIT, LOGIN_IP_WINDOW_S)
+login_failures_by_email = SlidingWindow(LOGIN_EMAIL_FAILURE_LIMIT, LOGIN_EMAIL_WINDOW_S)
+
+
+def _raise_throttled(wait: float) -> None:
+    raise TooManyRequests("Too many attempts; try again later.", retry_after=max(1, int(wait + 0.999)))
+
+
+def check_login_allowed(email: str | None = None) -> None:
+    """Count this attempt against the client IP; raise 429 if it or `email` is over the limit."""
+    ip = request.remote_addr or "unknown"
+    wait = login_attempts_by_ip.retry_after(ip)
+    if email:
+        wait = max(wait, login_failures_by_email.retry_after(email))
+    if wait > 0:
+        _raise_throttled(wait)
+    login_attempts_by_ip.hit(ip)
+
+
+def record_login_result(email: str, ok: bool) -> None:
+    if ok:
+        login_failures_by_email.reset(email)
+    else:
+        login_failures_by_email.hit(email)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from flask import Flask, appcontext_pushed, before_render_template, g, request, template_rendered
+
+from backend.db import stop_tracking_commands, track_commands
+
+# Per-request timing: total / db / render / serialize, reported in a
+# Server-Timing header and logged when a request is slow or issues
+# suspiciously many Mongo commands (usually an N+1 loop).
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "20"))
+
+logger = logging.getLogger(__name__)
+
+_spans: ContextVar[dict | None] = ContextVar("request_spans", default=None)
+
+
+def add_span(name: str, seconds: float) -> None:
+    spans = _spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name: str):
+    """Add the block's duration to the current request's `name` span (no-op outside a request)."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, perf_counter() - started)
+
+
+def _render_started(sender, **extra) -> None:
+    g._render_started = perf_counter()
+
+
+def _render_finished(sender, **extra) -> None:
+    started = g.pop("_render_started", None)
+    if started is not None:
+        add_span("render", perf_counter() - started)
+
+
+def _resume_timing(sender, **extra) -> None:
+    # stream_with_context re-pushes the request's app context around the
+    # streamed body after teardown has already cleared our context vars;
+    # pick the request's scope and spans back up so later queries count.
+    scope = g.get("_command_scope")
+    if scope is not None:
+        track_commands(scope)
+        _spans.set(g.get("_timing_spans"))
+
+
+def _server_timing(total: float, scope, spans: dict, streamed: bool = False) -> str:
+    parts = [f'db;dur={scope.seconds * 1000:.1f};desc="{scope.count} queries"']
+    parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans.items()]
+    # Streamed bodies keep querying after the headers go out; say so rather
+    # than pass a partial figure off as the whole request.
+    parts.append(f'total;dur={total * 1000:.1f};desc="before streaming"' if streamed else f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _log_if_slow(method: str, path: str, status: int, total: float, scope, spans: dict) -> None:
+    if total * 1000 >= SLOW_REQUEST_MS or scope.count >= SLOW_REQUEST_QUERIES:
+        logger.warning(
+            "slow request %s %s -> %s: %.1fms (db %.1fms in %d queries, %s) top commands: %s",
+            method,
+            path,
+            status,
+            total * 1000,
+            scope.seconds * 1000,
+            scope.count,
+            ", ".join(f"{name} {s * 1000:.1f}ms" for name, s in spans.items()) or "no spans",
+            "; ".join(f"{n}x {shape}" for shape, n in scope.top()) or "none",
+        )
+
+
+def init_app(app: Flask) -> None:
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    appcontext_pushed.connect(_resume_timing, app)
+
+    @app.before_request
+    def _start_timing():
+        g._timing_started = perf_counter()
+        g._command_scope = track_commands()
+        g._timing_spans = {}
+        _spans.set(g._timing_spans)
+
+    @app.after_request
+    def _finish_timing(response):
+        started = g.get("_timing_started")
+        scope = g.get("_command_scope")
+        if started is None or scope is None:
+            return response
+        total = perf_counter() - started
+        spans = _spans.get() or {}
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = _server_timing(total, scope, spans, response.is_streamed)
+        method, path, status = request.method, request.full_path.rstrip("?"), response.status_code
+        if response.is_streamed:
+            # The scope and spans stay live until the stream finishes, so log
+            # the final totals once the server closes the response.
+            response.call_on_close(lambda: _log_if_slow(method, path, status, perf_counter() - started, scope, spans))
+        else:
+            _log_if_slow(method, path, status, total, scope, spans)
+        return response
+
+    @app.teardown_request
+    def _stop_timing(exc):
+        stop_tracking_commands()
+        _spans.set(None)
@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers.
+
+  gunicorn -c gunicorn.conf.py backend.flask.wsgi:app
+"""
+
+from backend.flask.app import create_app
+
+app = create_app()
@@ -1,6 +1,14 @@
 from datetime import datetime, timezone
 from bson import ObjectId
-from db import get_db
+from pymongo.errors import DuplicateKeyError
+try:
+    from .db import get_db
+    from .cursors import decode_keyset, encode_keyset
+    from .users_db import PUBLIC_USER_PROJECTION, get_users_by_ids
+except ImportError:  # allows running from inside backend/ (test_all_db.py, indexes.py)
+    from db import get_db
+    from cursors import decode_keyset, encode_keyset
+    from users_db import PUBLIC_USER_PROJECTION, get_users_by_ids
 
 
 def _oid(x):
@@ -15,6 +23,7 @@ def follow(follower_id, followee_id):
     Create a follow relationship.
 
     If the relationship already exists, this returns None (due to unique index).
+    On success, bumps follower_count / following_count on both user docs.
     """
     db = get_db()
     now = datetime.now(timezone.utc)
@@ -26,41 +35,124 @@ def follow(follower_id, followee_id):
     }
     try:
         res = db.follows.insert_one(doc)
-        doc["_id"] = res.inserted_id
-        return doc
-    except Exception:
+    except DuplicateKeyError:
         return None
+    doc["_id"] = res.inserted_id
+    db.users.update_one({"_id": doc["follower_id"]}, {"$inc": {"following_count": 1}})
+    db.users.update_one({"_id": doc["followee_id"]}, {"$inc": {"follower_count": 1}})
+    return doc
 
 
 def unfollow(follower_id, followee_id):
-    """Remove a follow relationship."""
+    """Remove a follow relationship (and decrement the cached counts)."""
     db = get_db()
-    res = db.follows.delete_one({"follower_id": _oid(follower_id), "followee_id": _oid(followee_id)})
-    return res.deleted_count == 1
+    follower_id, followee_id = _oid(follower_id), _oid(followee_id)
+    res = db.follows.delete_one({"follower_id": follower_id, "followee_id": followee_id})
+    if res.deleted_count != 1:
+        return False
+    db.users.update_one(
+        {"_id": follower_id, "following_count": {"$gt": 0}}, {"$inc": {"following_count": -1}}
+    )
+    db.users.update_one(
+        {"_id": followee_id, "follower_count": {"$gt": 0}}, {"$inc": {"follower_count": -1}}
+    )
+    return True
 
 
-def list_following(user_id, limit=50, skip=0):
-    """List who the user is following."""
+EDGE_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def edges_filter(field, user_id, skip, after):
+    """
+    (filter, skip) for a page of follow edges on `field`, newest first;
+    `after` is a keyset token over (created_at, _id). Shared with backend.aio.
+    """
+    filter_ = {field: _oid(user_id)}
+    if after:
+        created_at, oid = decode_keyset(after)
+        filter_["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]
+        skip = 0
+    return filter_, skip
+
+
+def _edges(field, user_id, limit, skip, after):
     db = get_db()
-    cursor = (
-        db.follows.find({"follower_id": _oid(user_id)})
-        .sort("created_at", -1)
-        .skip(int(skip))
-        .limit(int(limit))
-    )
-    return list(cursor)
+    filter_, skip = edges_filter(field, user_id, skip, after)
+    return list(db.follows.find(filter_).sort(EDGE_SORT).skip(int(skip)).limit(int(limit)))
 
 
-def list_followers(user_id, limit=50, skip=0):
+def list_following(user_id, limit=50, skip=0, after=None):
+    """List who the user is following."""
+    return _edges("follower_id", user_id, limit, skip, after)
+
+
+def list_followers(user_id, limit=50, skip=0, after=None):
     """List who follows the user."""
+    return _edges("followee_id", user_id, limit, skip, after)
+
+
+def _hydrate(edges, other_field, limit):
+    # One $in query for the users on the other end of every edge.
+    users = get_users_by_ids([e[other_field] for e in edges], PUBLIC_USER_PROJECTION)
+    return follow_page(edges, users, other_field, limit)
+
+
+def follow_page(edges, users, other_field, limit):
+    """(items, next_after) from a page of edges and {_id: user} for their other ends."""
+    items = [
+        {"user": users[e[other_field]], "followed_at": e["created_at"]}
+        for e in edges
+        if e[other_field] in users
+    ]
+    next_after = None
+    if len(edges) == int(limit):
+        next_after = encode_keyset(edges[-1]["created_at"], edges[-1]["_id"])
+    return items, next_after
+
+
+def list_following_users(user_id, limit=50, after=None):
+    """
+    Page of users that `user_id` follows, with display data, in two queries.
+    Returns (items, next_after); each item is {"user": {...}, "followed_at": ...}.
+    """
+    return _hydrate(list_following(user_id, limit=limit, after=after), "followee_id", limit)
+
+
+def list_followers_users(user_id, limit=50, after=None):
+    """Page of users following `user_id`; same shape as list_following_users."""
+    return _hydrate(list_followers(user_id, limit=limit, after=after), "follower_id", limit)
+
+
+def repair_follow_counts():
+    """
+    Recompute follower_count / following_count on every user from the follows
+    collection, server-side. Use after bulk imports or if counts drift.
+    """
     db = get_db()
-    cursor = (
-        db.follows.find({"followee_id": _oid(user_id)})
-        .sort("created_at", -1)
-        .skip(int(skip))
-        .limit(int(limit))
-    )
-    return list(cursor)
+    db.users.aggregate([
+        {"$lookup": {
+            "from": "follows",
+            "localField": "_id",
+            "foreignField": "followee_id",
+            "pipeline": [{"$count": "n"}],
+            "as": "_followers",
+        }},
+        {"$lookup": {
+            "from": "follows",
+            "localField": "_id",
+            "foreignField": "follower_id",
+            "pipeline": [{"$count": "n"}],
+            "as": "_following",
+        }},
+        {"$project": {
+            "follower_count": {"$ifNull": [{"$first": "$_followers.n"}, 0]},
+            "following_count": {"$ifNull": [{"$first": "$_following.n"}, 0]},
+        }},
+        {"$merge": {"into": "users", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ])
 
 
 def ensure_follow_indexes():
@@ -68,4 +160,8 @@ def ensure_follow_indexes():
     db = get_db()
     db.follows.create_index([("follower_id", 1), ("created_at", -1)])
     db.follows.create_index([("followee_id", 1), ("created_at", -1)])
-    db.follows.create_index([("follower_id", 1), ("followee_id", 1)], unique=True)
\ No newline at end of file
+    db.follows.create_index([("follower_id", 1), ("followee_id", 1)], unique=True)
+
+if __name__ == "__main__":  # `python -m backend.follows_db` repairs follower/following counts
+    repair_follow_counts()
+    print("Repaired follower_count / following_count on users")
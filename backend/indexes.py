@@ -4,6 +4,8 @@ from threads_db import ensure_thread_indexes
 from comments_db import ensure_comment_indexes
 from users_db import ensure_user_indexes
 from follows_db import ensure_follow_indexes
+from feed_db import ensure_feed_indexes
+from tags_db import ensure_tag_indexes
 
 
 def ensure_all_indexes():
@@ -15,4 +17,6 @@ def ensure_all_indexes():
     ensure_comment_indexes()
     ensure_user_indexes()
     ensure_follow_indexes()
-    print("Indexes ensured: threads, comments, users, follows")
\ No newline at end of file
+    ensure_feed_indexes()
+    ensure_tag_indexes()
+    print("Indexes ensured: threads, comments, users, follows, feeds, tags")
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""HTTP load test for a running app (stdlib only).
+
+  python -m backend.seed --drop --users 1000          # once, to get data and logins
+  python -m backend.loadtest --url http://127.0.0.1:5000 --users 20 --duration 60
+  python -m backend.loadtest --json results.json
+  python -m backend.loadtest --compare results.json    # diff against an earlier run
+
+Each virtual user keeps its own keep-alive connection and session cookie,
+logs in once as a random seed user and then loops over weighted scenarios:
+
+  browse  GET /dashboard, GET /api/threads (first page, then the next cursor)
+  search  GET /api/threads?q=...&sort=relevance, GET /dashboard?q=...
+  thread  GET /t/<id>, GET /api/threads/<id>?include=comments
+  post    POST /api/threads, POST /t/<id>/comment (as a logged-in seed user)
+  login   POST /api/auth/login (a fresh session as another seed user)
+
+The report gives count, errors, throttled (429) responses, throughput and
+p50/p95/p99 latency per endpoint. All logins come from one client IP, so raise
+the server's LOGIN_IP_LIMIT for load runs or the login mix mostly measures the
+throttle.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from backend.seed import _WORDS, SEED_EMAIL, SEED_PASSWORD
+
+DEFAULT_MIX = "browse=40,search=20,thread=30,post=5,login=5"
+
+
+class Client:
+    """One keep-alive connection with a cookie jar."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._conn = conn_cls(parts.netloc, timeout=timeout)
+        self._cookies = {}
+
+    def request(self, method, path, body=None, form=None):
+        headers = {}
+        if self._cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self._cookies.items())
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self._conn.request(method, path, body=body, headers=headers)
+            resp = self._conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self._conn.close()  # reconnects on the next request
+            raise
+        for header in resp.headers.get_all("Set-Cookie") or ():
+            for name, morsel in SimpleCookie(header).items():
+                self._cookies[name] = morsel.value
+        return resp.status, data
+
+    def close(self):
+        self._conn.close()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}   # endpoint -> [seconds]
+        self.errors = {}    # endpoint -> count
+        self.throttled = {}  # endpoint -> count of 429s (not errors)
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if status == 429:
+                self.throttled[endpoint] = self.throttled.get(endpoint, 0) + 1
+            elif not 200 <= status < 400:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, thread_ids, rng, max_seed_user, password):
+        self.client = Client(base_url)
+        self.recorder = recorder
+        self.thread_ids = thread_ids
+        self.rng = rng
+        self.max_seed_user = max_seed_user
+        self.password = password
+        self.logged_in = False
+
+    def call(self, endpoint, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, **kwargs)
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b""
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return status, data
+
+    # ---- scenarios ----------------------------------------------------------
+
+    def browse(self):
+        self.call("GET /dashboard", "GET", "/dashboard")
+        status, data = self.call("GET /api/threads", "GET", "/api/threads?limit=20")
+        if status == 200:
+            after = json.loads(data).get("next_after")
+            if after:
+                self.call("GET /api/threads?after", "GET", "/api/threads?" + urlencode({"limit": 20, "after": after}))
+
+    def search(self):
+        q = " ".join(self.rng.sample(_WORDS, self.rng.randint(1, 2)))
+        self.call("GET /api/threads?q", "GET", "/api/threads?" + urlencode({"q": q, "sort": "relevance"}))
+        self.call("GET /dashboard?q", "GET", "/dashboard?" + urlencode({"q": q}))
+
+    def thread(self):
+        if not self.thread_ids:
+            return
+        tid = self.rng.choice(self.thread_ids)
+        self.call("GET /t/<id>", "GET", f"/t/{tid}")
+        self.call("GET /api/threads/<id>?include=comments", "GET", f"/api/threads/{tid}?include=comments")
+
+    def login(self):
+        email = SEED_EMAIL.format(self.rng.randrange(self.max_seed_user))
+        status, _ = self.call("POST /api/auth/login", "POST", "/api/auth/login",
+                              body={"email": email, "password": self.password})
+        if status == 200:
+            self.logged_in = True  # a throttled or failed attempt keeps the current session
+
+    def post(self):
+        if not self.logged_in:
+            self.login()
+        words = lambda lo, hi: " ".join(self.rng.choice(_WORDS) for _ in range(self.rng.randint(lo, hi)))
+        status, data = self.call("POST /api/threads", "POST", "/api/threads",
+                                 body={"title": words(3, 8), "body": words(10, 40), "tags": ["loadtest"]})
+        if status == 201:
+            self.thread_ids.append(json.loads(data)["_id"])
+        if self.thread_ids:
+            tid = self.rng.choice(self.thread_ids)
+            self.call("POST /t/<id>/comment", "POST", f"/t/{tid}/comment", form={"body": words(3, 20)})
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("browse", "search", "thread", "post", "login"):
+            raise SystemExit(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _thread_ids(base_url, pages=5):
+    client = Client(base_url)
+    ids, after = [], None
+    for _ in range(pages):
+        query = {"limit": 100, "fields": "title"}
+        if after:
+            query["after"] = after
+        status, data = client.request("GET", "/api/threads?" + urlencode(query))
+        if status != 200:
+            break
+        page = json.loads(data)
+        ids.extend(item["_id"] for item in page["items"])
+        after = page.get("next_after")
+        if not after:
+            break
+    client.close()
+    return ids
+
+
+def run(base_url, users=10, duration=30.0, warmup=5.0, mix=DEFAULT_MIX, think=0.0,
+        seed_users=500, password=SEED_PASSWORD, seed=1):
+    """Run the load test and return a report dict."""
+    mix = _parse_mix(mix) if isinstance(mix, str) else mix
+    names, weights = list(mix), list(mix.values())
+    thread_ids = _thread_ids(base_url)
+    warm = Recorder()
+    measured = Recorder()
+    state = {"recorder": warm}
+    stop = threading.Event()
+
+    def worker(n):
+        vu = VirtualUser(base_url, warm, thread_ids, random.Random(seed * 1000 + n), seed_users, password)
+        try:
+            vu.login()  # /dashboard and posting need a session
+            while not stop.is_set():
+                vu.recorder = state["recorder"]
+                getattr(vu, vu.rng.choices(names, weights)[0])()
+                if think:
+                    time.sleep(vu.rng.expovariate(1.0 / think))
+        finally:
+            vu.client.close()
+
+    workers = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(users)]
+    for w in workers:
+        w.start()
+    time.sleep(warmup)
+    state["recorder"] = measured
+    started = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for w in workers:
+        w.join(timeout=30)
+
+    endpoints = {}
+    for endpoint, samples in sorted(measured.samples.items()):
+        samples.sort()
+        endpoints[endpoint] = {
+            "count": len(samples),
+            "errors": measured.errors.get(endpoint, 0),
+            "throttled": measured.throttled.get(endpoint, 0),
+            "rps": len(samples) / elapsed,
+            "p50_ms": _percentile(samples, 50) * 1000,
+            "p95_ms": _percentile(samples, 95) * 1000,
+            "p99_ms": _percentile(samples, 99) * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "config": {"url": base_url, "users": users, "duration_s": duration, "mix": mix, "think_s": think},
+        "elapsed_s": elapsed,
+        "total_requests": total,
+        "total_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def format_report(report, baseline=None):
+    cols = ("count", "errors", "throttled", "rps", "p50_ms", "p95_ms", "p99_ms")
+    width = max([len(e) for e in report["endpoints"]] + [8])
+    lines = [f"{'endpoint':<{width}}  " + "  ".join(f"{c:>9}" for c in cols)]
+    for endpoint, row in report["endpoints"].items():
+        cells = []
+        for c in cols:
+            cell = f"{row[c]:>9.1f}" if isinstance(row[c], float) else f"{row[c]:>9}"
+            cells.append(cell)
+        lines.append(f"{endpoint:<{width}}  " + "  ".join(cells))
+        old = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if old:
+            deltas = []
+            for c in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                pct = (row[c] - old[c]) / old[c] * 100 if old[c] else 0.0
+                deltas.append(f"{c} {pct:+.0f}%")
+            lines.append(f"{'':<{width}}  vs baseline: " + ", ".join(deltas))
+    lines.append(f"total: {report['total_requests']} requests, {report['total_rps']:.1f} req/s "
+                 f"over {report['elapsed_s']:.1f}s")
+    if any(row.get("throttled") for row in report["endpoints"].values()):
+        lines.append("some requests were throttled (429); raise LOGIN_IP_LIMIT on the server for load runs")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.loadtest", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. browse=1,thread=3")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between scenarios (s)")
+    parser.add_argument("--seed-users", type=int, default=500, help="how many seed<N> logins exist")
+    parser.add_argument("--password", default=SEED_PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--compare", help="baseline report (from --json) to diff against")
+    args = parser.parse_args(argv)
+
+    report = run(args.url, users=args.users, duration=args.duration, warmup=args.warmup, mix=args.mix,
+                 think=args.think, seed_users=args.seed_users, password=args.password, seed=args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing off the request threads.
+#
+# scrypt/pbkdf2 are deliberately CPU-heavy; done inline, a burst of logins
+# holds the GIL and stalls every other request on the worker. Instead hashes
+# run in a small per-process pool of helper processes, and at most
+# PASSWORD_HASH_MAX_QUEUE may be queued or running at once: past that,
+# callers get HashingBusy immediately (the app answers 503 + Retry-After)
+# rather than piling up behind the storm.
+#
+# PASSWORD_HASH_WORKERS=0 hashes inline (still bounded by the queue limit).
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")  # e.g. "scrypt:32768:8:1", "pbkdf2:sha256:600000"
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+PASSWORD_HASH_TIMEOUT_S = float(os.getenv("PASSWORD_HASH_TIMEOUT_S", "10"))
+
+
+class HashingBusy(Exception):
+    """Too many password hashes already queued; retry shortly."""
+
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, PASSWORD_HASH_MAX_QUEUE))
+
+
+def _get_pool():
+    # One pool per process; a forked gunicorn worker never reuses its parent's.
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                # "spawn": forking a process that already runs request threads is unsafe.
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy("Too many password checks in progress.")
+    if PASSWORD_HASH_WORKERS <= 0:
+        try:
+            return fn(*args)
+        finally:
+            _slots.release()
+    try:
+        future = _get_pool().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot is held until the hash actually finishes, not until we stop
+    # waiting for it, so timed-out work still counts against the queue limit.
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT_S)
+    except FutureTimeout as exc:
+        raise HashingBusy("Password check timed out.") from exc
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def hash_password(password):
+    """Hash with the configured PASSWORD_HASH_METHOD. Raises HashingBusy when saturated."""
+    return _run(_hash, password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+
+def verify_password(password_hash, password):
+    """check_password_hash, off-thread. Raises HashingBusy when saturated."""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+_target = None
+
+
+def _target_method():
+    # The fully parameterized method string werkzeug writes for the configured
+    # PASSWORD_HASH_METHOD (e.g. "scrypt" -> "scrypt:32768:8:1"). Costs one
+    # hash per process (in the pool), the first time a login checks for an upgrade.
+    global _target
+    if _target is None:
+        _target = _run(_hash, "", PASSWORD_HASH_METHOD, 1).split("$", 1)[0]
+    return _target
+
+
+def needs_rehash(password_hash):
+    """
+    True if `password_hash` was made with other parameters than the configured
+    target. False (check again next login) while the pool is saturated.
+    """
+    if not password_hash or password_hash.count("$") < 2:
+        return True
+    method, salt, _ = password_hash.split("$", 2)
+    try:
+        target = _target_method()
+    except HashingBusy:
+        return False
+    return method != target or len(salt) < PASSWORD_SALT_LENGTH
+
+
+def shutdown():
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_pid = None
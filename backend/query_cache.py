@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import os
+import pickle
+import threading
+try:
+    from .user_cache import TTLCache
+except ImportError:  # allows running from inside backend/
+    from user_cache import TTLCache
+
+# Read-through cache for hot queries/pages with tag-based invalidation.
+#
+# Every cached entry is stored under a key that includes the current version
+# of each of its tags ("threads", "thread:<id>", ...). Writers call
+# invalidate(tag), which bumps the version, so stale entries are simply never
+# looked up again and age out. This works the same for the in-process backend
+# and a shared one (Redis), where versions are plain INCR counters.
+#
+# Values are pickled on the way in, so callers always get their own copy.
+#
+# The memory backend is per process: an invalidation only reaches the worker
+# that made the write, and other workers serve their copy until it expires.
+# So with several workers (WEB_CONCURRENCY > 1, set by gunicorn.conf.py) the
+# default is Redis when QUERY_CACHE_URL is set, and otherwise a memory cache
+# with a short TTL.
+
+_MULTI_WORKER = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "2" if _MULTI_WORKER else "30"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+_MAX_TAGS = 10000
+_FLIGHT_WAIT_S = 5.0
+
+
+class MemoryBackend:
+    """Per-process LRU+TTL store (the default)."""
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_S):
+        self._items = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._items.get(key)
+
+    def set(self, key, value):
+        self._items.set(key, value)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._generation] + [self._versions.get(t, 0) for t in tags]
+
+    def bump(self, tag):
+        with self._lock:
+            if tag not in self._versions and len(self._versions) >= _MAX_TAGS:
+                # Too many per-thread tags: start a new generation, which
+                # orphans every existing entry instead of tracking them all.
+                self._versions.clear()
+                self._generation += 1
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        self._items.clear()
+
+
+class RedisBackend:
+    """Shared store for multi-worker deployments (needs the `redis` package)."""
+
+    def __init__(self, url, ttl=QUERY_CACHE_TTL_S, prefix="qc"):
+        import redis  # optional dependency
+
+        self._r = redis.Redis.from_url(url)
+        self._ttl = max(1, int(ttl))
+        self._prefix = prefix
+
+    def get(self, key):
+        return self._r.get(key)
+
+    def set(self, key, value):
+        self._r.set(key, value, ex=self._ttl)
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        raw = self._r.mget([f"{self._prefix}:tag:{t}" for t in tags])
+        return [int(v or 0) for v in raw]
+
+    def bump(self, tag):
+        self._r.incr(f"{self._prefix}:tag:{tag}")
+
+    def clear(self):
+        for key in self._r.scan_iter(f"{self._prefix}:*"):
+            self._r.delete(key)
+
+
+class NullBackend:
+    """Caching disabled (QUERY_CACHE_BACKEND=none)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def versions(self, tags):
+        return []
+
+    def bump(self, tag):
+        pass
+
+    def clear(self):
+        pass
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.raw = None
+
+
+class QueryCache:
+    def __init__(self, backend, prefix="qc"):
+        self.backend = backend
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _key(self, namespace, args, tags):
+        parts = (namespace, sorted((k, str(v)) for k, v in args.items()), tags, self.backend.versions(tags))
+        return f"{self.prefix}:{namespace}:{hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"
+
+    def get_or_compute(self, namespace, args, tags, compute):
+        """
+        Return the cached result of `compute()` for (namespace, args), computing
+        it on a miss. Concurrent misses for the same key in this process wait
+        for the first caller instead of all hitting Mongo (stampede protection).
+        """
+        tags = tuple(tags)
+        key = self._key(namespace, args, tags)
+        raw = self.backend.get(key)
+        if raw is not None:
+            self._count("hits")
+            return pickle.loads(raw)
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+
+        if not leader:
+            flight.event.wait(_FLIGHT_WAIT_S)
+            if flight.raw is not None:
+                self._count("coalesced")
+                return pickle.loads(flight.raw)
+            return compute()  # leader failed or timed out
+
+        try:
+            value = compute()
+            flight.raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            self.backend.set(key, flight.raw)
+            return value
+        finally:
+            flight.event.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, namespace, args, tags, compute):
+        """
+        get_or_compute for async callers: `compute` is a coroutine function.
+        Backend calls run in a worker thread (Redis is blocking I/O), and
+        concurrent misses are not coalesced.
+        """
+        tags = tuple(tags)
+        key = await asyncio.to_thread(self._key, namespace, args, tags)
+        raw = await asyncio.to_thread(self.backend.get, key)
+        if raw is not None:
+            self._count("hits")
+            return pickle.loads(raw)
+        self._count("misses")
+        value = await compute()
+        await asyncio.to_thread(self.backend.set, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def _count(self, name):
+        # Many request threads bump these at once; += on an attribute isn't atomic.
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+        }
+
+
+def _backend_from_env():
+    default = "redis" if _MULTI_WORKER and os.getenv("QUERY_CACHE_URL") else "memory"
+    kind = os.getenv("QUERY_CACHE_BACKEND", default).lower()
+    if kind == "none":
+        return NullBackend()
+    if kind == "redis":
+        return RedisBackend(os.getenv("QUERY_CACHE_URL", "redis://localhost:6379/0"))
+    return MemoryBackend()
+
+
+query_cache = QueryCache(_backend_from_env())
+
+
+def invalidate_threads(*thread_ids):
+    """Call after any write that can change thread lists or thread pages."""
+    query_cache.invalidate("threads", *(f"thread:{t}" for t in thread_ids))
+
+
+def invalidate_thread(thread_id):
+    """Call after a write that changes one thread's page but nothing lists show or sort by."""
+    query_cache.invalidate(f"thread:{thread_id}")
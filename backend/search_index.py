@@ -0,0 +1,400 @@
+import atexit
+import bisect
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from datetime import timedelta, timezone
+from pathlib import Path
+try:
+    import fcntl
+except ImportError:  # not POSIX: single-process dev server, always save
+    fcntl = None
+try:
+    from .db import ROOT, get_db
+except ImportError:  # allows `python backend/search_index.py`
+    from db import ROOT, get_db
+
+# Ranked full-text search over threads, held in memory per process.
+#
+# - Inverted index: term -> {doc number: weighted term frequency}, where a
+#   title occurrence counts TITLE_BOOST times a body occurrence.
+# - Scoring: BM25 over those weighted frequencies and weighted doc lengths,
+#   with MaxScore pruning: once the current top-k can't be beaten by a doc
+#   matching only the remaining (rarer-scoring) terms, those terms only
+#   re-score docs that are already candidates instead of walking their postings.
+# - Typeahead: the last query word also matches every indexed term it is a
+#   prefix of (found by bisect over a sorted vocabulary).
+# - Freshness: threads_db pushes creates/updates/deletes into this process's
+#   index; other workers' writes are picked up by refresh(), which re-reads
+#   threads updated since its watermark minus SEARCH_REFRESH_OVERLAP_S, so a
+#   write stamped by a skewed clock or committed late is still seen (threads
+#   whose indexed updated_at is unchanged are skipped). Re-indexing a thread
+#   reuses its doc number, and removed numbers are recycled, so the index
+#   stays the size of the collection. Deleted threads that a worker missed
+#   are dropped when a search hit no longer exists in Mongo, and by prune()
+#   when a saved index is loaded.
+# - Startup: the index is pickled to SEARCH_INDEX_PATH and reloaded, then
+#   refresh() catches up on whatever changed since it was saved. Loading runs
+#   on a background thread; until it is done, search_thread_ids returns None
+#   and callers fall back to Mongo $text search. Only one process (the one
+#   holding SEARCH_INDEX_PATH's lock file) saves on exit.
+
+SEARCH_INDEX_PATH = Path(os.getenv("SEARCH_INDEX_PATH", str(ROOT / "instance" / "search_index.pkl")))
+SEARCH_REFRESH_S = float(os.getenv("SEARCH_REFRESH_S", "5"))
+SEARCH_REFRESH_OVERLAP_S = float(os.getenv("SEARCH_REFRESH_OVERLAP_S", "60"))
+TITLE_BOOST = 3.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 50
+_FORMAT = 3
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _naive_utc(value):
+    # tz_aware clients return aware datetimes; the index keeps naive UTC.
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = []          # doc number -> thread id (str), None once removed
+        self._free = []         # removed doc numbers, reused by add()
+        self._numbers = {}      # thread id -> doc number
+        self._lengths = []      # doc number -> weighted length
+        self._tags = []         # doc number -> frozenset of tags
+        self._doc_terms = []    # doc number -> tuple of terms (for removal)
+        self._versions = []     # doc number -> updated_at it was indexed at (naive UTC)
+        self._postings = {}     # term -> {doc number: weighted tf}
+        self._vocab = []        # sorted terms, for prefix lookups
+        self._total_length = 0.0
+        self._live = 0
+        self.synced_at = None   # refresh() watermark: newest updated_at read (naive UTC)
+        self._last_refresh = 0.0
+
+    def __len__(self):
+        return self._live
+
+    # ---- writes -----------------------------------------------------------
+
+    def add(self, thread):
+        """Index (or re-index) one thread doc with title/body/tags."""
+        key = str(thread["_id"])
+        freqs = {}
+        for term in tokenize(thread.get("title")):
+            freqs[term] = freqs.get(term, 0.0) + TITLE_BOOST
+        for term in tokenize(thread.get("body")):
+            freqs[term] = freqs.get(term, 0.0) + 1.0
+        length = sum(freqs.values())
+        version = _naive_utc(thread.get("updated_at"))
+
+        with self._lock:
+            self._remove_locked(key)
+            if self._free:
+                n = self._free.pop()
+                self._ids[n] = key
+                self._lengths[n] = length
+                self._tags[n] = frozenset(thread.get("tags") or ())
+                self._doc_terms[n] = tuple(freqs)
+                self._versions[n] = version
+            else:
+                n = len(self._ids)
+                self._ids.append(key)
+                self._lengths.append(length)
+                self._tags.append(frozenset(thread.get("tags") or ()))
+                self._doc_terms.append(tuple(freqs))
+                self._versions.append(version)
+            self._numbers[key] = n
+            for term, tf in freqs.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = {}
+                    bisect.insort(self._vocab, term)
+                posting[n] = tf
+            self._total_length += length
+            self._live += 1
+
+    def remove(self, thread_id):
+        with self._lock:
+            self._remove_locked(str(thread_id))
+
+    def _remove_locked(self, key):
+        n = self._numbers.pop(key, None)
+        if n is None:
+            return
+        for term in self._doc_terms[n]:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(n, None)
+            if not posting:
+                del self._postings[term]
+                i = bisect.bisect_left(self._vocab, term)
+                if i < len(self._vocab) and self._vocab[i] == term:
+                    del self._vocab[i]
+        self._total_length -= self._lengths[n]
+        self._live -= 1
+        self._ids[n] = None
+        self._lengths[n] = 0.0
+        self._tags[n] = frozenset()
+        self._doc_terms[n] = ()
+        self._versions[n] = None
+        self._free.append(n)
+
+    # ---- reads ------------------------------------------------------------
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self._vocab, prefix)
+        out = []
+        while i < len(self._vocab) and len(out) < MAX_PREFIX_EXPANSIONS:
+            term = self._vocab[i]
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+            i += 1
+        return out
+
+    def search(self, q, tag=None, limit=20, offset=0, prefix=True):
+        """
+        Return [(thread id, score)] best-first.
+        With `prefix`, the last word of `q` also matches longer terms.
+        """
+        terms = tokenize(q)
+        if not terms:
+            return []
+        with self._lock:
+            if not self._live:
+                return []
+            query = {t: 1.0 for t in terms}
+            if prefix:
+                for term in self._expand(terms[-1]):
+                    query.setdefault(term, 1.0)
+
+            n_docs = self._live
+            avg_len = self._total_length / n_docs or 1.0
+            plan = []  # (upper bound of the term's contribution, idf, posting)
+            for term, weight in query.items():
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)) * weight
+                plan.append((idf * (BM25_K1 + 1.0), idf, posting))
+            plan.sort(key=lambda p: p[0], reverse=True)
+
+            k = int(offset) + int(limit)
+            remaining = sum(p[0] for p in plan)
+            scores = {}
+            pruned = False
+            for bound, idf, posting in plan:
+                # Partial scores only grow, so the k-th best is a floor for the
+                # final cut: a doc not yet scored can't reach it with `remaining`.
+                if not pruned and len(scores) >= k and remaining < heapq.nlargest(k, scores.values())[-1]:
+                    pruned = True
+                if pruned:
+                    if len(scores) < len(posting):
+                        hits = [(n, posting[n]) for n in scores if n in posting]
+                    else:
+                        hits = [(n, tf) for n, tf in posting.items() if n in scores]
+                else:
+                    hits = posting.items()
+                for n, tf in hits:
+                    if tag and n not in scores and tag not in self._tags[n]:
+                        continue
+                    norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * self._lengths[n] / avg_len)
+                    scores[n] = scores.get(n, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+                remaining -= bound
+
+            best = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+            return [(self._ids[n], score) for n, score in best[int(offset):]]
+
+    # ---- sync / persistence -----------------------------------------------
+
+    def refresh(self, force=False):
+        """
+        Pull threads changed since the last sync (throttled to SEARCH_REFRESH_S).
+        Returns how many were (re-)indexed.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh < SEARCH_REFRESH_S:
+            return 0
+        self._last_refresh = now
+        filter_ = {}
+        if self.synced_at is not None:
+            filter_ = {"updated_at": {"$gte": self.synced_at - timedelta(seconds=SEARCH_REFRESH_OVERLAP_S)}}
+        db = get_db()
+        count = 0
+        cursor = db.threads.find(filter_, {"title": 1, "body": 1, "tags": 1, "updated_at": 1}).sort(
+            [("updated_at", 1), ("_id", 1)]
+        )
+        for thread in cursor:
+            updated_at = _naive_utc(thread.get("updated_at"))
+            n = self._numbers.get(str(thread["_id"]))
+            if n is None or updated_at is None or self._versions[n] != updated_at:
+                self.add(thread)
+                count += 1
+            if updated_at is not None and (self.synced_at is None or updated_at > self.synced_at):
+                self.synced_at = updated_at
+        return count
+
+    def prune(self):
+        """Drop indexed threads that no longer exist in Mongo. Returns how many."""
+        live = {str(doc["_id"]) for doc in get_db().threads.find({}, {"_id": 1})}
+        with self._lock:
+            stale = [key for key in self._numbers if key not in live]
+            for key in stale:
+                self._remove_locked(key)
+        return len(stale)
+
+    def rebuild(self):
+        """Index every thread from scratch."""
+        fresh = SearchIndex()
+        fresh.refresh(force=True)
+        with self._lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != "_lock"})
+
+    def save(self, path=SEARCH_INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            state = {k: v for k, v in self.__dict__.items() if k not in ("_lock", "_last_refresh")}
+            data = pickle.dumps({"format": _FORMAT, "state": state}, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=SEARCH_INDEX_PATH):
+        """Load a saved index, or None if missing/incompatible."""
+        try:
+            saved = pickle.loads(Path(path).read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if saved.get("format") != _FORMAT:
+            return None
+        index = cls()
+        index.__dict__.update(saved["state"])
+        return index
+
+
+_index = None
+_index_lock = threading.Lock()
+_loading_pid = None
+_saver_lock = None  # open lock file while this process is the one that saves
+
+
+def _claim_saver(path=SEARCH_INDEX_PATH):
+    """Whether this process saves the index on exit: the first to lock the file keeps it."""
+    global _saver_lock
+    if fcntl is None:
+        return True
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path.with_suffix(".lock"), "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _saver_lock = f
+    return True
+
+
+def _load_index():
+    global _index, _loading_pid
+    try:
+        index = SearchIndex.load()
+        if index is None:
+            index = SearchIndex()
+        else:
+            index.prune()  # deletes this file's saver never saw
+        index.refresh(force=True)
+        if _claim_saver():
+            atexit.register(index.save)
+        _index = index
+    finally:
+        _loading_pid = None
+
+
+def start_loading():
+    """Load this process's index on a background thread (no-op if loaded or loading)."""
+    global _loading_pid
+    pid = os.getpid()
+    if _index is not None or _loading_pid == pid:
+        return
+    with _index_lock:
+        if _index is not None or _loading_pid == pid:
+            return
+        _loading_pid = pid
+    threading.Thread(target=_load_index, name="search-index-load", daemon=True).start()
+
+
+def _reset_after_fork():
+    # A load started in the parent has no thread in the child.
+    global _index_lock, _loading_pid, _saver_lock
+    _index_lock = threading.Lock()
+    _loading_pid = None
+    _saver_lock = None  # the lock belongs to the parent's open file
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_search_index(wait=True):
+    """
+    This process's index: loaded from disk (or built) on first use. With
+    wait=False, returns None (and starts loading) if it isn't ready yet.
+    """
+    if _index is None:
+        if not wait:
+            start_loading()
+            return None
+        with _index_lock:
+            if _index is None:
+                _load_index()
+    return _index
+
+
+def set_search_index(index):
+    """Replace this process's index (benchmarks, tests); None drops it."""
+    global _index
+    _index = index
+
+
+def index_thread(thread):
+    """Called by threads_db after a create/update. No-op until the index is in use."""
+    if _index is not None:
+        _index.add(thread)
+
+
+def unindex_thread(thread_id):
+    if _index is not None:
+        _index.remove(thread_id)
+
+
+def search_thread_ids(q, tag=None, limit=20, offset=0):
+    """[(thread id, score)] for `q`, best first, or None while the index is still loading."""
+    index = get_search_index(wait=False)
+    if index is None:
+        return None
+    index.refresh()
+    return index.search(q, tag=tag, limit=limit, offset=offset)
+
+
+if __name__ == "__main__":  # `python -m backend.search_index` rebuilds and saves the index
+    started = time.perf_counter()
+    idx = SearchIndex()
+    idx.rebuild()
+    idx.save()
+    print(f"Indexed {len(idx)} threads in {time.perf_counter() - started:.1f}s -> {SEARCH_INDEX_PATH}")
@@ -0,0 +1,258 @@
+"""Synthetic data generator for load testing and benchmarks.
+
+  python -m backend.seed --users 2000 --threads-per-user 5 --comments-per-thread 8
+  python -m backend.seed --drop --users 200 --seed 7
+
+Documents use the same shape as the *_db write paths (users_db.create_user,
+threads_db.create_thread, comments_db.add_comment, follows_db.follow), with
+the denormalized counters filled in directly. The follow graph is power-law
+(a few very popular users, a long tail), tag usage is Zipf-distributed, and
+the same --seed always produces the same data: ids and timestamps come from
+the seeded RNG and a fixed --epoch (the newest possible created_at), so ids,
+orderings and keyset cursors repeat across runs too.
+
+Every user is `seed<N>@example.com` with the --password given here, so the
+load test (backend/loadtest.py) can log in as any of them.
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from backend.comments_db import ensure_comment_indexes, new_comment_doc
+from backend.db import get_db
+from backend.feed_db import FEED_FANOUT_MAX_FOLLOWERS, ensure_feed_indexes, rebuild_feed
+from backend.follows_db import ensure_follow_indexes
+from backend.passwords import hash_password
+from backend.query_cache import query_cache
+from backend.search_index import SearchIndex
+from backend.tags_db import ensure_tag_indexes, rebuild_tag_counts
+from backend.threads_db import ensure_thread_indexes
+from backend.users_db import ensure_user_indexes
+
+SEED_EMAIL = "seed{}@example.com"
+SEED_PASSWORD = "loadtest123"
+SEED_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+_BATCH = 1000
+
+_WORDS = (
+    "algorithms data structures exam midterm final lecture homework project group "
+    "study notes review office hours professor syllabus grade curve lab section "
+    "python java database mongo flask web app api deploy docker cloud server "
+    "internship resume interview career fair networking summer research paper "
+    "calculus linear algebra statistics probability physics chemistry biology "
+    "housing roommate dorm dining campus library coffee gym club event weekend "
+    "question help advice tips recommend anyone know looking best how why when"
+).split()
+
+_TAGS = (
+    "cs101 cs201 algorithms databases webdev python java career internships "
+    "housing events clubs math stats physics chemistry biology research "
+    "study-group exams advice food sports music gaming hackathon jobs "
+    "networking grad-school abroad scholarships"
+).split()
+
+
+class _Weighted:
+    """Draw indexes 0..n-1 with P(k) proportional to 1 / (k + 1) ** s (Zipf)."""
+
+    def __init__(self, n, s, rng):
+        self._rng = rng
+        self._cum = list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(n)))
+
+    def draw(self):
+        return bisect.bisect_left(self._cum, self._rng.random() * self._cum[-1])
+
+
+def _sentence(rng, lo, hi):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def _count(rng, mean):
+    # Geometric-ish spread around `mean` rather than every parent getting the same number.
+    return int(rng.expovariate(1.0 / mean)) if mean > 0 else 0
+
+
+def _object_id(rng, at):
+    # Seeded rather than ObjectId(): same --seed, same ids. The timestamp part
+    # keeps _id order in line with created_at, as it would be for live writes.
+    return ObjectId(int(at.timestamp()).to_bytes(4, "big") + rng.randbytes(8))
+
+
+def _insert(coll, docs):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= _BATCH:
+            coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+
+
+def generate(users=500, threads_per_user=3.0, comments_per_thread=5.0, follows_per_user=20.0,
+             follow_alpha=1.1, tag_zipf=1.2, tags_per_thread=2, days=90, password=SEED_PASSWORD,
+             seed=1, feeds=True, index=True, reply_fraction=0.3, epoch=SEED_EPOCH):
+    """Insert a synthetic dataset. Returns a dict of per-collection counts."""
+    rng = random.Random(seed)
+    db = get_db()
+    now = epoch
+    start = now - timedelta(days=days)
+    password_hash = hash_password(password)  # one hash: every seed user shares the password
+
+    def when(after=start):
+        return after + (now - after) * rng.random()
+
+    # Users.
+    user_docs = []
+    for i in range(users):
+        created = when()
+        user_docs.append({
+            "_id": _object_id(rng, created),
+            "email": SEED_EMAIL.format(i),
+            "display_name": f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()} {i}",
+            "password_hash": password_hash,
+            "profile": {"major": rng.choice(_TAGS), "interests": [], "courses": [], "grad_year": ""},
+            "follower_count": 0,
+            "following_count": 0,
+            "created_at": created,
+            "updated_at": created,
+        })
+    ids = [u["_id"] for u in user_docs]
+
+    # Follow graph: out-degree is exponential around the mean, targets are drawn
+    # by Zipf popularity rank, which gives a power-law in-degree distribution.
+    popularity = list(range(users))
+    rng.shuffle(popularity)
+    popular = _Weighted(users, follow_alpha, rng)
+    follows = []
+    for i, u in enumerate(user_docs):
+        targets = set()
+        for _ in range(min(_count(rng, follows_per_user), users - 1)):
+            j = popularity[popular.draw()]
+            if j != i:
+                targets.add(j)
+        u["following_count"] = len(targets)
+        for j in targets:
+            user_docs[j]["follower_count"] += 1
+            at = when(u["created_at"])
+            follows.append({"_id": _object_id(rng, at), "follower_id": u["_id"], "followee_id": ids[j], "created_at": at})
+    for u in user_docs:
+        if u["follower_count"] > FEED_FANOUT_MAX_FOLLOWERS:
+            u["feed_pull"] = True
+
+    _insert(db.users, user_docs)
+    _insert(db.follows, follows)
+
+    # Threads and comments.
+    tag_dist = _Weighted(len(_TAGS), tag_zipf, rng)
+    n_threads = n_comments = 0
+    threads, comments = [], []
+    for u in user_docs:
+        for _ in range(_count(rng, threads_per_user)):
+            created = when(u["created_at"])
+            thread = {
+                "_id": _object_id(rng, created),
+                "author_id": u["_id"],
+                "author_display_name": u["display_name"],
+                "title": _sentence(rng, 3, 10).capitalize(),
+                "body": ". ".join(_sentence(rng, 6, 20) for _ in range(rng.randint(1, 6))),
+                "tags": sorted({_TAGS[tag_dist.draw()] for _ in range(rng.randint(0, tags_per_thread))}),
+                "photo_ids": [],
+                "comment_count": 0,
+                "created_at": created,
+                "updated_at": created,
+                "last_activity_at": created,
+            }
+            in_thread = []
+            for _ in range(_count(rng, comments_per_thread)):
+                author = user_docs[rng.randrange(users)]
+                parent = rng.choice(in_thread) if in_thread and rng.random() < reply_fraction else None
+                at = when(parent["created_at"] if parent else created)
+                comment = new_comment_doc(
+                    thread["_id"], author["_id"], author["display_name"], _sentence(rng, 3, 30), parent, at,
+                    comment_id=_object_id(rng, at),
+                )
+                if comment["parent_id"] is not None:
+                    next(c for c in in_thread if c["_id"] == comment["parent_id"])["reply_count"] += 1
+                in_thread.append(comment)
+                comments.append(comment)
+                thread["comment_count"] += 1
+                thread["last_activity_at"] = max(thread["last_activity_at"], at)
+            threads.append(thread)
+            if len(comments) >= _BATCH:
+                _insert(db.comments, comments)
+                n_comments += len(comments)
+                comments = []
+            if len(threads) >= _BATCH:
+                _insert(db.threads, threads)
+                n_threads += len(threads)
+                threads = []
+    _insert(db.threads, threads)
+    _insert(db.comments, comments)
+    n_threads += len(threads)
+    n_comments += len(comments)
+
+    # Derived data the write paths would normally maintain.
+    for ensure in (ensure_thread_indexes, ensure_comment_indexes, ensure_user_indexes,
+                   ensure_follow_indexes, ensure_feed_indexes, ensure_tag_indexes):
+        ensure()
+    rebuild_tag_counts()
+    if feeds:
+        for uid in ids:
+            rebuild_feed(uid)
+    if index:
+        search = SearchIndex()
+        search.rebuild()
+        search.save()
+    query_cache.clear()
+
+    return {"users": users, "follows": len(follows), "threads": n_threads, "comments": n_comments}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.seed", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--threads-per-user", type=float, default=3.0, help="mean")
+    parser.add_argument("--comments-per-thread", type=float, default=5.0, help="mean")
+    parser.add_argument("--follows-per-user", type=float, default=20.0, help="mean out-degree")
+    parser.add_argument("--follow-alpha", type=float, default=1.1, help="power-law exponent of popularity")
+    parser.add_argument("--tag-zipf", type=float, default=1.2, help="Zipf exponent of tag usage")
+    parser.add_argument("--tags-per-thread", type=int, default=2, help="max tags per thread")
+    parser.add_argument("--reply-fraction", type=float, default=0.3, help="share of comments that are nested replies")
+    parser.add_argument("--days", type=int, default=90, help="spread created_at over this many days")
+    parser.add_argument("--epoch", type=datetime.fromisoformat, default=SEED_EPOCH,
+                        help=f"newest created_at, ISO 8601 (default {SEED_EPOCH.date()})")
+    parser.add_argument("--password", default=SEED_PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-feeds", action="store_true", help="skip rebuilding home feeds")
+    parser.add_argument("--drop", action="store_true",
+                        help="delete ALL users/threads/comments/follows/feeds/tags first "
+                             "(needed to re-seed: seed emails are unique)")
+    args = parser.parse_args(argv)
+
+    if args.drop:
+        db = get_db()
+        for name in ("users", "threads", "comments", "follows", "feeds", "tags"):
+            db[name].delete_many({})
+
+    started = time.perf_counter()
+    counts = generate(
+        users=args.users, threads_per_user=args.threads_per_user,
+        comments_per_thread=args.comments_per_thread, follows_per_user=args.follows_per_user,
+        follow_alpha=args.follow_alpha, tag_zipf=args.tag_zipf, tags_per_thread=args.tags_per_thread,
+        days=args.days, password=args.password, seed=args.seed, feeds=not args.no_feeds,
+        reply_fraction=args.reply_fraction,
+        epoch=args.epoch if args.epoch.tzinfo else args.epoch.replace(tzinfo=timezone.utc),
+    )
+    print(", ".join(f"{v} {k}" for k, v in counts.items()), f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
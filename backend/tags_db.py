@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from pymongo import DESCENDING, UpdateOne
+try:
+    from .db import get_db
+except ImportError:  # allows `python backend/tags_db.py`
+    from db import get_db
+
+# `tags` collection: one doc per tag, {_id: tag, count: <threads using it>}.
+# Kept current by threads_db on create/update/delete, so "top tags" and
+# per-tag counts are an indexed read instead of an $unwind over threads.
+
+
+def apply_tag_diff(old_tags, new_tags):
+    """Atomically adjust counters for one thread's tag change."""
+    old, new = set(old_tags or ()), set(new_tags or ())
+    added, removed = new - old, old - new
+    if not added and not removed:
+        return
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    ops = [
+        UpdateOne({"_id": t}, {"$inc": {"count": 1}, "$set": {"updated_at": now}}, upsert=True)
+        for t in added
+    ] + [
+        UpdateOne({"_id": t}, {"$inc": {"count": -1}, "$set": {"updated_at": now}})
+        for t in removed
+    ]
+    db.tags.bulk_write(ops, ordered=False)
+    if removed:
+        db.tags.delete_many({"_id": {"$in": list(removed)}, "count": {"$lte": 0}})
+
+
+def top_tags(limit=20):
+    """Most used tags: [{"_id": tag, "count": n}, ...]."""
+    db = get_db()
+    cursor = db.tags.find({}, {"count": 1}).sort([("count", DESCENDING), ("_id", 1)]).limit(int(limit))
+    return list(cursor)
+
+
+def get_tag_counts(tags):
+    """{tag: count} for the given tags (missing tags are left out)."""
+    db = get_db()
+    return {d["_id"]: d["count"] for d in db.tags.find({"_id": {"$in": list(tags)}}, {"count": 1})}
+
+
+def all_tag_counts():
+    db = get_db()
+    return {d["_id"]: d["count"] for d in db.tags.find({}, {"count": 1})}
+
+
+def rebuild_tag_counts():
+    """Recompute the whole collection from threads (server-side, replaces `tags`)."""
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    db.threads.aggregate([
+        # Count each thread once per tag, like apply_tag_diff does.
+        {"$project": {"tags": {"$cond": [{"$isArray": "$tags"}, {"$setUnion": ["$tags", []]}, []]}}},
+        {"$unwind": "$tags"},
+        {"$match": {"tags": {"$type": "string"}}},
+        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+        {"$set": {"updated_at": now}},
+        {"$out": "tags"},
+    ])
+    ensure_tag_indexes()
+
+
+def ensure_tag_indexes():
+    db = get_db()
+    db.tags.create_index([("count", DESCENDING), ("_id", 1)])
+
+
+if __name__ == "__main__":  # `python -m backend.tags_db` rebuilds tag counters
+    rebuild_tag_counts()
+    print("Rebuilt tag counts")
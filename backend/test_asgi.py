@@ -0,0 +1,63 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from backend.aio import threads_db as aio_threads_db
+
+
+def _call(app, method, path, query=b"", headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+        "root_path": "", "headers": list(headers), "server": ("127.0.0.1", 5000), "client": ("127.0.0.1", 1),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+
+def test_async_reads_run_natively_with_etags(mongo, monkeypatch):
+    from backend.flask.asgi import app
+
+    now = datetime.now(timezone.utc)
+    docs = [{"_id": ObjectId(), "title": "hello", "created_at": now, "updated_at": now}]
+    calls = []
+
+    async def list_threads(**kwargs):
+        calls.append(kwargs)
+        return docs
+
+    monkeypatch.setattr(aio_threads_db, "list_threads", list_threads)
+    status, headers, body = _call(app, "GET", "/api/async/threads", b"limit=5")
+    assert status == 200
+    assert json.loads(body)["items"][0]["title"] == "hello"
+    assert calls[0]["limit"] == 5
+
+    status, _, body = _call(app, "GET", "/api/async/threads", b"limit=5",
+                            [(b"if-none-match", headers["etag"].encode())])
+    assert status == 304 and body == b""
+    assert len(calls) == 1  # second request was a query-cache hit
+
+    status, _, body = _call(app, "GET", "/api/async/threads", b"sort=relevance")
+    assert status == 400 and json.loads(body) == {"ok": False, "error": "sort=relevance requires q."}
+
+
+def test_other_routes_go_to_flask(mongo):
+    from backend.flask.asgi import app
+
+    mongo.threads.insert_one({"title": "sync", "created_at": datetime.now(timezone.utc)})
+    status, _, body = _call(app, "GET", "/api/threads")
+    assert status == 200 and json.loads(body)["items"][0]["title"] == "sync"
+    status, _, _ = _call(app, "POST", "/api/async/threads/x/comments")
+    assert status == 401  # login_required, handled by the Flask view
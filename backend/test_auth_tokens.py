@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+
+from backend.flask import auth
+
+
+@pytest.fixture
+def client(app, user):
+    return app.test_client()
+
+
+def _login(client):
+    res = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "first-password"})
+    assert res.status_code == 200
+    client.delete_cookie("session")  # authenticate with the token alone
+    return res.get_json()["token"]
+
+
+def _me(client, token):
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_token_authenticates(client):
+    token = _login(client)
+    assert _me(client, token).get_json()["user"]["email"] == "ada@example.com"
+
+
+def test_account_update_revokes_tokens(client):
+    from backend.users_db import get_user_by_email, update_user_account
+
+    token = _login(client)
+    update_user_account(get_user_by_email("ada@example.com")["_id"], {"password": "second-password"})
+    assert _me(client, token).status_code == 401
+
+
+def test_renewal_keeps_login_time_and_stops_at_max_age(client, monkeypatch):
+    token = _login(client)
+    serializer = URLSafeTimedSerializer(client.application.secret_key, salt="api-token")
+    logged_in_at = serializer.loads(token)["auth"]
+
+    renewed = client.post("/api/auth/token", headers={"Authorization": f"Bearer {token}"}).get_json()["token"]
+    assert serializer.loads(renewed)["auth"] == logged_in_at
+
+    monkeypatch.setattr(auth, "API_TOKEN_MAX_AGE_S", time.time() - logged_in_at - 1)
+    assert _me(client, renewed).status_code == 401
+    assert client.post("/api/auth/token", headers={"Authorization": f"Bearer {renewed}"}).status_code == 401
+
+
+def test_tokens_without_version_are_rejected(client):
+    _login(client)
+    serializer = URLSafeTimedSerializer(client.application.secret_key, salt="api-token")
+    from backend.users_db import get_user_by_email
+
+    legacy = serializer.dumps({"id": str(get_user_by_email("ada@example.com")["_id"])})
+    assert _me(client, legacy).status_code == 401
@@ -0,0 +1,36 @@
+import json
+
+from backend.bulk import import_file
+
+
+def test_defer_indexes_keeps_unique_indexes(mongo, tmp_path):
+    path = tmp_path / "users.ndjson"
+    rows = [{"email": "a@example.com"}, {"email": "b@example.com"}, {"email": "a@example.com"}]
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+    import_file("users", path, defer_indexes=True)
+
+    assert mongo.users.count_documents({}) == 2  # the duplicate email was rejected
+    unique = [i for i in mongo.users.index_information().values() if i.get("unique")]
+    assert [i["key"] for i in unique] == [[("email", 1)]]
+
+
+def test_replayed_rows_without_id_are_not_duplicated(mongo, tmp_path):
+    path = tmp_path / "comments.ndjson"
+    rows = [{"body": "first"}, {"body": "second"}, {"body": "first"}]
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+    assert import_file("comments", path, batch_size=2) == 3
+    import_file("comments", path, batch_size=2)  # e.g. a batch replayed after a crash
+
+    assert mongo.comments.count_documents({}) == 3
+
+
+def test_upsert_counts_unchanged_rows(mongo, tmp_path):
+    path = tmp_path / "threads.ndjson"
+    rows = [{"_id": {"$oid": "65a000000000000000000001"}, "title": "a"}, {"title": "no id"}]
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+    assert import_file("threads", path, upsert=True) == 2
+    assert import_file("threads", path, upsert=True) == 2  # matched but unchanged still count
+    assert mongo.threads.count_documents({}) == 2
@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from backend.comments_db import _decode_path_cursor, _encode_path_cursor, next_comment_cursor
+from backend.cursors import decode_keyset, encode_keyset
+from backend.threads_db import decode_cursor, encode_cursor, next_cursor
+
+
+def test_keyset_round_trip():
+    key = datetime(2026, 3, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+    oid = ObjectId()
+    assert decode_keyset(encode_keyset(key, oid)) == (key, oid)
+
+
+def test_keyset_naive_datetime_is_utc():
+    oid = ObjectId()
+    naive = datetime(2026, 3, 1, 12, 0)
+    assert decode_keyset(encode_keyset(naive, oid))[0] == naive.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", "MTIzOmJhZA"])
+def test_keyset_rejects_malformed(token):
+    with pytest.raises(ValueError):
+        decode_keyset(token)
+
+
+def test_thread_cursor_uses_sort_field():
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    active = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    doc = {"_id": ObjectId(), "created_at": created, "last_activity_at": active}
+    assert decode_cursor(encode_cursor(doc, "recent"))[0] == created
+    assert decode_cursor(encode_cursor(doc, "activity"))[0] == active
+    with pytest.raises(ValueError):
+        encode_cursor(doc, "bogus")
+
+
+def test_next_cursor_only_on_full_page():
+    docs = [{"_id": ObjectId(), "created_at": datetime(2026, 1, d, tzinfo=timezone.utc)} for d in (3, 2, 1)]
+    assert next_cursor(docs, 4) is None
+    assert decode_cursor(next_cursor(docs, 3)) == (docs[-1]["created_at"], docs[-1]["_id"])
+
+
+def test_comment_path_cursor_round_trip():
+    path = f"{ObjectId()}.{ObjectId()}"
+    assert _decode_path_cursor(_encode_path_cursor(path)) == path
+    assert next_comment_cursor([{"path": "a"}], 2) is None
+    assert _decode_path_cursor(next_comment_cursor([{"path": "a"}, {"path": path}], 2)) == path
+
+
+def test_comment_path_cursor_rejects_malformed():
+    with pytest.raises(ValueError):
+        _decode_path_cursor("__4")  # not UTF-8
+
+
+def test_keyset_missing_key_round_trip():
+    oid = ObjectId()
+    assert decode_keyset(encode_keyset(None, oid)) == (None, oid)
+
+
+def test_activity_paging_reaches_docs_without_last_activity(mongo):
+    from backend.threads_db import list_threads
+
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [{"_id": ObjectId(), "title": str(i), "created_at": base, "last_activity_at": base.replace(day=i + 1)}
+            for i in range(3)]
+    docs += [{"_id": ObjectId(), "title": f"old{i}", "created_at": base} for i in range(3)]  # pre-repair
+    mongo.threads.insert_many(docs)
+
+    seen, after = [], None
+    while True:
+        page = list_threads(limit=2, after=after, sort="activity")
+        seen += [t["title"] for t in page]
+        after = next_cursor(page, 2, "activity")
+        if after is None:
+            break
+    assert seen == ["2", "1", "0", "old2", "old1", "old0"]
+
+
+def test_deleting_newest_comment_rolls_back_activity(mongo):
+    from backend.comments_db import add_comment, delete_comment
+
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    thread_id = mongo.threads.insert_one(
+        {"title": "t", "comment_count": 0, "created_at": created, "last_activity_at": created}
+    ).inserted_id
+    author = ObjectId()
+    first = add_comment(thread_id, author, "Ada", "first")
+    last = add_comment(thread_id, author, "Ada", "second")
+    activity = lambda: mongo.threads.find_one({"_id": thread_id})["last_activity_at"]
+    assert activity() == mongo.comments.find_one({"_id": last["_id"]})["created_at"]
+
+    assert delete_comment(last["_id"], author)
+    assert activity() == mongo.comments.find_one({"_id": first["_id"]})["created_at"]
+    assert delete_comment(first["_id"], author)
+    assert activity() == created
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from backend import feed_db
+from backend.feed_db import fan_out_thread, get_feed
+
+
+@pytest.fixture
+def authors(mongo):
+    feed_db._pull_authors_cache.clear()
+    author, reader = ObjectId(), ObjectId()
+    mongo.users.insert_many([{"_id": author, "follower_count": 1}, {"_id": reader, "follower_count": 0}])
+    mongo.follows.insert_one({"follower_id": reader, "followee_id": author})
+    yield mongo, author, reader
+    feed_db._pull_authors_cache.clear()
+
+
+def _post(db, author, n):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    threads = []
+    for i in range(n):
+        thread = {"_id": ObjectId(), "author_id": author, "title": f"t{i}", "created_at": start + timedelta(minutes=i)}
+        db.threads.insert_one(thread)
+        fan_out_thread(thread)
+        threads.append(thread)
+    return threads[::-1]  # newest first
+
+
+def test_fan_out_reaches_followers(authors):
+    db, author, reader = authors
+    posted = _post(db, author, 3)
+    items, next_after = get_feed(reader, limit=10)
+    assert [t["_id"] for t in items] == [t["_id"] for t in posted]
+    assert next_after is None
+
+
+def test_pull_author_threads_are_not_duplicated(authors):
+    db, author, reader = authors
+    posted = _post(db, author, 5)
+    # The author crosses the fan-out threshold: older threads stay in the
+    # stored feed and are now also merged in at read time.
+    db.users.update_one({"_id": author}, {"$set": {"feed_pull": True}})
+    feed_db._pull_authors_cache.clear()
+
+    seen, after = [], None
+    while True:
+        items, after = get_feed(reader, limit=2, after=after)
+        seen += [t["_id"] for t in items]
+        if after is None:
+            break
+    assert seen == [t["_id"] for t in posted]
@@ -0,0 +1,31 @@
+import math
+from datetime import datetime
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from backend.flask.json_provider import BSONJSONProvider
+
+
+def _providers():
+    app = Flask(__name__)
+    return app, BSONJSONProvider(app), DefaultJSONProvider(app)
+
+
+def test_output_matches_stdlib_provider():
+    app, bson_json, stdlib_json = _providers()
+    obj = {"score": [1e-7, 1e16, math.nan, 0.1], "text": "café", "n": 2**70, "nested": {"b": 1, "a": None}}
+    with app.app_context():
+        assert bson_json.dumps(obj) == stdlib_json.dumps(obj)
+        assert bson_json.response(obj).get_data() == stdlib_json.response(obj).get_data()
+
+
+def test_bson_types():
+    app, bson_json, _ = _providers()
+    oid = ObjectId()
+    with app.app_context():
+        assert bson_json.loads(bson_json.dumps({"_id": oid, "at": datetime(2026, 1, 2, 3, 4, 5)})) == {
+            "_id": str(oid),
+            "at": "2026-01-02T03:04:05",
+        }
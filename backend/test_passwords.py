@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from backend import passwords
+from backend.passwords import HashingBusy
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(passwords, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(passwords, "_target", None)
+    yield
+    passwords.shutdown()
+
+
+def test_timed_out_hash_keeps_its_slot(one_slot, monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_TIMEOUT_S", 0.05)
+    with pytest.raises(HashingBusy):
+        passwords._run(time.sleep, 1.0)
+    # Still running in the pool: the queue limit must still count it.
+    with pytest.raises(HashingBusy):
+        passwords._run(time.sleep, 0)
+
+    deadline = time.monotonic() + 30
+    while not passwords._slots.acquire(blocking=False):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    passwords._slots.release()
+
+
+def test_needs_rehash(one_slot, monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 0)
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    current = passwords.hash_password("secret")
+    assert not passwords.needs_rehash(current)
+    assert passwords.needs_rehash(current.replace("pbkdf2:sha256:1000", "pbkdf2:sha256:999"))
+    assert passwords.needs_rehash("plaintext")
+
+
+def test_needs_rehash_defers_when_busy(one_slot, monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 0)
+    passwords._slots.acquire()
+    try:
+        assert passwords.needs_rehash("pbkdf2:sha256:1$ab$cd") is False
+    finally:
+        passwords._slots.release()
@@ -0,0 +1,50 @@
+import threading
+
+from bson import ObjectId
+
+from backend.comments_db import add_comment, update_comment
+from backend.query_cache import MemoryBackend, QueryCache, query_cache
+
+
+def test_tag_bump_orphans_entries():
+    cache = QueryCache(MemoryBackend())
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute("ns", {"a": 1}, ["t"], compute) == 1
+    assert cache.get_or_compute("ns", {"a": 1}, ["t"], compute) == 1
+    cache.invalidate("other")
+    assert cache.get_or_compute("ns", {"a": 1}, ["t"], compute) == 1
+    cache.invalidate("t")
+    assert cache.get_or_compute("ns", {"a": 1}, ["t"], compute) == 2
+
+
+def test_comment_edit_keeps_thread_lists(mongo):
+    thread_id = mongo.threads.insert_one({"title": "t", "comment_count": 0}).inserted_id
+    author = ObjectId()
+    comment = add_comment(thread_id, author, "Ada", "first")
+    versions = lambda: query_cache.backend.versions(("threads", f"thread:{thread_id}"))
+
+    before = versions()
+    assert update_comment(comment["_id"], author, "edited")
+    after = versions()
+    assert after[1] == before[1]  # lists untouched
+    assert after[2] == before[2] + 1  # thread page invalidated
+
+    add_comment(thread_id, author, "Ada", "second")  # comment_count changed: lists too
+    assert versions()[1] == after[1] + 1
+
+
+def test_counters_are_exact_under_concurrency():
+    cache = QueryCache(MemoryBackend())
+    cache.get_or_compute("ns", {}, ["t"], lambda: 1)
+
+    def worker():
+        for _ in range(2000):
+            cache.get_or_compute("ns", {}, ["t"], lambda: 1)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["hits"] == 16000 and cache.stats()["misses"] == 1
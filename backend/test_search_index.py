@@ -0,0 +1,109 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from backend import search_index
+from backend.search_index import BM25_B, BM25_K1, SearchIndex
+
+
+def _thread(i, title, body="", tags=(), at=None):
+    return {"_id": ObjectId(), "title": title, "body": body, "tags": list(tags),
+            "updated_at": at or datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i)}
+
+
+def test_refresh_does_not_reindex_or_grow(mongo):
+    same = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    mongo.threads.insert_many([_thread(i, f"title {i}", at=same) for i in range(3)])
+    index = SearchIndex()
+    assert index.refresh(force=True) == 3
+    assert index.refresh(force=True) == 0  # re-read inside the overlap window, but unchanged
+    mongo.threads.update_one({}, {"$set": {"title": "renamed", "updated_at": same + timedelta(1)}})
+    assert index.refresh(force=True) == 1
+    assert len(index) == 3 and len(index._ids) == 3
+    assert index.search("renamed")
+
+
+def test_refresh_sees_late_writes_with_older_timestamps(mongo):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    mongo.threads.insert_one(_thread(0, "first", at=base + timedelta(seconds=30)))
+    index = SearchIndex()
+    index.refresh(force=True)
+    # Another worker's clock runs behind: its write lands after our refresh
+    # but carries an updated_at below the watermark.
+    mongo.threads.insert_one(_thread(1, "straggler", at=base + timedelta(seconds=5)))
+    assert index.refresh(force=True) == 1
+    assert index.search("straggler")
+
+
+def test_prune_drops_deleted_threads(mongo):
+    docs = [_thread(i, f"title {i}") for i in range(3)]
+    mongo.threads.insert_many(docs)
+    index = SearchIndex()
+    index.refresh(force=True)
+    mongo.threads.delete_one({"_id": docs[0]["_id"]})
+    assert index.prune() == 1
+    assert len(index) == 2 and str(docs[0]["_id"]) not in index._numbers
+
+
+def test_only_one_process_claims_saving(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "_saver_lock", None)
+    path = tmp_path / "index.pkl"
+    assert search_index._claim_saver(path)
+    held = search_index._saver_lock
+    assert not search_index._claim_saver(path)  # a second open file can't take the lock
+    held.close()
+
+
+def test_reindex_and_remove_reuse_doc_numbers():
+    index = SearchIndex()
+    docs = [_thread(i, f"alpha {i}") for i in range(4)]
+    for doc in docs:
+        index.add(doc)
+    for _ in range(3):
+        index.add({**docs[0], "title": "beta"})
+    index.remove(docs[1]["_id"])
+    index.add(_thread(9, "gamma"))
+    assert len(index._ids) == 4 and len(index) == 4
+    assert [hit for hit, _ in index.search("beta")] == [str(docs[0]["_id"])]
+
+
+def _brute_force(index, q, tag=None):
+    # Unpruned BM25 over the same postings, for comparison.
+    terms = search_index.tokenize(q)
+    query = {t: 1.0 for t in terms}
+    for term in index._expand(terms[-1]):
+        query.setdefault(term, 1.0)
+    avg_len = index._total_length / index._live
+    scores = {}
+    for term in query:
+        posting = index._postings.get(term, {})
+        idf = math.log(1.0 + (index._live - len(posting) + 0.5) / (len(posting) + 0.5))
+        for n, tf in posting.items():
+            if tag and tag not in index._tags[n]:
+                continue
+            norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * index._lengths[n] / avg_len)
+            scores[n] = scores.get(n, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+    return scores
+
+
+def test_pruned_top_k_matches_full_scoring():
+    rng = random.Random(7)
+    words = [f"w{i}" for i in range(40)]
+    index = SearchIndex()
+    for i in range(500):
+        body = " ".join(rng.choices(words, weights=range(40, 0, -1), k=rng.randint(3, 30)))
+        index.add(_thread(i, " ".join(rng.sample(words, 2)), body, tags=rng.sample(["a", "b", "c"], 1)))
+    for q, tag in [("w0 w1 w39", None), ("w3 w", None), ("w0 w2 w30", "b"), ("w17", None)]:
+        scores = _brute_force(index, q, tag)
+        got = index.search(q, tag=tag, limit=10)
+        want = sorted(scores.values(), reverse=True)[:10]
+        assert [round(s, 9) for _, s in got] == [round(s, 9) for s in want]
+        for key, score in got:
+            assert math.isclose(scores[index._numbers[key]], score)
+
+
+def test_relevance_rejects_after_cursor(app):
+    response = app.test_client().get("/api/threads?q=exam&sort=relevance&after=abc")
+    assert response.status_code == 400
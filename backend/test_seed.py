@@ -0,0 +1,20 @@
+from backend.seed import generate
+
+
+def _snapshot(db):
+    return {
+        name: list(db[name].find({}, {"password_hash": 0}).sort("_id", 1))
+        for name in ("users", "follows", "threads", "comments")
+    }
+
+
+def test_same_seed_same_data(mongo):
+    kwargs = dict(users=12, threads_per_user=2.0, comments_per_thread=3.0, follows_per_user=3.0,
+                  seed=5, feeds=False, index=False)
+    generate(**kwargs)
+    first = _snapshot(mongo)
+    for name in first:
+        mongo[name].delete_many({})
+    generate(**kwargs)
+    assert _snapshot(mongo) == first
+    assert first["threads"] and first["comments"]
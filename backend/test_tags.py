@@ -0,0 +1,43 @@
+import pytest
+
+from backend.tags_db import all_tag_counts
+from backend.threads_db import create_thread, normalize_tags, update_thread
+
+
+@pytest.mark.parametrize("tags, expected", [
+    (None, []),
+    ([], []),
+    ([" python ", "python", "", "  ", "flask"], ["python", "flask"]),
+    (("b", "a", "b"), ["b", "a"]),
+])
+def test_normalize_tags(tags, expected):
+    assert normalize_tags(tags) == expected
+
+
+@pytest.mark.parametrize("tags", ["python", ["python", 3], [None], {"python": 1}, 7])
+def test_normalize_tags_rejects(tags):
+    with pytest.raises(ValueError):
+        normalize_tags(tags)
+
+
+def test_duplicate_tags_are_counted_once(user):
+    thread = create_thread(user["_id"], "Ada", "title", "body", tags=["x", "x ", "y"])
+    assert thread["tags"] == ["x", "y"]
+    assert all_tag_counts() == {"x": 1, "y": 1}
+    update_thread(thread["_id"], user["_id"], {"tags": ["y", "y", "z"]})
+    assert all_tag_counts() == {"y": 1, "z": 1}
+
+
+@pytest.mark.parametrize("tags", ["python", ["ok", 1]])
+def test_api_rejects_bad_tags_before_insert(app, user, mongo, tags):
+    client = app.test_client()
+    client.post("/api/auth/login", json={"email": "ada@example.com", "password": "first-password"})
+    res = client.post("/api/threads", json={"title": "t", "body": "b", "tags": tags})
+    assert res.status_code == 400
+    assert mongo.threads.count_documents({}) == 0
+    assert all_tag_counts() == {}
+
+    thread = create_thread(user["_id"], "Ada", "title", "body", tags=["ok"])
+    res = client.patch(f"/api/threads/{thread['_id']}", json={"tags": tags})
+    assert res.status_code == 400
+    assert mongo.threads.find_one({"_id": thread["_id"]})["tags"] == ["ok"]
@@ -0,0 +1,73 @@
+import logging
+from types import SimpleNamespace
+
+from flask import Flask, Response, stream_with_context
+
+from backend import db
+from backend.flask import timing
+
+
+def _event(request_id, command=None, micros=1000):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name="find",
+        command=command or {"find": "comments", "filter": {"thread_id": 1}},
+        duration_micros=micros,
+    )
+
+
+def _run_command(request_id):
+    db.command_stats.started(_event(request_id))
+    db.command_stats.succeeded(_event(request_id))
+
+
+def test_shapes_only_for_scoped_or_slow(monkeypatch):
+    monkeypatch.setattr(db, "MONGO_SLOW_QUERY_MS", 100)
+    shapes = []
+    monkeypatch.setattr(db, "command_shape", lambda *args: shapes.append(args) or "shape")
+    _run_command(1)  # fast and unscoped
+    assert shapes == []
+    scope = db.track_commands()
+    try:
+        _run_command(2)
+    finally:
+        db.stop_tracking_commands()
+    assert len(shapes) == 1 and scope.count == 1
+
+
+def test_streamed_queries_are_logged_with_final_totals(monkeypatch, caplog):
+    monkeypatch.setattr(timing, "SLOW_REQUEST_QUERIES", 3)
+    app = Flask(__name__)
+    timing.init_app(app)
+
+    @app.get("/stream")
+    def stream():
+        _run_command(10)
+
+        def body():
+            for request_id in (11, 12):
+                _run_command(request_id)
+                yield "chunk"
+
+        return Response(stream_with_context(body()))
+
+    with caplog.at_level(logging.WARNING, logger=timing.__name__):
+        response = app.test_client().get("/stream")
+        assert 'desc="before streaming"' in response.headers["Server-Timing"]
+        assert not caplog.records  # only one query before the headers went out
+        assert response.get_data(as_text=True) == "chunkchunk"
+        response.close()
+    assert len(caplog.records) == 1
+    assert "in 3 queries" in caplog.records[0].getMessage()
+
+
+def test_pending_commands_without_reply_are_evicted(monkeypatch):
+    stats = db.CommandStats()
+    clock = [1000.0]
+    monkeypatch.setattr(db.time, "monotonic", lambda: clock[0])
+    stats._swept = clock[0]
+    stats.started(_event(20))  # its connection dies: no succeeded/failed event
+    clock[0] += db._PENDING_MAX_AGE_S + 1
+    stats.started(_event(21))
+    assert list(stats._pending) == [(("localhost", 27017), 21)]
@@ -0,0 +1,35 @@
+from backend.typeahead import TagSuggester, UserSuggester
+
+
+def test_tag_suggester_bootstraps_counts(mongo):
+    mongo.threads.insert_many([{"tags": ["python", "pytest"]}, {"tags": ["python"]}, {"tags": []}])
+    suggester = TagSuggester()
+    assert suggester.suggest("py") == [{"tag": "python", "count": 2}, {"tag": "pytest", "count": 1}]
+    assert mongo.tags.count_documents({}) == 2
+
+
+def test_reload_reads_without_the_lock(mongo):
+    mongo.users.insert_one({"display_name": "Ada"})
+    suggester = UserSuggester()
+    assert suggester.suggest("a") and suggester.loaded
+
+    fetch = suggester._fetch
+    held = []
+
+    def spy(first):
+        held.append(suggester._lock.locked())
+        return fetch(first)
+
+    suggester._fetch = spy
+    mongo.users.insert_one({"display_name": "Alan"})
+    suggester._refreshing = True
+    suggester._background_reload()
+    assert held == [False]
+    assert [u["display_name"] for u in suggester.suggest("a")] == ["Ada", "Alan"]
+
+
+def test_user_suggest_requires_login(app, user):
+    client = app.test_client()
+    assert client.get("/api/users/suggest?q=a").status_code == 401
+    client.post("/api/auth/login", json={"email": "ada@example.com", "password": "first-password"})
+    assert client.get("/api/users/suggest?q=a").status_code == 200
@@ -1,9 +1,22 @@
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument
 try:
     from .db import get_db
+    from .cursors import decode_keyset, encode_keyset
+    from .feed_db import fan_out_thread
+    from .query_cache import invalidate_threads, query_cache
+    from .search_index import index_thread, search_thread_ids, unindex_thread
+    from .tags_db import apply_tag_diff
+    from .typeahead import tags_changed
 except ImportError:  # allows `python backend/threads_db.py`
     from db import get_db
+    from cursors import decode_keyset, encode_keyset
+    from feed_db import fan_out_thread
+    from query_cache import invalidate_threads, query_cache
+    from search_index import index_thread, search_thread_ids, unindex_thread
+    from tags_db import apply_tag_diff
+    from typeahead import tags_changed
 
 def _oid(x):
     """Convert string/ObjectId -> ObjectId."""
@@ -11,7 +24,132 @@ def _oid(x):
         return x
     return ObjectId(str(x))
 
+# ?sort= value -> the date field threads are ordered by (newest first).
+SORT_FIELDS = {
+    "recent": "created_at",
+    "activity": "last_activity_at",
+}
+# Everything /api/threads accepts; "relevance" needs q (see search_threads_ranked).
+SORTS = (*SORT_FIELDS, "relevance")
+
+# Fields a caller may ask for via `fields=` (plus the computed `body_preview`).
+THREAD_FIELDS = {
+    "author_id", "author_display_name", "title", "body", "body_preview",
+    "tags", "photo_ids", "created_at", "updated_at",
+    "comment_count", "last_activity_at",
+}
+BODY_PREVIEW_CHARS = 200
+
+# Just what list views render: no full body, no photo_ids.
+SUMMARY_PROJECTION = {
+    "author_id": 1,
+    "author_display_name": 1,
+    "title": 1,
+    "tags": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "comment_count": 1,
+    "last_activity_at": 1,
+    "body_preview": {"$substrCP": ["$body", 0, BODY_PREVIEW_CHARS]},
+}
+
+def thread_projection(fields):
+    """
+    Build a find() projection from a list of field names (or "summary").
+    Returns None for "everything". Raises ValueError on unknown fields.
+    Sort keys, updated_at and _id are always kept so cursor paging and
+    list ETags keep working.
+    """
+    if not fields:
+        return None
+    if fields == "summary" or list(fields) == ["summary"]:
+        return dict(SUMMARY_PROJECTION)
+    unknown = set(fields) - THREAD_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {f: 1 for f in fields}
+    if "body_preview" in projection:
+        projection["body_preview"] = SUMMARY_PROJECTION["body_preview"]
+    for key in (*SORT_FIELDS.values(), "updated_at", "comment_count"):
+        projection[key] = 1
+    return projection
+
+def _sort_field(sort):
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Unknown sort: {sort}")
+    return SORT_FIELDS[sort]
+
+def encode_cursor(doc, sort="recent"):
+    """
+    Build an opaque paging token from a thread's (sort key, _id).
+    Pass it back as `after` (with the same `sort`) to get the page that follows `doc`.
+    """
+    # Pre-repair docs may lack last_activity_at; they sort last (see _after_filter).
+    return encode_keyset(doc.get(_sort_field(sort)), doc["_id"])
+
+def decode_cursor(token):
+    """Opaque token -> (sort key datetime or None, _id). Raises ValueError if malformed."""
+    return decode_keyset(token)
+
+def next_cursor(items, limit, sort="recent"):
+    """Token for the page after `items`, or None when this was the last page."""
+    if not items or len(items) < int(limit):
+        return None
+    return encode_cursor(items[-1], sort)
+
+def _after_filter(after, field):
+    # Keyset condition: strictly "older" than the cursor in (field, _id) order.
+    # Docs missing the field sort below every date, i.e. last in this order.
+    key, oid = decode_cursor(after)
+    if key is None:
+        return {field: None, "_id": {"$lt": oid}}
+    return {
+        "$or": [
+            {field: {"$lt": key}},
+            {field: key, "_id": {"$lt": oid}},
+            {field: None},
+        ]
+    }
+
+def page_query(filter_, skip, after, sort="recent"):
+    """
+    Newest-first page over threads, ordered by SORT_FIELDS[sort].
+    With `after`, seeks straight to the cursor position through the
+    (field, _id) index; otherwise falls back to skip.
+    Returns (filter, sort spec, skip) for find(); shared with backend.aio.
+    """
+    field = _sort_field(sort)
+    if after:
+        filter_ = {**filter_, **_after_filter(after, field)}
+        skip = 0
+    return filter_, [(field, -1), ("_id", -1)], int(skip)
+
+def _page(filter_, limit, skip, after, projection=None, sort="recent"):
+    # `projection` is passed straight to find() (see thread_projection).
+    db = get_db()
+    filter_, sort_spec, skip = page_query(filter_, skip, after, sort)
+    cursor = (
+        db.threads.find(filter_, projection)
+        .sort(sort_spec)
+        .skip(skip)
+        .limit(int(limit))
+    )
+    return list(cursor)
+
+def normalize_tags(tags):
+    """
+    Tags as stored: stripped, non-empty, de-duplicated strings in first-seen
+    order. Raises ValueError for anything but a list of strings.
+    """
+    if tags is None:
+        return []
+    if not isinstance(tags, (list, tuple)) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be a list of strings.")
+    return list(dict.fromkeys(t.strip() for t in tags if t.strip()))
+
 def create_thread(author_id, author_display_name, title, body, tags=None, photo_ids=None):
+    """Insert a thread. Raises ValueError on malformed tags (before anything is written)."""
+    tags = normalize_tags(tags)
     db = get_db()
     now = datetime.now(timezone.utc)
     doc = {
@@ -19,24 +157,55 @@ def create_thread(author_id, author_display_name, title, body, tags=None, photo_
         "author_display_name": author_display_name,
         "title": title.strip(),
         "body": body.strip(),
-        "tags": tags or [],
+        "tags": tags,
         "photo_ids": photo_ids or [],
+        "comment_count": 0,
         "created_at": now,
         "updated_at": now,
+        "last_activity_at": now,
     }
     res = db.threads.insert_one(doc)
     doc["_id"] = res.inserted_id
+    fan_out_thread(doc)
+    index_thread(doc)
+    apply_tag_diff([], doc["tags"])
+    tags_changed([], doc["tags"])
+    invalidate_threads()
     return doc
 
-def list_threads(limit=20, skip=0):
-    db = get_db()
-    cursor = db.threads.find({}).sort("created_at", -1).skip(int(skip)).limit(int(limit))
-    return list(cursor)
+def list_threads(limit=20, skip=0, after=None, projection=None, sort="recent"):
+    return _page({}, limit, skip, after, projection, sort)
 
 def get_thread(thread_id):
     db = get_db()
     return db.threads.find_one({"_id": _oid(thread_id)})
 
+def get_thread_with_comments(thread_id, comment_limit=200):
+    """
+    Fetch a thread plus its first page of comments (oldest -> newest) in a
+    single aggregation round trip.
+    Returns the thread doc with extra `comments` and `comment_count` keys, or None.
+    """
+    db = get_db()
+    docs = list(db.threads.aggregate(thread_with_comments_pipeline(thread_id, comment_limit)))
+    return docs[0] if docs else None
+
+def thread_with_comments_pipeline(thread_id, comment_limit):
+    return [
+        {"$match": {"_id": _oid(thread_id)}},
+        {"$lookup": {
+            "from": "comments",
+            "localField": "_id",
+            "foreignField": "thread_id",
+            # Display order (comments_db.COMMENT_SORT), so list_comments_page cursors continue this page.
+            "pipeline": [{"$sort": {"path": 1}}, {"$limit": int(comment_limit)}],
+            "as": "comments",
+        }},
+        # comment_count is maintained by comments_db; threads from before that
+        # (not yet repaired) fall back to the size of the page we just loaded.
+        {"$set": {"comment_count": {"$ifNull": ["$comment_count", {"$size": "$comments"}]}}},
+    ]
+
 def update_thread(thread_id, author_id, patch):
     """
     Only allow the author to update.
@@ -53,35 +222,123 @@ def update_thread(thread_id, author_id, patch):
         patch["title"] = patch["title"].strip()
     if "body" in patch and isinstance(patch["body"], str):
         patch["body"] = patch["body"].strip()
+    if "tags" in patch:
+        patch["tags"] = normalize_tags(patch["tags"])
 
     patch["updated_at"] = datetime.now(timezone.utc)
 
-    res = db.threads.update_one(
+    # updated_at always changes, so "matched" == "modified" here.
+    before = db.threads.find_one_and_update(
         {"_id": _oid(thread_id), "author_id": _oid(author_id)},
         {"$set": patch},
+        projection={"title": 1, "body": 1, "tags": 1, "updated_at": 1},
+        return_document=ReturnDocument.BEFORE,
     )
-    return res.modified_count == 1
+    if before is None:
+        return False
+    after = {**before, **patch}
+    index_thread(after)
+    apply_tag_diff(before.get("tags"), after.get("tags"))
+    tags_changed(before.get("tags"), after.get("tags"))
+    invalidate_threads(thread_id)
+    return True
 
 def delete_thread(thread_id, author_id):
     db = get_db()
-    res = db.threads.delete_one({"_id": _oid(thread_id), "author_id": _oid(author_id)})
-    return res.deleted_count == 1
+    doc = db.threads.find_one_and_delete(
+        {"_id": _oid(thread_id), "author_id": _oid(author_id)},
+        projection={"tags": 1},
+    )
+    if doc is None:
+        return False
+    unindex_thread(thread_id)
+    apply_tag_diff(doc.get("tags"), [])
+    tags_changed(doc.get("tags"), [])
+    invalidate_threads(thread_id)
+    return True
 
-def search_threads(q=None, tag=None, limit=20, skip=0):
+def search_threads(q=None, tag=None, limit=20, skip=0, after=None, projection=None, sort="recent"):
     """
     Simple search:
     - if you have a text index, uses $text
     - tag filter uses exact match in tags array
+    - `after` is a cursor from encode_cursor/next_cursor (takes precedence over skip)
+    - `projection` limits returned fields (see thread_projection)
+    - `sort` is a SORT_FIELDS key ("recent" or "activity")
+    """
+    return _page(search_filter(q, tag), limit, skip, after, projection, sort)
+
+def get_threads_by_ids(thread_ids, projection=None):
+    """Fetch threads by id in one query, returned in the order of `thread_ids`."""
+    db = get_db()
+    ids = [_oid(t) for t in thread_ids]
+    by_id = {t["_id"]: t for t in db.threads.find({"_id": {"$in": ids}}, projection)}
+    return [by_id[i] for i in ids if i in by_id]
+
+def search_threads_ranked(q, tag=None, limit=20, skip=0, projection=None):
+    """
+    Relevance-ranked search (BM25 with title boost and prefix matching on the
+    last word) from the in-memory search index. Each thread gets a `score`.
+    Paging is by skip only: scores aren't stable keys for a cursor.
+    While this worker's index is still loading, ranks by Mongo's textScore.
     """
+    hits = search_thread_ids(q, tag=tag, limit=limit, offset=skip)
+    if hits is None:
+        return _text_ranked(q, tag, limit, skip, projection)
+    return apply_scores(hits, get_threads_by_ids([h[0] for h in hits], projection))
+
+def apply_scores(hits, threads):
+    """Set each thread's `score` from the index hits; unindex hits that no longer exist."""
+    found = {str(t["_id"]) for t in threads}
+    for thread_id, _ in hits:
+        if thread_id not in found:  # deleted by another worker
+            unindex_thread(thread_id)
+    scores = dict(hits)
+    for t in threads:
+        t["score"] = scores[str(t["_id"])]
+    return threads
+
+def text_ranked_query(q, tag, projection):
+    """(filter, projection, sort) ranking matches by Mongo's textScore."""
+    score = {"$meta": "textScore"}
+    return search_filter(q, tag), {**(projection or {}), "score": score}, [("score", score)]
+
+def _text_ranked(q, tag, limit, skip, projection):
     db = get_db()
+    filter_, projection, sort = text_ranked_query(q, tag, projection)
+    cursor = db.threads.find(filter_, projection).sort(sort).skip(int(skip)).limit(int(limit))
+    return list(cursor)
+
+def search_filter(q=None, tag=None):
     filter_ = {}
     if tag:
         filter_["tags"] = tag
     if q:
         filter_["$text"] = {"$search": q}
+    return filter_
 
-    cursor = db.threads.find(filter_).sort("created_at", -1).skip(int(skip)).limit(int(limit))
-    return list(cursor)
+def repair_comment_stats():
+    """
+    Recompute comment_count and last_activity_at for every thread from the
+    comments collection. Runs entirely server-side ($lookup + $merge), so it
+    is safe to use on large collections. Run after imports or if counters drift.
+    """
+    db = get_db()
+    db.threads.aggregate([
+        {"$lookup": {
+            "from": "comments",
+            "localField": "_id",
+            "foreignField": "thread_id",
+            "pipeline": [{"$group": {"_id": None, "n": {"$sum": 1}, "last": {"$max": "$created_at"}}}],
+            "as": "_stats",
+        }},
+        {"$project": {
+            "comment_count": {"$ifNull": [{"$first": "$_stats.n"}, 0]},
+            "last_activity_at": {"$max": ["$created_at", {"$first": "$_stats.last"}]},
+        }},
+        {"$merge": {"into": "threads", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ])
+    query_cache.clear()
 
 def ensure_thread_indexes():
     """
@@ -89,5 +346,13 @@ def ensure_thread_indexes():
     """
     db = get_db()
     db.threads.create_index([("created_at", -1)])
+    db.threads.create_index([("created_at", -1), ("_id", -1)])
     db.threads.create_index([("tags", 1)])
+    db.threads.create_index([("tags", 1), ("created_at", -1), ("_id", -1)])
+    db.threads.create_index([("last_activity_at", -1), ("_id", -1)])
+    db.threads.create_index([("updated_at", 1)])  # search_index refresh
     db.threads.create_index([("title", "text"), ("body", "text")])
+
+if __name__ == "__main__":  # `python -m backend.threads_db` repairs denormalized counters
+    repair_comment_stats()
+    print("Repaired comment_count / last_activity_at on threads")
@@ -0,0 +1,174 @@
+import bisect
+import heapq
+import os
+import threading
+import time
+try:
+    from .db import get_db
+    from .tags_db import all_tag_counts, rebuild_tag_counts
+except ImportError:  # allows `python backend/typeahead.py`
+    from db import get_db
+    from tags_db import all_tag_counts, rebuild_tag_counts
+
+# In-memory prefix lookups for tag and user autocomplete.
+#
+# Both suggesters keep a sorted list of (lowercased key, ...) tuples and answer
+# with bisect, so a keystroke never touches Mongo. They are loaded on first use,
+# kept current by the write paths in threads_db/users_db for this process, and
+# reloaded in a background thread every TYPEAHEAD_REFRESH_S to pick up other
+# workers' writes. A reload reads Mongo without holding the lock and only
+# swaps the new lists in under it, so write-path updates never wait on a scan
+# (one racing the swap is lost until the next reload).
+
+TYPEAHEAD_REFRESH_S = float(os.getenv("TYPEAHEAD_REFRESH_S", "60"))
+MAX_SCAN = 2000  # bound the work for very short, very common prefixes
+
+
+class _Suggester:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._refreshing = False
+
+    def _fetch(self, first):
+        """Read fresh state from Mongo (no lock held); `first` on the initial load."""
+        raise NotImplementedError
+
+    def _swap(self, state):
+        """Install what _fetch returned (called with the lock held)."""
+        raise NotImplementedError
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self._swap(self._fetch(first=True))
+                    self._loaded_at = time.monotonic()
+        elif time.monotonic() - self._loaded_at > TYPEAHEAD_REFRESH_S and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            state = self._fetch(first=False)
+            with self._lock:
+                self._swap(state)
+                self._loaded_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+
+def _prefix_range(keys, prefix):
+    # [lo, hi) of entries whose key starts with `prefix`.
+    lo = bisect.bisect_left(keys, (prefix,))
+    hi = bisect.bisect_left(keys, (prefix + "\uffff",))
+    return lo, hi
+
+
+class TagSuggester(_Suggester):
+    """Tags with thread counts, suggested most-popular first."""
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}   # tag -> threads using it
+        self._keys = []     # sorted (tag.lower(), tag)
+
+    def _fetch(self, first):
+        counts = all_tag_counts()
+        if first and not counts and get_db().threads.find_one({"tags.0": {"$exists": True}}, {"_id": 1}):
+            # Tagged threads but no counters yet (fresh deploy or raw import).
+            rebuild_tag_counts()
+            counts = all_tag_counts()
+        counts = {t: n for t, n in counts.items() if isinstance(t, str) and n > 0}
+        return counts, sorted((tag.lower(), tag) for tag in counts)
+
+    def _swap(self, state):
+        self._counts, self._keys = state
+
+    def adjust(self, tag, delta):
+        with self._lock:
+            count = self._counts.get(tag, 0) + delta
+            if count > 0:
+                if tag not in self._counts:
+                    bisect.insort(self._keys, (tag.lower(), tag))
+                self._counts[tag] = count
+            elif tag in self._counts:
+                del self._counts[tag]
+                i = bisect.bisect_left(self._keys, (tag.lower(), tag))
+                if i < len(self._keys) and self._keys[i] == (tag.lower(), tag):
+                    del self._keys[i]
+
+    def suggest(self, prefix, limit=10):
+        self._ensure_fresh()
+        keys, counts = self._keys, self._counts
+        lo, hi = _prefix_range(keys, prefix.lower())
+        matches = keys[lo:min(hi, lo + MAX_SCAN)]
+        best = heapq.nsmallest(
+            int(limit), matches, key=lambda k: (-counts.get(k[1], 0), k[0])
+        )
+        return [{"tag": tag, "count": counts.get(tag, 0)} for _, tag in best]
+
+
+class UserSuggester(_Suggester):
+    """Users by display-name prefix, alphabetical."""
+
+    def __init__(self):
+        super().__init__()
+        self._keys = []     # sorted (display_name.lower(), str(_id), display_name)
+        self._by_id = {}    # str(_id) -> key tuple
+
+    def _fetch(self, first):
+        db = get_db()
+        keys = []
+        for doc in db.users.find({}, {"display_name": 1}):
+            name = doc.get("display_name") or ""
+            if name:
+                keys.append((name.lower(), str(doc["_id"]), name))
+        keys.sort()
+        return keys, {k[1]: k for k in keys}
+
+    def _swap(self, state):
+        self._keys, self._by_id = state
+
+    def upsert(self, user_id, display_name):
+        user_id = str(user_id)
+        with self._lock:
+            old = self._by_id.pop(user_id, None)
+            if old is not None:
+                i = bisect.bisect_left(self._keys, old)
+                if i < len(self._keys) and self._keys[i] == old:
+                    del self._keys[i]
+            if display_name:
+                key = (display_name.lower(), user_id, display_name)
+                bisect.insort(self._keys, key)
+                self._by_id[user_id] = key
+
+    def suggest(self, prefix, limit=10):
+        self._ensure_fresh()
+        keys = self._keys
+        lo, hi = _prefix_range(keys, prefix.lower())
+        return [{"id": uid, "display_name": name} for _, uid, name in keys[lo:min(hi, lo + int(limit))]]
+
+
+tag_suggester = TagSuggester()
+user_suggester = UserSuggester()
+
+
+def tags_changed(old_tags, new_tags):
+    """Apply a thread's tag diff (create: old=[]; delete: new=[])."""
+    if not tag_suggester.loaded:
+        return
+    old, new = set(old_tags or ()), set(new_tags or ())
+    for tag in old - new:
+        tag_suggester.adjust(tag, -1)
+    for tag in new - old:
+        tag_suggester.adjust(tag, 1)
+
+
+def user_changed(user_id, display_name):
+    if user_suggester.loaded:
+        user_suggester.upsert(user_id, display_name)
@@ -1,7 +1,9 @@
 from datetime import datetime, timezone
 from bson import ObjectId
 from backend.db import get_db
-from werkzeug.security import check_password_hash, generate_password_hash
+from backend.passwords import HashingBusy, hash_password, needs_rehash, verify_password
+from backend.typeahead import user_changed
+from backend.user_cache import invalidate_user
 
 def _oid(x):
     """Convert a string/ObjectId into ObjectId."""
@@ -9,6 +11,16 @@ def _oid(x):
         return x
     return ObjectId(str(x))
 
+# Safe-to-show fields for other people's profiles (no email / password_hash).
+PUBLIC_USER_PROJECTION = {
+    "display_name": 1,
+    "profile.major": 1,
+    "profile.school": 1,
+    "profile.grad_year": 1,
+    "follower_count": 1,
+    "following_count": 1,
+}
+
 
 def create_user(email, display_name, password_hash=None):
     """
@@ -31,11 +43,14 @@ def create_user(email, display_name, password_hash=None):
             "courses": [],
             "grad_year": "",
         },
+        "follower_count": 0,
+        "following_count": 0,
         "created_at": now,
         "updated_at": now,
     }
     res = db.users.insert_one(doc)
     doc["_id"] = res.inserted_id
+    user_changed(doc["_id"], doc["display_name"])
     return doc
 
 
@@ -45,10 +60,22 @@ def get_user_by_email(email):
     return db.users.find_one({"email": email.strip().lower()})
 
 
-def get_user(user_id):
+def get_user(user_id, projection=None):
     """Find a user by _id."""
     db = get_db()
-    return db.users.find_one({"_id": _oid(user_id)})
+    return db.users.find_one({"_id": _oid(user_id)}, projection)
+
+
+def get_users_by_ids(user_ids, projection=None):
+    """
+    Fetch many users in one query.
+    Returns {_id: doc}; ids with no matching user are simply absent.
+    """
+    db = get_db()
+    ids = list({_oid(u) for u in user_ids})
+    if not ids:
+        return {}
+    return {doc["_id"]: doc for doc in db.users.find({"_id": {"$in": ids}}, projection)}
 
 
 def update_user_profile(user_id, patch):
@@ -81,6 +108,7 @@ def update_user_profile(user_id, patch):
         {"_id": _oid(user_id)},
         {"$set": set_payload},
     )
+    invalidate_user(user_id)
     return res.matched_count == 1
 
 
@@ -107,14 +135,19 @@ def update_user_account(user_id, patch):
 
     if "password" in patch and isinstance(patch["password"], str):
         password = patch["password"]
-        if password:
-            clean["password_hash"] = generate_password_hash(password)
+        # Blank/whitespace means "keep the current password": don't pay for a hash.
+        if password.strip():
+            clean["password_hash"] = hash_password(password)
 
     if not clean:
         return False
 
     clean["updated_at"] = datetime.now(timezone.utc)
-    res = db.users.update_one({"_id": _oid(user_id)}, {"$set": clean})
+    # Bumping `version` makes stateless sessions re-check (see flask/auth.py).
+    res = db.users.update_one({"_id": _oid(user_id)}, {"$set": clean, "$inc": {"version": 1}})
+    invalidate_user(user_id)
+    if "display_name" in clean:
+        user_changed(user_id, clean["display_name"])
     return res.matched_count == 1
 
 def create_user_with_password(email, password, display_name=None):
@@ -122,7 +155,7 @@ def create_user_with_password(email, password, display_name=None):
     Create a user with a hashed password (for real auth).
     Returns the inserted user doc (including _id).
     """
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
     # display_name can be optional in auth flow
     if display_name is None or str(display_name).strip() == "":
         display_name = email.split("@")[0]
@@ -133,14 +166,36 @@ def authenticate_user(email, password):
     """
     Validate email/password.
     Returns the user doc if valid, otherwise None.
+    Raises passwords.HashingBusy if the hashing pool is saturated.
     """
     doc = get_user_by_email(email)
     if not doc:
         return None
-    if not check_password_hash(doc.get("password_hash", ""), password):
+    if not verify_password(doc.get("password_hash"), password):
         return None
+    if needs_rehash(doc["password_hash"]):
+        _upgrade_password_hash(doc, password)
     return doc
 
+
+def _upgrade_password_hash(doc, password):
+    """
+    Re-hash with the current PASSWORD_HASH_METHOD after a successful login
+    (the only time the plaintext is available). Best effort: if the pool is
+    busy the login still succeeds and the upgrade waits for the next one.
+    """
+    try:
+        new_hash = hash_password(password)
+    except HashingBusy:
+        return
+    db = get_db()
+    # Conditional on the old hash so a concurrent password change wins.
+    db.users.update_one(
+        {"_id": doc["_id"], "password_hash": doc["password_hash"]},
+        {"$set": {"password_hash": new_hash}},
+    )
+    doc["password_hash"] = new_hash
+
 def ensure_user_indexes():
     """Create indexes for the users collection."""
     db = get_db()
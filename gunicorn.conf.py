@@ -0,0 +1,40 @@
+# Gunicorn settings for running the Flask app in production.
+# Usage (from the repo root): gunicorn -c gunicorn.conf.py backend.flask.wsgi:app
+# Every value can be overridden with the env vars below.
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"{os.getenv('FLASK_HOST', '127.0.0.1')}:{os.getenv('FLASK_PORT', '5000')}")
+
+# Processes scale across cores; threads overlap Mongo I/O inside each worker.
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# Read by backend.query_cache (loaded after this file) to pick a multi-worker-safe default.
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Import the app once in the master so workers fork with it already loaded.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # The master's MongoClient must not be reused after fork. backend.db drops it
+    # automatically in the child; reconnect (and optionally warm the pool) here.
+    from backend.db import close_client, warm_up
+
+    close_client()
+    if os.getenv("MONGO_WARM_UP", "0") == "1":
+        try:
+            warm_up()
+        except Exception as exc:  # let the worker start; requests will retry
+            worker.log.warning("Mongo warm-up failed: %s", exc)